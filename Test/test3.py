@@ -6,12 +6,18 @@ import subprocess
 import sys
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "iEvmOpt"))
+
+from Cfg.EtherSolvePool import EtherSolveDaemon
+
 # 测试用
 if __name__ == "__main__":
 
     dataPath = 'testContracts'
     dataFileList = os.listdir(dataPath)
     timeoutTime = 1200 # 20min
+    # 所有Main.py进程共用一个EtherSolve守护进程，不必为每个合约重新启动JVM
+    daemon = EtherSolveDaemon().start()
     totalContract = 0  # 合约数
     successCnt = 0  # 返回0
     sucessFile = []
@@ -40,7 +46,7 @@ if __name__ == "__main__":
         if os.path.exists(reportFile):
             os.remove(reportFile)
 
-        p = subprocess.Popen(cmd, shell=True, close_fds=True, preexec_fn=os.setsid)
+        p = subprocess.Popen(cmd, shell=True, close_fds=True, preexec_fn=os.setsid, env=daemon.getEnv())
 
         returnCode = 0
         start = time.perf_counter()
@@ -68,6 +74,7 @@ if __name__ == "__main__":
         else:
             print("error occurs!")
 
+    daemon.close()
     jsonFile = outputPath + "/return_code.json"
     if os.path.exists(jsonFile):
         os.remove(jsonFile)
@@ -6,12 +6,18 @@ import subprocess
 import sys
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "iEvmOpt"))
+
+from Cfg.EtherSolvePool import EtherSolveDaemon
+
 # 跑选定的测试数据集
 if __name__ == "__main__":
 
     dataPath = 'contracts1'
     dataFileList = os.listdir(dataPath)
     timeoutTime = 1200 # 20min
+    # 所有Main.py进程共用一个EtherSolve守护进程，不必为每个合约重新启动JVM
+    daemon = EtherSolveDaemon().start()
     totalContract = 0  # 合约数
     successCnt = 0  # 返回0
     sucessFile = []
@@ -39,7 +45,7 @@ if __name__ == "__main__":
 
         logFile = outputPath + "/" + binFile + "_log.txt"
         fp = open(logFile, "w")
-        p = subprocess.Popen(cmd, stdout=fp, stderr=fp, shell=True, close_fds=True, preexec_fn=os.setsid)
+        p = subprocess.Popen(cmd, stdout=fp, stderr=fp, shell=True, close_fds=True, preexec_fn=os.setsid, env=daemon.getEnv())
 
         returnCode = 0
         isTimeout = 0
@@ -76,6 +82,7 @@ if __name__ == "__main__":
         with open(reportFile, "w") as f:
             json.dump(processInfo, f, indent=2)
 
+    daemon.close()
     resString = "总合约数：{} 运行正常：{} 运行异常：{} 超时：{} 返回正常合约总用时：{}\n\n返回正常的合约有:\n".format(totalContract, successCnt, failCnt,
                                                                                    timeoutCnt, totalTime)
     for f in sucessFile:
@@ -10,10 +10,12 @@ from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 from z3 import *
 
+from AssertionOptimizer.CallReturnMatcher import CallReturnMatcher
 from AssertionOptimizer.Function import Function
 from AssertionOptimizer.JumpEdge import JumpEdge
 from AssertionOptimizer.Path import Path
-from AssertionOptimizer.PathGenerator import PathGenerator
+from AssertionOptimizer.PathCounter import PathCounter
+from AssertionOptimizer.PathGenerator import PathGenerator, enumeratePaths, summarizePaths, skipPaths
 from AssertionOptimizer.SymbolicExecutor import SymbolicExecutor
 from AssertionOptimizer.TagStacks.TagStack import TagStack
 from Cfg.Cfg import Cfg
@@ -36,28 +38,37 @@ nonRedundant = "nonRedundant"
 
 
 class AssertionOptimizer:
-    def __init__(self, inputFile: str, outputPath: str, outputName: str, outputProcessInfo: bool = False,
-                 outputHtml: bool = False):
+    def __init__(self, inputFile: str = None, outputPath: str = None, outputName: str = None,
+                 outputProcessInfo: bool = False, outputHtml: bool = False, useEtherSolve: bool = False,
+                 useCache: bool = None, bytecode=None):
         """
         对部分冗余和完全冗余进行优化，并重新生成字节码
-        :param inputFile: 输入文件的路径
-        :param outputPath: 输出文件的路径
+        :param inputFile: 输入文件的路径，直接给出字节码时为None
+        :param outputPath: 输出文件的路径，为None时不写入任何文件，只通过optimize的返回值给出优化后的字节码
         :param outputName: 输出文件的文件名
         :param outputProcessInfo:是否输出处理过程信息，默认为不输出
         :param outputHtml:是否输出HTML报告
+        :param useEtherSolve:是否使用EtherSolve构建CFG，默认使用内置的CfgBuilder
+        :param useCache:是否使用CFG磁盘缓存，为None时只对输入文件使用缓存，直接给出字节码时不访问文件系统
+        :param bytecode:内存中的字节码，可以是十六进制字符串或bytes，给出时不读取inputFile
         """
         # 输入输出路径文件
         self.inputFile = inputFile
         self.outputPath = outputPath
         self.outputName = outputName
+        self.bytecode = bytecode
         self.outputProcessInfo = outputProcessInfo
         self.outputHtml = outputHtml
+        self.useEtherSolve = useEtherSolve
+        self.useCache = useCache if useCache is not None else bytecode is None
 
         # 存储cfg需要用到的信息
+        self.etherSolver = None
         self.constructorCfg = None
         self.cfg = None
-        self.constructorDataSegStr = None
-        self.dataSegStr = None
+        self.constructorDataSeg = None  # 构造函数的数据段，为原字节码的切片
+        self.dataSeg = None  # 运行时的数据段，为原字节码的切片
+        self.layout = None  # 原字节码中各个段的位置
 
         self.blocks = None  # 存储基本块，格式为 起始offset:BasicBlock
 
@@ -79,6 +90,9 @@ class AssertionOptimizer:
         self.invalidPaths = {}  # 用于记录不同invalid对应的路径集合，格式为：  invalidPathId:Path对象
         self.invalidNode2PathIds = {}  # 记录每个invalid节点包含的路径，格式为：  invalidNodeOffset:[pathId1,pathId2]
         self.invalidNode2CallChain = {}  # 记录每个invalid节点包含的调用链，格式为： invalidNodeOffset:[[callchain1中的pathid],[callchain2中的pathid]]
+        self.loopRelatedInvNodes = set()  # 路径搜索时已经发现路径中包含循环体的invalid节点，它们的路径没有被记录
+        self.maxPathNum = 1000000  # 记录的路径数量上限，单个invalid节点的预计路径数量超出该值时跳过该节点，记录的路径总数预计超出该值时放弃优化
+        self.maxSearchPathNum = 10000000  # 路径搜索会经过的路径总数上限，即以invalid结束的路径数量，预计超出该值时放弃优化
 
         # 可达性分析需要用到的信息
         self.pathReachable = {}  # 某条路径是否可达
@@ -87,6 +101,7 @@ class AssertionOptimizer:
         self.fullyRedundantInvNodes = []  # 全部的完全冗余的invalid节点
         self.partiallyRedundantInvNodes = []  # 全部的部分冗余的invalid节点
         self.abandonedLoopRelatedInvNodes = []  # 放弃优化的路径中包含循环体的invalid节点
+        self.abandonedPathExplosionInvNodes = []  # 放弃优化的路径数量过多的invalid节点
         self.abandonedFullyRedundantInvNodes = []  # 放弃优化的完全冗余invalid节点
         self.abandonedPartiallyRedundantInvNodes = []  # 放弃优化的部分冗余invalid节点
         self.nonRedundantInvNodes = []  # 不冗余的invalid节点
@@ -126,8 +141,15 @@ class AssertionOptimizer:
         self.codeCopyInfo = None
         self.runtimeDataSegOffset = 0  # 运行时的数据段的移动偏移量，即运行时的函数体总长度变化的偏移量
         self.modifiedBytecodes = False  # 是否对字节码进行过任何修改？
+        self.optimizedBytecode = None  # 优化后的字节码字符串，没有进行优化时为None
+        self.beginTime = 0  # 开始优化的时间，用于统计耗时
 
     def optimize(self):
+        """
+        进行优化
+        :return:优化后的字节码字符串，不存在可优化的Assertion时返回None
+        """
+        self.beginTime = time.perf_counter()
         self.log.info("开始进行字节码分析")
         self.__etherSolve()
         if self.outputProcessInfo:
@@ -139,7 +161,7 @@ class AssertionOptimizer:
 
         # 简单检查是否有invalid，可以提高效率
         if not self.cfg.invalidExist:
-            self.log.info("没有找到Assertion，优化结束")
+            self.__earlyExit("没有找到Assertion，优化结束")
             return
 
         # 首先识别出所有的函数体，将每个函数体内的强连通分量的所有点标记为loop-related
@@ -154,7 +176,7 @@ class AssertionOptimizer:
             "路径搜索完毕，一共找到{}个Assertion:{},{}条路径".format(self.invalidNodeList.__len__(), self.invalidNodeList,
                                                       len(self.invalidPaths.keys())))
         if self.invalidNodeList.__len__() == 0:
-            self.log.info("不存在可优化的Assertion，优化结束")
+            self.__earlyExit("不存在可优化的Assertion，优化结束")
             return
 
         # 求解各条路径是否可行
@@ -170,11 +192,11 @@ class AssertionOptimizer:
                 self.partiallyRedundantInvNodes.__str__(),
                 self.nonRedundantInvNodes.__len__(),
                 self.nonRedundantInvNodes.__str__(),
-                self.abandonedLoopRelatedInvNodes.__len__(),
-                self.abandonedLoopRelatedInvNodes.__str__())
+                self.abandonedLoopRelatedInvNodes.__len__() + self.abandonedPathExplosionInvNodes.__len__(),
+                (self.abandonedLoopRelatedInvNodes + self.abandonedPathExplosionInvNodes).__str__())
         )
         if self.fullyRedundantInvNodes.__len__() == 0 and self.partiallyRedundantInvNodes.__len__() == 0:
-            self.log.info("不存在可优化的Assertion，优化结束")
+            self.__earlyExit("不存在可优化的Assertion，优化结束")
             return
 
         # 这里需要注意，只有在部分冗余的处理函数里，才会将exit Block假装成数据段
@@ -199,7 +221,7 @@ class AssertionOptimizer:
         # 因为在优化冗余assertion过程中，可能出现有的assertion有函数副作用
         # 因此，如果没有对字节码进行过修改的话，应该退出程序，而不是输出一个和原文件一模一样的字节码文件
         if not self.modifiedBytecodes:
-            self.log.info("不存在可优化的Assertion，优化结束")
+            self.__earlyExit("不存在可优化的Assertion，优化结束")
             return
 
         # 重新生成运行时的字节码序列
@@ -221,39 +243,57 @@ class AssertionOptimizer:
 
         # 将优化后的运行时字节码写入文件
         self.__outputFile()
-        self.log.info("写入完毕")
+        self.log.info("优化完成，耗时{:.3f}s".format(time.perf_counter() - self.beginTime))
+        return self.optimizedBytecode
+
+    def __earlyExit(self, info: str):
+        """
+        没有可优化的Assertion时提前结束，单独输出提前结束的耗时
+        :param info:结束的原因
+        """
+        self.log.info(info)
+        self.log.info("提前结束，耗时{:.3f}s".format(time.perf_counter() - self.beginTime))
 
     def __etherSolve(self):
         '''
         使用ethersolve对字节码进行分析
         :return:
         '''
-        # 检查文件路径是否存在
-        if not os.path.exists(self.inputFile):
-            self.log.fail("输入文件:{} 不存在".format(self.inputFile))
-        if not os.path.exists(self.outputPath):
-            self.log.fail("输出路径:{} 不存在".format(self.outputPath))
-
-        self.inputFile = self.inputFile.replace("\\", "/")
-        self.inputFile = self.inputFile.replace("\\\\", "/")
-        self.outputPath = self.outputPath.replace("\\", "/")
-        self.outputPath = self.outputPath.replace("\\\\", "/")
-        if self.outputPath[-1] != '/':
-            self.outputPath += '/'
-
-        # 使用ethersolve工具进行处理
-        es = EtherSolver(self.inputFile, self.outputPath, outputHtml=self.outputHtml)
+        # 检查文件路径是否存在，直接给出字节码时不需要输入文件，没有给出输出路径时不写入文件
+        if self.bytecode is None:
+            if self.inputFile is None:
+                self.log.fail("没有给出输入文件或字节码")
+            if not os.path.exists(self.inputFile):
+                self.log.fail("输入文件:{} 不存在".format(self.inputFile))
+            self.inputFile = self.inputFile.replace("\\", "/")
+            self.inputFile = self.inputFile.replace("\\\\", "/")
+        if self.outputPath is not None:
+            if not os.path.exists(self.outputPath):
+                self.log.fail("输出路径:{} 不存在".format(self.outputPath))
+            self.outputPath = self.outputPath.replace("\\", "/")
+            self.outputPath = self.outputPath.replace("\\\\", "/")
+            if self.outputPath[-1] != '/':
+                self.outputPath += '/'
+        elif self.outputHtml:
+            self.log.warning("没有给出输出路径，不生成HTML报告")
+            self.outputHtml = False
+
+        # 构建cfg，默认使用内置的CfgBuilder，也可以使用ethersolve工具进行处理
+        es = EtherSolver(self.inputFile if self.bytecode is None else None, self.outputPath,
+                         outputHtml=self.outputHtml, useEtherSolve=self.useEtherSolve, useCache=self.useCache,
+                         bytecode=self.bytecode)
         es.execSolver()
 
         # 处理完成之后，对优化使用到的数据进行初始化
-        self.constructorCfg = es.getConstructorCfg()
+        self.etherSolver = es  # 构造函数的cfg在处理构造函数时才获取
         self.cfg = es.getCfg()
-        self.constructorDataSegStr = es.getConstructorDataSegStr()
-        self.dataSegStr = es.getDataSeg()
-        self.constructorFuncBodyLength = self.constructorCfg.bytecodeLength
-        self.funcBodyLength = self.cfg.bytecodeLength
-        self.constructorDataSegLength = self.constructorDataSegStr.__len__() // 2
-        self.dataSegLength = self.dataSegStr.__len__() // 2
+        self.constructorDataSeg = es.getConstructorDataSeg()
+        self.dataSeg = es.getDataSeg()
+        self.layout = es.getLayout()
+        self.constructorFuncBodyLength = self.layout.constructorLength
+        self.funcBodyLength = self.layout.runtimeLength
+        self.constructorDataSegLength = self.layout.runtimeBegin - self.layout.constructorLength
+        self.dataSegLength = self.layout.codeLength - self.layout.runtimeBegin - self.layout.runtimeLength
         self.blocks = self.cfg.blocks  # 存储基本块，格式为 起始offset:BasicBlock
         self.nodes = list(self.cfg.blocks.keys())  # 存储点，格式为 [n1,n2,n3...]
         self.edges = self.cfg.edges  # 存储出边表，格式为 from:[to1,to2...]
@@ -293,34 +333,17 @@ class AssertionOptimizer:
                     e = JumpEdge(n, self.cfg.blocks[_to])
                     self.uncondJumpEdge.append(e)
 
-        # 第三步，两两之间进行匹配
-        funcRange2Calls = {}  # 一个映射，格式为:
-        # (一个字符串，内容为"[第一条指令所在的block的offset,最后一条指令所在的block的offset]"):[[funcbody调用者的起始node,funcbody返回边的目的node]]
+        # 第三步，将调用边与返回边进行匹配
+        # 匹配的结果格式为:
+        # (第一条指令所在的block的offset,最后一条指令所在的block的offset):[(funcbody调用者的起始node,funcbody返回边的目的node)]
         # 解释一下value为什么要存这个：如果发现出现了函数调用，那么就在其调用者调用前的节点和调用后的返回节点之间加一条边
         # 这样在使用dfs遍历一个函数内的所有节点时，就可以只看地址范围位于key内的节点，如果当前遍历的函数出现了函数调用，那么不需要进入调用的函数体，
         # 也能成功找到它的所有节点
-        uncondJumpNum = len(self.uncondJumpEdge)
-        for i in range(0, uncondJumpNum):
-            for j in range(0, uncondJumpNum):
-                if i == j:
-                    continue
-                e1, e2 = self.uncondJumpEdge[i], self.uncondJumpEdge[j]  # 取出两个不同的边进行匹配
-                if e1.tetrad[0] == e2.tetrad[2] and e1.tetrad[1] == e2.tetrad[3] and e1.tetrad[
-                    0] is not None:  # 匹配成功，e1为调用边，e2为返回边。注意None之间是不匹配的
-                    # 4.21新问题：如果是添加了修复边的话，可能会出现，调用边不是push addr,jump的结构
-                    # 比如说 AND JUMP。此时要多加一个限制，就是调用边指向的节点的offset，要比返回边的起始节点小
-                    if e1.targetNode > e2.beginNode:
-                        continue
-                    e1.isCallerEdge = True
-                    e2.isReturnEdge = True
-                    self.isFuncBodyHeadNode[e1.targetNode] = True
-                    key = [e1.targetNode, e2.beginNode].__str__()
-                    value = [e1.beginNode, e2.targetNode]
-                    if key not in funcRange2Calls.keys():
-                        funcRange2Calls[key] = []
-                    funcRange2Calls[key].append(value)
-        # for k, v in funcRange2Calls.items():
-        #     print(k, v)
+        matcher = CallReturnMatcher(self.uncondJumpEdge)
+        matcher.match()
+        funcRange2Calls = matcher.getFuncRange2Calls()
+        for funcBegin, _ in funcRange2Calls.keys():
+            self.isFuncBodyHeadNode[funcBegin] = True
 
         originalInEdge = {}
         for _from, tos in self.inEdges.items():
@@ -333,11 +356,13 @@ class AssertionOptimizer:
             for pair in pairs:
                 self.edges[pair[0]].append(pair[1])
                 self.inEdges[pair[1]].append(pair[0])
+        self.cfg.resetCsrGraph()
+
+        offsetIndex = self.cfg.getOffsetIndex()  # 基本块与函数的地址区间索引，找到的函数会加入其中
 
         # 第五步，从一个函数的funcbody的起始block开始dfs遍历，只走offset范围在 [第一条指令所在的block的offset,最后一条指令所在的block的offset]之间的节点，尝试寻找出所有的函数节点
         # 因为函数中可能包含没有入边的JUMPDEST，下面会先收集缺失的block，这些block只能是没有入边的JUMPDEST
-        for rangeInfo in funcRange2Calls.keys():  # 找到一个函数
-            offsetRange = json.loads(rangeInfo)  # 还原之前的list
+        for offsetRange in funcRange2Calls.keys():  # 找到一个函数
             funcBody = []
             stack = Stack()
             visited = {}
@@ -380,7 +405,6 @@ class AssertionOptimizer:
                     # 这暂时是不被允许的，因为这里能修复的是，没有push过返回地址的jumpdest
                     # 具体如何触发见readme
                     self.log.fail("未能找全函数节点，放弃优化")
-                    exit(0)
             if not isProcess:
                 continue
 
@@ -389,11 +413,13 @@ class AssertionOptimizer:
                 funcBody.append(missingBlockOffset)
                 nodeWithoutInedge.remove(missingBlockOffset)
             self.funcCnt += 1
-            f = Function(self.funcCnt, offsetRange[0], offsetRange[1], funcBody, self.edges)
+            f = Function(self.funcCnt, offsetRange[0], offsetRange[1], funcBody)
             self.funcDict[self.funcCnt] = f
             for node in funcBody:
                 assert self.node2FuncId[node] is None  # 一个点只能被赋值一次
                 self.node2FuncId[node] = self.funcCnt
+            lastNode = max(funcBody)
+            offsetIndex.addFunction(self.funcCnt, min(funcBody), lastNode + self.blocks[lastNode].length)
             if len(missingBlocks) != 0:
                 self.log.info("运行时函数中发现无入边JUMPDEST，无入边节点:{}修复成功".format(str(node)))
 
@@ -403,7 +429,6 @@ class AssertionOptimizer:
                 continue
             if self.blocks[offset].bytecode[0] == 0x5b:
                 self.log.fail("未能找全函数节点，放弃优化")
-                exit(0)
 
         # 第六步，尝试处理没有返回边selfdestruct、revert函数
         # 注意，有些selfdestruct函数是有返回边的，我们处理的是没有返回边的情况
@@ -411,14 +436,11 @@ class AssertionOptimizer:
         removedNode = []
         for node in nodeWithoutInedge:
             # 找出这个可疑节点的上一个节点，它有可能是调用节点
-            callBlock = None
-            for b in self.blocks.values():
-                if b.offset + b.length == node:
-                    callBlock = b
-                    break
+            callBlockOffset = offsetIndex.blockEndingAt(node)
             # 检查这个节点是否为为可能的调用者节点
-            if not callBlock.couldBeCaller:
+            if callBlockOffset is None or not self.blocks[callBlockOffset].couldBeCaller:
                 continue
+            callBlock = self.blocks[callBlockOffset]
             # 之前的假设是，在调用者节点里会压入一个返回地址。对于遇到的大多数情况确实成立
             # 现在观察到合约0xE0339e6EBd1CCC09232d1E979d50257268B977Ef在调用包含revert函数的时候，调用者节点中并没有push返回地址，而是在之前的几个节点中进行了push
             # 于是这里取消这个限制，只检查无入边节点的前一个节点是否为可能的调用者节点
@@ -439,15 +461,11 @@ class AssertionOptimizer:
             funcBegin = self.edges[callBlock.offset][0]
             if self.node2FuncId[funcBegin] is not None:
                 continue  # 函数起始节点已经被标记为某个函数？真的有这个情况吗？不确定，但是不影响结果
-            funcEnd = None  # 先找出这个函数的可能范围，即从funcBegin开始的，没有被标记为任何函数节点的一个连续序列(不包含exit block)
-            for n in self.nodes:  # 已排序
-                if n < funcBegin:
-                    continue
-                elif self.node2FuncId[n] is None and n != self.cfg.exitBlockId:
-                    continue
-                else:  # 要么到了Exit，要么到了一个被标记为函数的节点
-                    funcEnd = n
-            assert funcEnd is not None
+            # 先找出这个函数的可能范围，即从funcBegin开始的，没有被标记为任何函数节点的一个连续序列(不包含exit block)
+            # 函数的节点都是连续的，因此序列在下一个函数的起始节点处结束，没有下一个函数时在exit block处结束
+            funcEnd = offsetIndex.nextFunctionBegin(funcBegin)
+            if funcEnd is None:
+                funcEnd = self.cfg.exitBlockId
             funcRange = range(funcBegin, funcEnd)
             funcBody = []
             stack = Stack()
@@ -472,15 +490,15 @@ class AssertionOptimizer:
             if not findAll:
                 # 这不仅代表着，寻找函数节点的失败，也是合约优化的失败
                 self.log.fail("未能找全函数节点，放弃优化")
-                exit(0)
 
             # 找全了函数节点，将其标出
             self.funcCnt += 1
-            f = Function(self.funcCnt, funcBody[0], funcBody[-1], funcBody, self.edges)
+            f = Function(self.funcCnt, funcBody[0], funcBody[-1], funcBody)
             self.funcDict[self.funcCnt] = f
             for n in funcBody:
                 assert self.node2FuncId[n] is None  # 一个点只能被赋值一次
                 self.node2FuncId[n] = self.funcCnt
+            offsetIndex.addFunction(self.funcCnt, funcBody[0], funcBody[-1] + self.blocks[funcBody[-1]].length)
             self.log.info("运行时函数中发现无返回边函数，无入边节点:{}修复成功".format(str(node)))
             removedNode.append(node)
         for node in removedNode:
@@ -491,14 +509,15 @@ class AssertionOptimizer:
         for offset, b in self.blocks.items():
             if b.blockType == "common" and self.node2FuncId[offset] is None:
                 self.log.fail("未能找全函数节点，放弃优化")
-                exit(0)
         if len(nodeWithoutInedge) != 0:
             self.log.fail("未能找全函数节点，放弃优化")
-            exit(0)
 
         # 第七步，检查一个函数内的节点是否存在环，存在则将其标记出来
+        graph = self.cfg.getCsrGraph()  # 此时的图包含了调用->返回的边
+        beginTime = time.perf_counter()
+        tarjan = TarjanAlgorithm(graph, [])  # 所有函数复用一个实例，只清理上一个函数访问过的节点
         for func in self.funcDict.values():  # 取出一个函数
-            tarjan = TarjanAlgorithm(func.funcBodyNodes, func.funcSubGraphEdges)
+            tarjan.reset(func.funcBodyNodes)
             tarjan.tarjan(func.firstBodyBlockOffset)
             sccList = tarjan.getSccList()
             for scc in sccList:
@@ -507,30 +526,23 @@ class AssertionOptimizer:
                         self.isLoopRelated[node] = True
                         if self.isFuncBodyHeadNode[node]:  # 函数头存在于scc，出现了递归的情况
                             self.log.fail("检测到函数递归调用的情况，该字节码无法被优化!")
-                            exit(0)
+        self.log.info("函数内环检测完毕，耗时{:.3f}s".format(time.perf_counter() - beginTime))
 
         # 第八步，因为dispatcher中也有可能存在scc，因此需要将它们也标记出来
         # 4.21新问题：dispatcher也可能被识别为函数体，如在KOLUSDTFund.bin的构造函数中，某些函数体就是由dispatcher节点构成的
         # 因此，讨论dispatcher中scc的问题时，应当考虑的是，非函数的非common节点
         # 最新：不再对构造函数进行这样的处理，不必要对他们进行关系，这一步可以完全删除
 
-        # 先生成子图
+        # 子图由这些节点组成，直接在CSR图上取子图
         nonCommonNodes = []  # 如果从0开始，一次走不完，则取一个非common节点开始（可能是common、fallback
-        subGraphEdges = {}  # 子图的边
         for offset, block in self.blocks.items():
             # if block.blockType == "dispatcher":
             if block.blockType != "common" and self.node2FuncId[offset] is None:
                 nonCommonNodes.append(offset)
-                subGraphEdges[offset] = []
-        checkSet = set(nonCommonNodes)
-        for node in nonCommonNodes:
-            for out in self.edges[node]:
-                if out in checkSet:  # 找到一个指向内部节点的边
-                    subGraphEdges[node].append(out)
-        tarjan = TarjanAlgorithm(nonCommonNodes, subGraphEdges)
+        tarjan = TarjanAlgorithm(graph, nonCommonNodes)
         tarjan.tarjan(0)
         for node in nonCommonNodes:
-            if not tarjan.visited[node]:
+            if not tarjan.isVisited(node):
                 tarjan.tarjan(node)
         sccList = tarjan.getSccList()
         for scc in sccList:
@@ -539,7 +551,6 @@ class AssertionOptimizer:
                     self.isLoopRelated[node] = True
                     if self.isFuncBodyHeadNode[node]:  # 函数头存在于scc，出现了递归的情况
                         self.log.fail("检测到函数递归调用的情况，该字节码无法被优化!")
-                        exit(0)
 
         # 第九步，处理可能出现的“自环”，见test12
         for node in self.nodes:
@@ -551,6 +562,7 @@ class AssertionOptimizer:
             for pair in pairs:
                 self.edges[pair[0]].remove(pair[1])
                 self.inEdges[pair[1]].remove(pair[0])
+        self.cfg.resetCsrGraph()
 
         # # 生成颜色图
         # group = {}
@@ -579,15 +591,26 @@ class AssertionOptimizer:
                 self.invalidNodeList.append(node.offset)
                 self.checkInvNode[node.offset] = True  # 默认对所有的invalid都做可达性分析
 
-        # 第二步，从起点开始做dfs遍历，完成提到的三个任务
+        # 第二步，预估路径数量，确定每个invalid节点的路径处理策略
+        invStrategy = self.__planPathSearch()
+
+        # 第三步，从起点开始做dfs遍历，完成提到的三个任务
         generator = PathGenerator(self.cfg, self.uncondJumpEdge, self.isLoopRelated,
-                                  self.node2FuncId, self.funcDict)
+                                  self.node2FuncId, self.funcDict, invStrategy)
+        generator.maxPathNum = self.maxPathNum
         generator.genPath()
         paths = generator.getPath()
         self.jumpEdgeInfo = generator.getJumpEdgeInfo()
         self.codeCopyInfo = generator.getCodecopyInfo()
-
-        # 第三步，做一个检查信息，看codecopy指令是否只是用于复制运行时的代码，或者是用于访问数据段的信息
+        self.loopRelatedInvNodes = generator.getLoopRelatedInvNodes()
+        for invNode, strategy in invStrategy.items():
+            if strategy == skipPaths:
+                self.invalidNodeList.remove(invNode)
+                self.abandonedPathExplosionInvNodes.append(invNode)
+        if len(self.abandonedPathExplosionInvNodes) != 0:
+            self.log.info("放弃优化路径数量过多的Assertion:{}".format(self.abandonedPathExplosionInvNodes))
+
+        # 第四步，做一个检查信息，看codecopy指令是否只是用于复制运行时的代码，或者是用于访问数据段的信息
         # codecopy信息，格式: [[offset push的值，offset push的字节数，offset push指令的地址， offset push指令所在的block,
         #                       size push的值，size push的字节数，size push指令的地址， size push指令所在的block]]
         # 对于运行时的codecopy，假设其用于访问数据段，因此size是不做任何处理的，只关心offset的情况。
@@ -603,18 +626,16 @@ class AssertionOptimizer:
                     removeList.append(info)
                 else:
                     self.log.fail("函数体的codecopy无法进行分析: offset未知:{}".format(info))
-                    exit(0)
             elif offset in range(self.funcBodyLength,
                                  self.funcBodyLength + self.dataSegLength):  # 不是None，则offset只能在数据段，不能为代码段
                 # 以数据段的偏移量为开头，且长度不能超出数据段
                 continue
             else:
                 self.log.fail("函数体的codecopy无法进行分析: offset不在数据段内")
-                exit(0)
         for info in removeList:
             self.codeCopyInfo.remove(info)
 
-        # 第四步，将这些路径根据invalid节点进行归类
+        # 第五步，将这些路径根据invalid节点进行归类
         for invNode in self.invalidNodeList:
             self.invalidNode2PathIds[invNode] = []
         for path in paths:
@@ -624,6 +645,41 @@ class AssertionOptimizer:
             self.invalidNode2PathIds[invNode].append(pathId)
             self.invalidPaths[pathId].setInvNode(invNode)
 
+    def __planPathSearch(self):
+        """
+        在路径搜索之前，使用缩点之后的图预估路径数量，从而尽早发现路径爆炸，并确定每个invalid节点的路径处理策略：
+        1.路径中可能包含循环体的invalid节点最终会被放弃优化，路径只做汇总，使用summarizePaths
+        2.预计路径数量超出上限的invalid节点，跳过它们的路径，使用skipPaths
+        3.其余的invalid节点记录所有路径，使用enumeratePaths
+        :return:一个映射，格式为： invalid节点:路径的处理策略
+        """
+        beginTime = time.perf_counter()
+        counter = PathCounter(self.cfg, self.uncondJumpEdge, self.isLoopRelated)
+        counter.count()
+        # 路径搜索只会进入能够到达invalid的状态，因此只有以invalid结束的路径会被遍历，不论它们是否被记录
+        searchPathNum = sum([counter.getPathNum(invNode) for invNode in self.invalidNodeList])
+        self.log.info("路径数量预估完毕，耗时{:.3f}s，一共有{}条路径，其中路径搜索会经过的以invalid结束的路径有{}条".format(
+            time.perf_counter() - beginTime, counter.getTotalPathNum(), searchPathNum))
+        if searchPathNum > self.maxSearchPathNum:
+            self.log.fail("预计路径数量超出最大限制，放弃优化")
+
+        invStrategy = {}
+        enumeratedPathNum = 0  # 预计会被记录的路径数量
+        for invNode in self.invalidNodeList:
+            if counter.isViaLoop(invNode):
+                invStrategy[invNode] = summarizePaths
+            elif counter.getPathNum(invNode) > self.maxPathNum:
+                invStrategy[invNode] = skipPaths
+            else:
+                invStrategy[invNode] = enumeratePaths
+                enumeratedPathNum += counter.getPathNum(invNode)
+        if enumeratedPathNum > self.maxPathNum:
+            self.log.fail("预计路径数量超出最大限制，放弃优化")
+        strategies = list(invStrategy.values())
+        self.log.info("{}个Assertion记录所有路径，{}个Assertion的路径只做汇总，{}个Assertion的路径数量过多被跳过".format(
+            strategies.count(enumeratePaths), strategies.count(summarizePaths), strategies.count(skipPaths)))
+        return invStrategy
+
     def __reachabilityAnalysis(self):
         """
         多线程可达性分析：对于一个invalid节点，检查它的所有路径是否可达，并根据这些可达性信息判断冗余类型
@@ -635,7 +691,7 @@ class AssertionOptimizer:
         # 如果去除这些invalid之后，没有可分析的invalid，则直接返回
         removedInvPaths = []
         for invNode in self.invalidNodeList:
-            isProcess = True
+            isProcess = invNode not in self.loopRelatedInvNodes
             for pathId in self.invalidNode2PathIds[invNode]:
                 for node in self.invalidPaths[pathId].pathNodes:
                     if self.isLoopRelated[node]:  # 存在
@@ -683,7 +739,7 @@ class AssertionOptimizer:
         self.invNodeReachable = dict(zip(self.invalidNodeList, [False for i in range(self.invalidNodeList.__len__())]))
         multiprocessing.set_start_method('spawn', force=True)  # win和linux下创建子进程的默认方式不一致，这里强制其为win下的创建方式
         cpuNum = multiprocessing.cpu_count()
-        subProcessNum = cpuNum // 2  # 更多的线程，并不是好事，反而会造成cpu拥堵，使得超时变多
+        subProcessNum = max(1, cpuNum // 2)  # 更多的线程，并不是好事，反而会造成cpu拥堵，使得超时变多
 
         self.pathIds = list(self.invalidPaths.keys())
         self.log.info("启动{}个子进程进行约束求解".format(subProcessNum))
@@ -727,29 +783,15 @@ class AssertionOptimizer:
         # 因为支配树算法中，节点是按1~N进行标号的，因此需要先做一个标号映射，并处理映射后的边，才能进行支配树的生成
         # 4.27新问题：如果有多个没有入边的节点，会导致算法不收敛
         # 最简单的触发办法：domTree.initGraph(3, [[1, 3], [2, 3], [1, 2]])
-        # 下面改变原来策略，如果是没有入边的节点，而且不是init block，都会在计算支配树时被移除，而且对应的边也移除
+        # 下面改变原来策略，如果是没有入边的节点，而且不是init block，都不会参与支配树的计算，它们的边也被忽略
         # 因为已经经过了函数检查，此时没有入边，而且没有不是Init的block都是被修复过的，要么是返回节点
         # 要么是没有入边的JUMPDEST，不影响程序的正确性
-        newNode = list(self.nodes)
-        tmpEdge = {}
-        for k, v in self.edges.items():
-            tmpEdge[k] = list(v)
-        for _to, _froms in self.inEdges.items():
-            if _to != 0 and len(_froms) == 0:  # 找到一个没有入边的，非init节点
-                newNode.remove(_to)
-                tmpEdge.pop(_to)
-
-        # mapper = GraphMapper(self.nodes, self.edges)
-        mapper = GraphMapper(newNode, tmpEdge)
-        newEdges = mapper.getNewEdges()
-        domTreeEdges = []
-        for _from in newEdges.keys():
-            for _to in newEdges[_from]:
-                domTreeEdges.append([_from, _to])
+        # 现在支配树直接在cfg的CSR图上计算，从init block不可达的节点不会被访问，等价于将它们移除
+        graph = self.cfg.getCsrGraph()
+        mapper = GraphMapper(graph)
         domTree = DominatorTreeBuilder()
-        # domTree.initGraph(self.nodes.__len__(), domTreeEdges)
-        domTree.initGraph(newNode.__len__(), domTreeEdges)
-        domTree.buildTreeFrom(1)  # 原图的偏移量为0的block对应新图中标号为1的节点
+        domTree.initGraphFromCsr(graph)
+        domTree.buildTreeFrom(mapper.offsetToNew(self.cfg.initBlockId))
         # domTree.outputIdom()
         idoms = domTree.getIdom()
         for _to in idoms.keys():
@@ -831,17 +873,17 @@ class AssertionOptimizer:
                 self.log.processing("找到和节点{}程序状态相同的地址:{}，对应的节点为:{}".format(invNode, targetAddr, targetNode))
 
             # 第三步，将这一段序列置为空指令，并且记录删除序列信息
-            for node in self.nodes:
-                if targetNode <= node <= invNode:  # invNode后的block暂时不处理
-                    beginAddr = max(targetAddr, node)
-                    endAddr = node + self.blocks[node].length
-                    for i in range(beginAddr - node, endAddr - node):
-                        self.blocks[node].bytecode[i] = 0x1f  # 置为空指令
-                        self.blocks[node].removedByte[i] = True  # 将字节标记为待删除
+            for node in self.cfg.getOffsetIndex().blocksInRange(targetNode, invNode + 1):  # invNode后的block暂时不处理
+                beginAddr = max(targetAddr, node)
+                endAddr = node + self.blocks[node].length
+                for i in range(beginAddr - node, endAddr - node):
+                    self.blocks[node].getWritableBytecode()[i] = 0x1f  # 置为空指令
+                    self.blocks[node].removedByte[i] = True  # 将字节标记为待删除
             if self.inEdges[invNode + 1].__len__() == 1:
                 # invalid的下一个block，只有一条入边，说明这个jumpdest也可以删除
-                self.blocks[invNode + 1].bytecode[0] = 0x1f
+                self.blocks[invNode + 1].getWritableBytecode()[0] = 0x1f
                 self.blocks[invNode + 1].removedByte[0] = True
+            self.cfg.resetInstrTable()  # 字节码已被修改，后续的符号执行需要重新解码
 
         if self.abandonedFullyRedundantInvNodes.__len__() != 0:  # 有移除的invalid
             self.log.info(
@@ -858,6 +900,8 @@ class AssertionOptimizer:
         self.blocks.pop(self.cfg.exitBlockId)
         curLastNode = max(self.nodes)
 
+        self.cfg.resetInstrTable()  # exit block已被移除
+        self.cfg.resetOffsetIndex()
         # 第二步，使用符号执行，找到程序状态与Invalid执行完之后相同的targetNode和targetAddr
         executor = SymbolicExecutor(self.cfg)
         for invNode in self.partiallyRedundantInvNodes:
@@ -945,10 +989,9 @@ class AssertionOptimizer:
                 newBlockInfo["length"] = originalBlock.length
                 newBlockInfo["type"] = originalBlock.blockType
                 newBlockInfo["stackBalance"] = str(originalBlock.stackBalance)
-                newBlockInfo["bytecodeHex"] = originalBlock.bytecodeStr
-                newBlockInfo["parsedOpcodes"] = originalBlock.instrsStr
+                newBlockInfo["bytecode"] = originalBlock.shareBytecode()  # 与原block共享字节码，修改时才复制
                 newBlock = BasicBlock(newBlockInfo)  # 新建一个block
-                newBlock.removedByte = dict(originalBlock.removedByte)  # 将原函数体中已经存在的完全冗余删除序列信息，添加到新函数体中
+                newBlock.removedByte = bytearray(originalBlock.removedByte)  # 将原函数体中已经存在的完全冗余删除序列信息，添加到新函数体中
                 self.nodes.append(beginOffset)
                 self.blocks[beginOffset] = newBlock
                 self.runtimeDataSegOffset += originalBlock.length  # 数据段后移
@@ -1040,13 +1083,11 @@ class AssertionOptimizer:
         self.nodes.append(newBlockOffset)
         tempExitBlock.length = self.dataSegLength + 1
         tempExitBlock.offset = newBlockOffset
-        tempBytecode = bytearray()
-        for i in range(tempExitBlock.length):
-            tempBytecode.append(0x1f)  # 空指令
-            tempExitBlock.removedByte[i] = False
-        tempExitBlock.bytecode = tempBytecode
+        tempExitBlock.bytecode = bytearray([0x1f]) * tempExitBlock.length  # 空指令
+        tempExitBlock.removedByte = bytearray(tempExitBlock.length)
         self.cfg.exitBlockId = newBlockOffset
         self.blocks[newBlockOffset] = tempExitBlock  # 复用之前的exit block
+        self.cfg.resetOffsetIndex()  # 加入了新函数体的基本块
 
     def __regenerateRuntimeBytecode(self):
         """
@@ -1263,7 +1304,7 @@ class AssertionOptimizer:
                     for i in range(-offset):  # 高位缺失的字节用0填充
                         newAddrBytes.appendleft(0x00)
                     for i in range(originalByteNum):  # 按原来的字节数填
-                        self.blocks[pushBlock].bytecode[pushAddr - pushBlockOffset + 1 + i] = newAddrBytes[
+                        self.blocks[pushBlock].getWritableBytecode()[pushAddr - pushBlockOffset + 1 + i] = newAddrBytes[
                             i]  # 改的是地址，因此需要+1
                 else:  # 新内容不能直接填入，原位置空间不够，需要移动字节码
                     self.log.warning("原push位置:{}不能直接填入新地址:{}，需要移动字节码".format(pushAddr, newAddr))
@@ -1271,11 +1312,11 @@ class AssertionOptimizer:
                     originalOpcode = 0x60 + originalByteNum - 1
                     newOpcode = originalOpcode + offset
                     assert 0x60 <= newOpcode <= 0x7f
-                    self.blocks[pushBlock].bytecode[pushAddr - pushBlockOffset] = newOpcode
+                    self.blocks[pushBlock].getWritableBytecode()[pushAddr - pushBlockOffset] = newOpcode
 
                     # 插入足够的位置，但是不填入地址，因为在下一轮试填入一定会填进新的地址
                     for i in range(offset):
-                        self.blocks[pushBlock].bytecode.insert(pushAddr - pushBlockOffset + 1, 0x00)
+                        self.blocks[pushBlock].getWritableBytecode().insert(pushAddr - pushBlockOffset + 1, 0x00)
 
                     # 接着，需要修改新旧地址映射，以及跳转信息中的字节量（供下一次试填入使用)
                     for original in self.originalToNewAddr.keys():
@@ -1289,11 +1330,10 @@ class AssertionOptimizer:
         # 第六步，将这些字节码拼成一个整体
         tempFuncBodyLen = 0
         self.blocks[self.cfg.exitBlockId].length = 0  # 此时exitblock不再代表数据段
-        self.blocks[self.cfg.exitBlockId].bytecode = bytearray()
-        self.newFuncBodyOpcode = deque()  # 效率更高
+        self.blocks[self.cfg.exitBlockId].bytecode = bytes()
+        self.newFuncBodyOpcode = bytearray()
         for node in self.nodes:  # 有序的
-            for bc in self.blocks[node].bytecode:
-                self.newFuncBodyOpcode.append(bc)
+            self.newFuncBodyOpcode += self.blocks[node].bytecode
             tempFuncBodyLen += self.blocks[node].length
         self.runtimeDataSegOffset = tempFuncBodyLen - self.funcBodyLength  # 同时记录数据段的偏移量，用于构造函数中对数据段访问的重定位
 
@@ -1307,6 +1347,7 @@ class AssertionOptimizer:
         同时还做一个假设：所有在构造函数里的codecopy，其参数都是在同一个block内push进去的
         :return:
         """
+        self.constructorCfg = self.etherSolver.getConstructorCfg()  # 第一次获取时才会构建
         self.cfg = self.constructorCfg  # 重新设置cfg
         self.nodes = list(self.cfg.blocks.keys())  # 存储点，格式为 [n1,n2,n3...]
         self.blocks = self.cfg.blocks
@@ -1345,7 +1386,6 @@ class AssertionOptimizer:
                     continue
                 else:
                     self.log.fail("构造函数的codecopy无法进行分析: offset为{}，size为{}".format(info[0], info[4]))
-                    exit(0)
             elif offset in range(self.constructorFuncBodyLength,
                                  self.constructorFuncBodyLength + self.constructorDataSegLength):
                 # 访问的是构造函数的数据段
@@ -1366,7 +1406,6 @@ class AssertionOptimizer:
                 # 访问其他地址
                 # print(self.constructorFuncBodyLength + self.constructorDataSegLength,self.funcBodyLength + self.dataSegLength)
                 self.log.fail("构造函数的codecopy无法进行分析: offset为{}，size为{}".format(info[0], info[4]))
-                exit(0)
         for info in removeList:
             self.codeCopyInfo.remove(info)
 
@@ -1396,7 +1435,6 @@ class AssertionOptimizer:
                 offset = newByteNum - offsetByteNum
                 if offset > 0:
                     self.log.fail("构造函数的codecopy无法填入新信息")  # 程序已经结束
-                    exit(0)
                 newBytes = deque()  # 新地址的字节码
                 while newOffset != 0:
                     newBytes.appendleft(newOffset & 0xff)  # 取低八位
@@ -1404,7 +1442,7 @@ class AssertionOptimizer:
                 for i in range(-offset):  # 高位缺失的字节用0填充
                     newBytes.appendleft(0x00)
                 for i in range(offsetByteNum):  # 按原来的字节数填
-                    self.blocks[info[3]].bytecode[info[2] - info[3] + 1 + i] = newBytes[i]  # 改的是地址，因此需要+1
+                    self.blocks[info[3]].getWritableBytecode()[info[2] - info[3] + 1 + i] = newBytes[i]  # 改的是地址，因此需要+1
             if newSize is not None:
                 newByteNum = 0  # 新内容需要的字节数
                 tmp = newSize
@@ -1414,7 +1452,6 @@ class AssertionOptimizer:
                 offset = newByteNum - sizeByteNum
                 if offset > 0:
                     self.log.fail("构造函数的codecopy无法填入新信息")  # 程序已经结束
-                    exit(0)
                 newBytes = deque()  # 新地址的字节码
                 while newSize != 0:
                     newBytes.appendleft(newSize & 0xff)  # 取低八位
@@ -1422,27 +1459,29 @@ class AssertionOptimizer:
                 for i in range(-offset):  # 高位缺失的字节用0填充
                     newBytes.appendleft(0x00)
                 for i in range(sizeByteNum):  # 按原来的字节数填
-                    self.blocks[info[7]].bytecode[info[6] - info[7] + 1 + i] = newBytes[i]  # 改的是地址，因此需要+1
+                    self.blocks[info[7]].getWritableBytecode()[info[6] - info[7] + 1 + i] = newBytes[i]  # 改的是地址，因此需要+1
 
         # 第四步，将构造字节码拼成一个新的整体
-        self.constructorOpcode = deque()  # 效率更高
+        self.constructorOpcode = bytearray()
         self.nodes.sort()
         for node in self.nodes:
             if node < self.cfg.exitBlockId:  # 不是构造函数的函数字节码不要
-                for bc in self.blocks[node].bytecode:
-                    self.constructorOpcode.append(bc)
+                self.constructorOpcode += self.blocks[node].bytecode
 
     def __outputFile(self):
         '''
-        将修改后的cfg写回到文件中
+        将修改后的cfg写回到文件中，没有给出输出路径时只记录优化后的字节码
         :return:
         '''
-        constructorStr = "".join(['{:02x}'.format(num) for num in self.constructorOpcode])
-        newFuncBodyStr = "".join(['{:02x}'.format(num) for num in self.newFuncBodyOpcode])
+        # 各部分都是字节序列，拼接之后一次性转换为十六进制字符串
+        self.optimizedBytecode = b"".join(
+            [self.constructorOpcode, self.constructorDataSeg, self.newFuncBodyOpcode, self.dataSeg]).hex()
+        if self.outputPath is None:
+            return
         self.log.info("正在将优化后的字节码写入到文件: {}".format(self.outputPath + self.outputName))
         with open(self.outputPath + self.outputName, "w+") as f:
-            f.write(
-                constructorStr + self.constructorDataSegStr + newFuncBodyStr + self.dataSegStr)
+            f.write(self.optimizedBytecode)
+        self.log.info("写入完毕")
 
     def __constrainWorkerThread(self):
         manager = multiprocessing.Manager()
@@ -0,0 +1,40 @@
+class CallReturnMatcher:
+    '''
+    将无条件跳转边两两匹配为调用边与返回边
+    调用边的四元组为(a,a+1,None,None)，返回边的四元组为(None,None,b-1,b)，当a==b-1时两者匹配
+    因此分别以四元组的前两项与后两项为键建立索引，做一次哈希连接即可，不需要两两比较
+    '''
+
+    def __init__(self, uncondJumpEdges: list):
+        """
+        :param uncondJumpEdges:所有无条件跳转的边，类型为JumpEdge
+        """
+        self.uncondJumpEdges = uncondJumpEdges
+        # 匹配的结果，格式为 (函数体第一个block的offset,函数体最后一个block的offset):[(调用者的起始node,返回边的目的node)]
+        self.funcRange2Calls = {}
+
+    def match(self):
+        """
+        进行匹配，匹配成功的边会被标记为调用边或返回边
+        结果与按边的顺序两两比较时完全一致，包括函数范围的顺序，以及每个函数内调用的顺序
+        :return:None
+        """
+        returnEdges = {}  # 以四元组后两项为键的索引，格式为 (b-1,b):[返回边]，每个列表内保持边原来的顺序
+        for e in self.uncondJumpEdges:
+            if e.tetrad[2] is not None:
+                returnEdges.setdefault((e.tetrad[2], e.tetrad[3]), []).append(e)
+
+        for e1 in self.uncondJumpEdges:
+            if e1.tetrad[0] is None:  # None之间是不匹配的
+                continue
+            for e2 in returnEdges.get((e1.tetrad[0], e1.tetrad[1]), ()):  # 匹配成功，e1为调用边，e2为返回边
+                # 4.21新问题：如果是添加了修复边的话，可能会出现，调用边不是push addr,jump的结构
+                # 比如说 AND JUMP。此时要多加一个限制，就是调用边指向的节点的offset，要比返回边的起始节点小
+                if e1.targetNode > e2.beginNode:
+                    continue
+                e1.isCallerEdge = True
+                e2.isReturnEdge = True
+                self.funcRange2Calls.setdefault((e1.targetNode, e2.beginNode), []).append((e1.beginNode, e2.targetNode))
+
+    def getFuncRange2Calls(self):
+        return self.funcRange2Calls
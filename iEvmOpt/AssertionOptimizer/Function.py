@@ -1,28 +1,17 @@
 class Function:
-    def __init__(self, id: int, firstBodyBlockOffset: int, lastBodyBlockOffset: int, funcBodyNodes: list,
-                 graphEdges: dict):
+    def __init__(self, id: int, firstBodyBlockOffset: int, lastBodyBlockOffset: int, funcBodyNodes: list):
         self.funcId = id
         self.firstBodyBlockOffset = firstBodyBlockOffset
         self.lastBodyBlockOffset = lastBodyBlockOffset
         self.funcBodyNodes = funcBodyNodes  # 函数体的节点的offset
 
-        self.funcSubGraphEdges = {}  # 函数子图的出边表.注意，这个子图是加了边(调用->返回)的，并不是cfg里原来的子图
-        self.__genSubGraphEdges(graphEdges)
+        # 函数子图不再单独生成出边表，需要时直接在cfg的CSR图上按funcBodyNodes取子图
+        # 注意，函数识别时的CSR图是加了边(调用->返回)的，并不是cfg里原来的子图
 
         # 部分冗余需要用到的信息
         self.invalidNodes = []  # 记录该函数内需要优化的部分冗余的invalid
         self.removedRangeInfo = {}  # 记录需要删除的区间信息，格式为： invNode:[targetAddr,targetNode,endAddr]
 
-    def __genSubGraphEdges(self, graphEdges: dict):
-        # 生成函数子图的边
-        checkSet = set(self.funcBodyNodes)
-        for i in self.funcBodyNodes:
-            self.funcSubGraphEdges[i] = []
-        for node in self.funcBodyNodes:
-            for out in graphEdges[node]:
-                if out in checkSet:  # 找到一个指向内部节点的边
-                    self.funcSubGraphEdges[node].append(out)
-
     def addPartiallyInvalidNode(self, invNode: int):
         """
         添加函数内部分冗余的节点
@@ -44,5 +33,4 @@ class Function:
         print("Function'Id:{}".format(self.funcId))
         print("Function'firstBodyBlockOffset:{}".format(self.firstBodyBlockOffset))
         print("Function'lastBodyBlockOffset:{}".format(self.lastBodyBlockOffset))
-        print("Function'funcBodyNodes:{}".format(self.funcBodyNodes))
-        print("Function'subGraphEdges:{}\n".format(self.funcSubGraphEdges))
+        print("Function'funcBodyNodes:{}\n".format(self.funcBodyNodes))
@@ -0,0 +1,142 @@
+from Cfg.Cfg import Cfg
+from GraphTools.SccCompressor import SccCompressor
+
+
+class PathCounter:
+    '''
+    在不枚举路径的情况下，预先计算路径搜索将会找到的路径数量，用于在路径搜索之前判断是否会出现路径爆炸
+    路径搜索时，进入函数体之后只会从返回边回到调用者push的返回地址，因此这里使用一个考虑了函数调用的图：
+    去掉所有的返回边，保留调用边，并且对每一条调用边，添加一条从调用者指向返回地址的边
+    对这个图缩点得到DAG之后做两次动态规划，路径数量使用python的大整数表示，不会溢出：
+    1.按拓扑序的逆序，求出从每个节点出发，在函数返回之前结束的路径数量，以及到达函数返回边的路径数量
+    2.按拓扑序，求出从起始节点出发，到达每个节点的路径数量
+    强连通分量被视为一个节点，环内的路径只按经过一次计算，因此对于包含环的路径，结果只是一个估计值
+    '''
+
+    def __init__(self, cfg: Cfg, uncondJumpEdges: list, isLoopRelated: dict):
+        """
+        :param cfg:cfg
+        :param uncondJumpEdges:无条件跳转边，格式为： [e1,e2]，需要已经完成了调用边与返回边的匹配
+        :param isLoopRelated:一个映射，记录节点是否为环相关
+        """
+        self.cfg = cfg
+        self.blocks = cfg.blocks
+        self.isLoopRelated = isLoopRelated
+        self.succs = {}  # 普通的出边，格式为 node:[to1,to2...]
+        self.calls = {}  # 调用边，格式为 node:[(函数体的起始节点,返回地址)]
+        self.isReturnNode = {}  # 节点是否有返回边
+        edgeType = {}  # 无条件跳转边的类型，格式为 (起始节点,终止节点):JumpEdge
+        for e in uncondJumpEdges:
+            edgeType[(e.beginNode, e.targetNode)] = e
+        for node in self.blocks.keys():
+            self.succs[node] = []
+            self.calls[node] = []
+            self.isReturnNode[node] = False
+            for _to in cfg.edges[node]:
+                e = edgeType.get((node, _to))
+                if e is not None and e.isCallerEdge:
+                    self.calls[node].append((_to, e.tetrad[1]))
+                elif e is not None and e.isReturnEdge:
+                    self.isReturnNode[node] = True
+                else:
+                    self.succs[node].append(_to)
+
+        self.leafPathNum = {}  # 从某个节点出发，在返回到调用者之前就结束的路径数量
+        self.returnPathNum = {}  # 从某个节点出发，到达所在函数的返回边的路径数量
+        self.returnViaLoop = {}  # 从某个节点出发到达返回边的路径中，是否存在经过环相关节点的路径
+        self.pathNum = {}  # 从起始节点出发，到达某个节点的路径数量
+        self.viaLoop = {}  # 从起始节点出发到达某个节点的路径中，是否存在经过环相关节点的路径
+
+    def count(self):
+        # 第一步，生成考虑了函数调用的图，并进行缩点
+        edges = {}
+        for node in self.blocks.keys():
+            edges[node] = list(self.succs[node])
+            for funcBegin, returnAddr in self.calls[node]:
+                edges[node].append(funcBegin)
+                edges[node].append(returnAddr)
+        compressor = SccCompressor()
+        compressor.setInfo(list(self.blocks.keys()), edges)
+        compressor.compress()
+        sccList = compressor.getSccList()
+        node2SccId = {}
+        for sccId, scc in enumerate(sccList):
+            for node in scc:
+                node2SccId[node] = sccId
+
+        # 第二步，强连通分量的编号从小到大，即拓扑序的逆序，求出每个节点出发的路径数量
+        leafPathNum, returnPathNum, returnViaLoop = self.leafPathNum, self.returnPathNum, self.returnViaLoop
+        for sccId, scc in enumerate(sccList):
+            leafNum, returnNum, retViaLoop = 0, 0, False
+            for node in scc:
+                if self.blocks[node].jumpType == "terminal":  # 包括invalid，路径在这里结束
+                    leafNum += 1
+                    continue
+                if self.isReturnNode[node]:
+                    returnNum += 1
+                for _to in self.succs[node]:
+                    if node2SccId[_to] == sccId:
+                        continue
+                    leafNum += leafPathNum[_to]
+                    returnNum += returnPathNum[_to]
+                    retViaLoop = retViaLoop or returnViaLoop[_to]
+                for funcBegin, returnAddr in self.calls[node]:
+                    if node2SccId[funcBegin] == sccId:  # 递归调用，路径搜索时会放弃优化
+                        continue
+                    leafNum += leafPathNum[funcBegin]  # 在被调用的函数内结束
+                    if node2SccId[returnAddr] == sccId:
+                        continue
+                    num = returnPathNum[funcBegin]  # 从被调用的函数返回之后继续
+                    leafNum += num * leafPathNum[returnAddr]
+                    returnNum += num * returnPathNum[returnAddr]
+                    if num != 0 and returnPathNum[returnAddr] != 0:
+                        retViaLoop = retViaLoop or returnViaLoop[funcBegin] or returnViaLoop[returnAddr]
+            if returnNum != 0 and any([self.isLoopRelated[node] for node in scc]):
+                retViaLoop = True
+            for node in scc:
+                leafPathNum[node] = leafNum
+                returnPathNum[node] = returnNum
+                returnViaLoop[node] = retViaLoop
+
+        # 第三步，强连通分量的编号从大到小，即按拓扑序，求出从起始节点到达每个节点的路径数量
+        pathNum, viaLoop = self.pathNum, self.viaLoop
+        for node in self.blocks.keys():
+            pathNum[node] = 0
+            viaLoop[node] = False
+        pathNum[self.cfg.initBlockId] = 1
+        for sccId in range(len(sccList) - 1, -1, -1):
+            scc = sccList[sccId]
+            num = sum([pathNum[node] for node in scc])
+            if num == 0:  # 从起始节点不可达
+                continue
+            isViaLoop = any([viaLoop[node] or self.isLoopRelated[node] for node in scc])
+            for node in scc:
+                pathNum[node] = num
+                viaLoop[node] = isViaLoop
+            for node in scc:
+                for _to in self.succs[node]:
+                    if node2SccId[_to] != sccId:
+                        pathNum[_to] += num
+                        viaLoop[_to] = viaLoop[_to] or isViaLoop
+                for funcBegin, returnAddr in self.calls[node]:
+                    if node2SccId[funcBegin] != sccId:
+                        pathNum[funcBegin] += num
+                        viaLoop[funcBegin] = viaLoop[funcBegin] or isViaLoop
+                    if node2SccId[returnAddr] != sccId and returnPathNum[funcBegin] != 0:
+                        pathNum[returnAddr] += num * returnPathNum[funcBegin]
+                        viaLoop[returnAddr] = viaLoop[returnAddr] or isViaLoop or returnViaLoop[funcBegin]
+
+    def getTotalPathNum(self):
+        """ 获取路径搜索时，从起始节点出发的所有路径的数量，包括不以invalid结束的路径
+        """
+        return self.leafPathNum[self.cfg.initBlockId]
+
+    def getPathNum(self, node: int):
+        """ 获取从起始节点出发，到达某个节点的路径数量，对于invalid节点即为它的路径数量
+        """
+        return self.pathNum[node]
+
+    def isViaLoop(self, node: int):
+        """ 从起始节点出发到达某个节点的路径中，是否存在经过环相关节点的路径
+        """
+        return self.viaLoop[node]
@@ -1,32 +1,36 @@
 # 用于生成有向图中任意两点之间的所有路径
 # 返回的格式为：[[路径1从起点到终点经过的点],[路径1从起点到终点经过的点]...]
 # 需要注意，图中是没有有向环的
-import sys
-
 from AssertionOptimizer.Path import Path
 from AssertionOptimizer.SymbolicExecutor import SymbolicExecutor
 from AssertionOptimizer.TagStacks.SimplifiedExecutor import SimplifiedExecutor
 from Cfg.Cfg import Cfg
-from Utils import Stack
+from Utils import PersistentStack
 from Utils.Logger import Logger
 from AssertionOptimizer.TagStacks.TagStack import TagStack
 import time
 
+# 对每个invalid节点的路径的处理策略，在路径搜索之前根据预估的路径数量确定
+enumeratePaths = "enumerate"  # 记录所有路径
+summarizePaths = "summarize"  # 路径中可能包含循环体，一旦发现包含循环体的路径，就丢弃已经记录的路径，之后的路径只计数
+skipPaths = "skip"  # 路径数量过多，不记录路径，只计数
+
 
 class PathGenerator:
     def __init__(self, cfg: Cfg, uncondJumpEdges: list, isLoopRelated: dict, node2FuncId: dict,
-                 funcBodyDict: dict):
+                 funcBodyDict: dict, invStrategy: dict = None):
         """初始化路径搜索需要的信息
         :param Cfg:cfg
         :param uncondJumpEdges: 无条件跳转边，格式为： [e1,e2]
         :param isLoopRelated:一个映射，记录节点是否为环相关
         :param node2FuncId:一个映射，记录节点对应的函数id
         :param funcBodyDict:一个映射，格式为： funcId:[函数包含的节点offset]
+        :param invStrategy:一个映射，格式为： invalid节点:路径的处理策略，没有给出的invalid节点使用enumeratePaths
         """
         self.cfg = cfg
         self.blocks = cfg.blocks
         self.nodes = list(cfg.blocks.keys())
-        self.edges = cfg.edges
+        self.graph = cfg.getCsrGraph()  # cfg的CSR图，用于检查跳转边
         self.beginNode = cfg.initBlockId
         self.uncondJumpEdges = {}  # 记录调用边信息。格式为 "[起始点的offset，终止点的offset]":边对象
         for e in uncondJumpEdges:
@@ -36,12 +40,15 @@ class PathGenerator:
         self.node2FuncId = node2FuncId  # 用于检测递归调用和scc访问控制，注意，不是函数的节点会被标成None
         self.funcBodyDict = funcBodyDict  # 用于检测递归调用
         self.isInvalidNode = dict(zip(self.nodes, [False for i in range(self.nodes.__len__())]))  # 某个节点是否是invalid
-        self.sccVisiting = {}  # 基于返回地址栈的访问控制，格式： 函数调用链字符串:访问控制dict
+        self.sccVisiting = set()  # 基于返回地址栈的访问控制，只记录当前路径上正在访问的环相关节点，格式：(调用上下文id,节点)
         # 解释一下，不能使用基于函数调用链的scc访问控制，否则当出现循环内调用函数的时候，会出现死循环
 
         self.jumpEdgeInfo = []  # 跳转边信息，格式为:[[push的值，push的字节数，push指令的地址，push指令所在的block,jump所在的block]]
         self.pathId = 0  # 路径的id
         self.paths = []  # 记录寻找到的路径，格式为路径对象
+        self.invStrategy = invStrategy if invStrategy is not None else {}
+        self.invPathNum = {}  # 每个invalid节点实际找到的路径数量，包括没有记录的路径，格式为： invalid节点:路径数量
+        self.loopRelatedInvNodes = set()  # 使用summarizePaths策略，且找到了包含循环体的路径的invalid节点
 
         # copdcopy信息，格式: [[offset push的值，offset push的字节数，offset push指令的地址， offset push指令所在的block,
         #                       size push的值，size push的字节数，size push指令的地址， size push指令所在的block，codecopy所在的block]]
@@ -49,8 +56,31 @@ class PathGenerator:
         self.codecopyInfo = []
         self.log = Logger()
 
-        # 控制搜索深度，增加超时/路径爆炸限制
-        sys.setrecursionlimit(2000)  # 设置最大递归深度
+        # 遍历执行状态时所有状态共享的执行器，均使用不可变链表实现的栈，执行每个状态之前从快照恢复
+        self.tagStack = TagStack(cfg)
+        self.executor = SimplifiedExecutor(cfg, isPersistent=True)
+        # 执行状态由 (节点,调用上下文id,进入节点时tagstack和执行器栈中的所有元素) 唯一确定，状态相同时之后的执行过程也完全相同
+        # 两个栈都使用哈希化的节点表示，内容相同的栈对应同一个栈id，栈为空时id为0
+        self.stateIds = {}  # 格式为 (节点,调用上下文id,tagstack的栈id,执行器的栈id):状态id，起点的状态id为0
+        self.tagNodeIds = {}  # tagstack的节点，格式为 (元素,下一个节点的栈id):栈id
+        self.executorNodeIds = {}  # 执行器栈的节点，格式同上
+        self.stackNodeMemo = {}  # 已经求出栈id的节点，格式为 id(节点):(节点,栈id)，保留节点的引用使id(节点)不会被复用
+        self.stateNodes = []  # 下标为状态id，状态对应的节点
+        self.stateContexts = []  # 状态对应的调用上下文id
+        self.stateSnapshots = []  # 进入状态时执行器和调用上下文的快照，执行完基本块之后置为None
+        self.stateSuccs = []  # 状态的后继状态id，顺序与出边的顺序一致，还没有执行过的状态为None
+        self.stateIsInvalid = []  # 状态是否执行到了invalid
+        self.stateIsComplete = []  # 状态的子树是否已经完整地遍历过，之后再遇到时可以直接跳过
+        self.canReachInvalid = []  # 状态是否能够到达某个执行到了invalid的状态
+        self.pathRecorder = PersistentStack()  # 路径搜索时，当前路径经过的节点
+        # 返回地址栈使用哈希化的树表示，每个不同的返回地址栈对应一个调用上下文id，相同的返回地址栈id也相同
+        # 上下文id为0时返回地址栈为空，进行调用时根据 (当前上下文id,返回地址) 找到或新建子上下文，返回时回到父上下文
+        self.contexts = [(-1, None)]  # 下标为上下文id，格式为 (父上下文id,栈顶的返回地址)
+        self.contextIds = {}  # 格式为 (父上下文id,返回地址):上下文id
+        self.curContext = 0  # 当前的调用上下文id
+        self.visitNum = 0  # 路径搜索时访问节点的次数
+
+        # 增加超时/路径爆炸限制
         # self.timeoutLimit = 600  # 最大搜索时间，设置为10min
         self.timeoutLimit = 9999999  # 最大搜索时间
         self.beginTime = None  # 开始搜索时间
@@ -58,10 +88,13 @@ class PathGenerator:
         self.maxPathNum = 1000000  # 100w
 
     def genPath(self):
-        # dfs寻路
         self.beginTime = time.perf_counter()  # 记录开始时间
-        self.__dfs(self.beginNode, TagStack(self.cfg), Stack(), Stack(), SimplifiedExecutor(self.cfg),
-                   [-1])  # 函数调用链放个-1，防止为空，实际是从0开始的
+        # 第一步，遍历所有可达的执行状态，记录跳转边和codecopy信息，并建立状态转移图
+        self.__exploreStates()
+        # 第二步，在状态转移图上做反向可达性分析，找出能够到达invalid的状态
+        self.__markInvalidReachable()
+        # 第三步，只在能够到达invalid的状态中搜索路径
+        self.__searchPaths()
 
         # 因为得到的跳转信息和codecopy信息有可能是重复的，这里需要做一个去重处理
         tempDict = {}
@@ -81,19 +114,216 @@ class PathGenerator:
                 infoNum += 1  # 一次push即可
         assert infoNum == self.jumpEdgeInfo.__len__(), "{},{}".format(infoNum, self.jumpEdgeInfo.__len__())
 
-    # 使用符号执行器进行dfs
-    def __dfs(self, curNode: int, parentTagStack: TagStack, parentReturnAddrStack: Stack, parentPathRecorder: Stack,
-              parentExecutor: SimplifiedExecutor, curCallChain: list):
+    def __checkTimeout(self):
+        curTime = time.perf_counter()
+        if curTime - self.beginTime > self.timeoutLimit:  # 超时
+            self.log.fail("路径搜索超时，放弃优化")
+
+    def __exploreStates(self):
+        """
+        遍历从起点可达的所有执行状态，记录跳转边和codecopy信息，并建立状态转移图
+        遍历的顺序以及环相关节点的访问控制都与逐个节点执行的dfs一致，因此访问到的状态与之前完全相同，不会多出跳转边信息：
+        1.每个状态只在第一次访问时执行一次基本块，同时求出它的所有后继状态，之后再访问时直接沿着记录的后继走
+        2.一个状态的所有后继都走完之后，如果子树中没有因为它上方路径中的环相关节点而被剪掉的分支，
+          说明子树的遍历结果与到达它的路径无关，将其标记为已完成，之后再遇到时直接跳过；否则之后遇到时需要重新遍历，
+          而在其他路径下重新遍历时剪掉的分支只会更少，因此不会遗漏之前的dfs能够访问到的状态
+        使用显式的栈进行dfs，栈帧的格式为：[状态id，下一个要走的后继的下标，子树依赖的最浅的栈帧深度]
+        """
+        sccVisiting = {}  # 当前路径上正在访问的环相关节点，格式为 (调用上下文id,节点):加入时的栈帧深度
+        frames = []
+        self.__internState(self.beginNode)
+        self.__enterState(0, frames, sccVisiting)
+        while frames:
+            frame = frames[-1]
+            succs, i = self.stateSuccs[frame[0]], frame[1]
+            if i == len(succs):  # 所有后继都已经走完，返回父状态
+                frames.pop()
+                self.__leaveState(frame, frames, sccVisiting)
+                continue
+            frame[1] = i + 1
+            self.__enterState(succs[i], frames, sccVisiting)
 
+    def __internState(self, curNode: int):
         """
-        根据简化版的符号执行器，来进行搜索
+        找出或者新建即将进入curNode时的执行状态，此时执行器和调用上下文已经是进入节点时的状态
+        新建的状态会记录执行器的快照，第一次访问时从快照开始执行基本块
+        :return:状态id
         """
+        tagStackId = self.__internStackNode(self.tagStack.getSnapshot(), self.tagNodeIds, tuple)
+        executorId = self.__internStackNode(self.executor.getSnapshot(), self.executorNodeIds, None)
+        key = (curNode, self.curContext, tagStackId, executorId)
+        stateId = self.stateIds.get(key)
+        if stateId is not None:
+            return stateId
+        stateId = len(self.stateNodes)
+        self.stateIds[key] = stateId
+        self.stateNodes.append(curNode)
+        self.stateContexts.append(self.curContext)
+        self.stateSuccs.append(None)
+        self.stateIsInvalid.append(False)
+        self.stateIsComplete.append(False)
+        self.stateSnapshots.append((self.tagStack.getSnapshot(), self.executor.getSnapshot(), self.curContext))
+        return stateId
 
-        # 先检查有没有超时
-        curTime = time.perf_counter()
-        if curTime - self.beginTime > self.timeoutLimit:  # 超时
-            self.log.fail("路径搜索超时，放弃优化")
-            exit(0)
+    def __internStackNode(self, node: tuple, nodeIds: dict, itemKey):
+        """
+        求出不可变链表中的节点对应的栈id，内容相同的栈id也相同
+        每个节点只在第一次遇到时求一次栈id，因此只需要从栈顶往下走到第一个已经求过的节点
+        :param node:栈顶节点，格式为 (元素,下一个节点,栈的大小)
+        :param nodeIds:该种栈的节点表，格式为 (元素,下一个节点的栈id):栈id
+        :param itemKey:将元素转换为可哈希的值的函数，为None时直接使用元素
+        :return:栈id
+        """
+        newNodes = []
+        stackId = 0
+        while node[2] > 0:
+            memo = self.stackNodeMemo.get(id(node))
+            if memo is not None:
+                stackId = memo[1]
+                break
+            newNodes.append(node)
+            node = node[1]
+        for node in reversed(newNodes):
+            key = (node[0] if itemKey is None else itemKey(node[0]), stackId)
+            stackId = nodeIds.get(key)
+            if stackId is None:
+                stackId = len(nodeIds) + 1
+                nodeIds[key] = stackId
+            self.stackNodeMemo[id(node)] = (node, stackId)
+        return stackId
+
+    def __enterState(self, stateId: int, frames: list, sccVisiting: dict):
+        """
+        在遍历执行状态时进入一个状态，需要继续遍历时为该状态压入一个栈帧
+        :param stateId:状态id
+        :param frames:dfs的栈帧
+        :param sccVisiting:当前路径上正在访问的环相关节点
+        """
+        if self.stateIsComplete[stateId]:  # 子树已经完整地遍历过了
+            return
+        self.__checkTimeout()
+        curNode, curContext = self.stateNodes[stateId], self.stateContexts[stateId]
+        depth = len(frames)
+        if self.isLoopRelated[curNode]:
+            visitDepth = sccVisiting.get((curContext, curNode))
+            if visitDepth is not None:  # 当前节点在当前调用上下文下正在被访问，父状态的子树依赖于该节点所在的栈帧
+                frames[-1][2] = min(frames[-1][2], visitDepth)
+                return
+            sccVisiting[(curContext, curNode)] = depth
+        if self.stateSuccs[stateId] is None:  # 第一次访问，执行基本块
+            self.__expandState(stateId)
+        frames.append([stateId, 0, depth])
+
+    def __leaveState(self, frame: list, frames: list, sccVisiting: dict):
+        """
+        在遍历执行状态时离开一个状态，消除访问限制，并判断它的子树是否已经完整地遍历过
+        :param frame:离开的状态的栈帧，已经从frames中弹出
+        """
+        stateId, depth = frame[0], len(frames)
+        curNode = self.stateNodes[stateId]
+        if self.isLoopRelated[curNode]:
+            del sccVisiting[(self.stateContexts[stateId], curNode)]
+        if frame[2] >= depth:  # 子树只被它自身及以下的节点剪枝过，遍历结果与到达它的路径无关
+            self.stateIsComplete[stateId] = True
+        else:
+            frames[-1][2] = min(frames[-1][2], frame[2])
+
+    def __expandState(self, stateId: int):
+        """
+        从状态的快照开始执行基本块，记录跳转边和codecopy信息，并求出所有的后继状态
+        :param stateId:状态id
+        """
+        self.__restoreSnapshot(self.stateSnapshots[stateId])
+        self.stateSnapshots[stateId] = None  # 之后不会再执行，不必再保留
+        self.stateSuccs[stateId] = []
+        curNode = self.stateNodes[stateId]
+
+        # 第一步，进行符号执行和tagstack执行
+        jumpType = self.blocks[curNode].jumpType
+        pushInfo, isInvalid = self.__execBlock(curNode, jumpType)  # block末尾处的push信息，是否执行到了invalid
+        if isInvalid:
+            self.stateIsInvalid[stateId] = True
+            return
+
+        # 第二步，根据跳转的类型，记录跳转边的信息
+        if jumpType in ["unconditional", "conditional"]:  # 是一条跳转边
+            pushInfo.append(curNode)  # 添加一条信息，就是jump所在的block
+            self.jumpEdgeInfo.append(pushInfo)
+        elif jumpType == "terminal":  # 没有后继
+            return
+
+        # 第三步，找出所有的出边，求出对应的后继状态
+        if jumpType == "unconditional":
+            targetNode = pushInfo[0]  # 即将跳往的目的block
+            jumpEdge = self.uncondJumpEdges[[curNode, targetNode].__str__()]
+            if jumpEdge.isCallerEdge:  # 是一条调用边
+                outEdges = [(targetNode, "call", jumpEdge.tetrad[1])]
+            elif jumpEdge.isReturnEdge:  # 是一条返回边
+                outEdges = [(targetNode, "return", targetNode)]
+            else:  # 是一条普通的uncondjump边
+                outEdges = [(targetNode, None, None)]
+        elif jumpType == "conditional":  # 两条边都走一次
+            outEdges = [(pushInfo[0], None, None), (curNode + self.blocks[curNode].length, None, None)]
+        elif jumpType == "fall":
+            outEdges = [(curNode + self.blocks[curNode].length, None, None)]
+        else:  # terminal，前面已经返回了
+            assert 0  # 返回
+        snapshot = (self.tagStack.getSnapshot(), self.executor.getSnapshot(), self.curContext)
+        for outEdge in outEdges:
+            self.__restoreSnapshot(snapshot)
+            self.__applyReturnAddrOp(outEdge)
+            self.stateSuccs[stateId].append(self.__internState(outEdge[0]))
+
+    def __markInvalidReachable(self):
+        """
+        在状态转移图上，从所有执行到了invalid的状态出发做反向遍历，标记能够到达invalid的状态
+        状态中包含了调用上下文，因此函数返回时只会回到调用它的地方，不会把其他调用点的可达性混在一起
+        """
+        preds = [[] for i in range(len(self.stateNodes))]  # 状态的前驱状态
+        for stateId, succs in enumerate(self.stateSuccs):
+            if succs is None:  # 只被剪枝过，没有执行过的状态
+                continue
+            for succ in succs:
+                preds[succ].append(stateId)
+        self.canReachInvalid = list(self.stateIsInvalid)
+        workList = [stateId for stateId, isInvalid in enumerate(self.stateIsInvalid) if isInvalid]
+        while workList:
+            stateId = workList.pop()
+            for pred in preds[stateId]:
+                if not self.canReachInvalid[pred]:
+                    self.canReachInvalid[pred] = True
+                    workList.append(pred)
+
+    def __searchPaths(self):
+        """
+        在状态转移图上搜索从起点到invalid的所有路径，后继状态已经在第一步中确定，不需要再执行基本块
+        只进入能够到达invalid的状态，以return、stop等结束的分支在进入之前就被剪掉了
+        环相关节点的访问控制与逐个节点执行时一致，因此得到的路径及其顺序也完全一致
+        栈帧的格式为：[状态id，下一个要走的后继的下标]
+        """
+        if not self.canReachInvalid or not self.canReachInvalid[0]:  # 起点无法到达任何invalid
+            return
+        frames = []
+        self.__enterPathState(0, frames)
+        while frames:
+            frame = frames[-1]
+            succs, i = self.stateSuccs[frame[0]], frame[1]
+            if i == len(succs):  # 所有后继都已经走完，返回父节点
+                frames.pop()
+                self.__leavePathState(frame[0])
+                continue
+            frame[1] = i + 1
+            if self.canReachInvalid[succs[i]]:
+                self.__enterPathState(succs[i], frames)
+
+    def __enterPathState(self, stateId: int, frames: list):
+        """
+        在路径搜索中进入一个状态，需要继续搜索时为该状态压入一个栈帧
+        :param stateId:进入的状态，必须能够到达invalid
+        :param frames:路径搜索的栈帧
+        """
+        self.visitNum += 1
+        self.__checkTimeout()
 
         '''
         如何对scc进行访问限制，是一个问题
@@ -113,47 +343,80 @@ class PathGenerator:
         }
         
         当调用f(-1)和f(1)的时候，它们在第一次进入函数体g时，使用的访问限制是相同的
+        返回地址栈由调用上下文id标识，只有环相关节点需要访问限制，其余节点不需要做任何处理
         '''
-        curCallChainStr = str(parentReturnAddrStack.getStack())
-        if self.isLoopRelated[curNode]:  # 当前访问的是一个scc，需要将其标记为true，防止死循环
-            if curCallChainStr not in self.sccVisiting.keys():  # 还没有建立访问限制
-                self.sccVisiting[curCallChainStr] = dict(
-                    zip(self.nodes, [False for i in range(0, len(self.nodes))]))
-            elif self.sccVisiting[curCallChainStr][curNode]:  # 访问限制已经建立，检查当前节点是否在当前函数调用链下被调用过。如果调用过就直接返回，不访问了
+        curNode, curContext = self.stateNodes[stateId], self.stateContexts[stateId]
+        if self.isLoopRelated[curNode]:  # 当前访问的是一个scc，需要将其标记为正在访问，防止死循环
+            if (curContext, curNode) in self.sccVisiting:  # 当前节点在当前调用上下文下正在被访问，直接返回，不访问了
                 return
-            # 将当前节点设置为当前函数调用链下已访问
-            self.sccVisiting[curCallChainStr][curNode] = True
-
-        # 第一步，复制父节点的状态
-        curTagStack = TagStack(self.cfg)
-        curTagStack.setTagStack(parentTagStack.getTagStack())
-        curReturnAddrStack = Stack()
-        curReturnAddrStack.setStack(parentReturnAddrStack.getStack())
-        curPathRecorder = Stack()
-        curPathRecorder.setStack(parentPathRecorder.getStack())
-        curPathRecorder.push(curNode)
-        curExecutor = SimplifiedExecutor(self.cfg)
-        curExecutor.setExecutorState(parentExecutor.getExecutorState())
-
-        # 第二步，进行符号执行和tagstack执行
-        curTagStack.setBeginBlock(curNode)
-        curExecutor.setBeginBlock(curNode)
-        pushInfo = None  # block末尾处的push信息
-        while not curExecutor.allInstrsExecuted():
-            opcode = curExecutor.getOpcode()
-            if opcode == 0xfe:  # invalid
+            self.sccVisiting.add((curContext, curNode))
+
+        # 将当前节点加入路径
+        self.pathRecorder.push(curNode)
+
+        if self.stateIsInvalid[stateId]:
+            self.invPathNum[curNode] = self.invPathNum.get(curNode, 0) + 1
+            strategy = self.invStrategy.get(curNode, enumeratePaths)
+            if strategy == summarizePaths and curNode not in self.loopRelatedInvNodes:
+                if any([self.isLoopRelated[node] for node in self.pathRecorder.getStack()]):
+                    # 这个invalid节点会因为路径中包含循环体而被放弃优化，不必再记录它的路径
+                    self.loopRelatedInvNodes.add(curNode)
+                    self.paths = [path for path in self.paths if path.getLastNode() != curNode]
+            if strategy == enumeratePaths or (
+                    strategy == summarizePaths and curNode not in self.loopRelatedInvNodes):
                 # 在记录路径信息之前，检查路径是不是爆炸了
                 if len(self.paths) > self.maxPathNum:
                     self.log.fail("路径数量超出最大限制，放弃优化")
-                    exit(0)
                 # 记录路径信息
-                path = Path(self.pathId, curPathRecorder.getStack())
+                path = Path(self.pathId, self.pathRecorder.getStack())
                 self.paths.append(path)
                 self.pathId += 1
-                # 不必往下走，直接返回
-                if self.isLoopRelated[curNode]:
-                    self.sccVisiting[curCallChainStr][curNode] = False
-                return
+            # 不必往下走，直接返回
+            self.__leavePathState(stateId)
+            return
+        frames.append([stateId, 0])
+
+    def __execBlock(self, curNode: int, jumpType: str):
+        """
+        执行基本块，记录codecopy信息，并检查基本块末尾的跳转地址，执行到invalid时停止
+        两个执行器优先套用基本块的转移摘要，只处理读取和修改过的栈元素；栈中的元素不足时，退回到逐条执行指令
+        :return:(block末尾处的push信息，是否执行到了invalid)
+        """
+        executorValues = self.executor.execBlockSummary(curNode)
+        if executorValues is None:
+            return self.__execBlockByInstr(curNode, jumpType)
+        tagValues = self.tagStack.execBlockSummary(curNode)
+        assert tagValues is not None  # 两个栈的深度总是相同的
+        summary = self.cfg.getBlockSummary(curNode)
+        for offsetSlot, sizeSlot in summary.codecopySlots:  # codecopy
+            # 不对offset和size做任何检查，检查留给优化工作去做
+            tmpOffset = list(tagValues[offsetSlot][:4])
+            tmpOffset.extend(tagValues[sizeSlot][:4])
+            tmpOffset.append(curNode)
+            self.codecopyInfo.append(tmpOffset)
+        pushInfo = None
+        if summary.jumpSlot is not None and jumpType not in ["terminal", "fall"]:  # uncondjump/jumpi
+            pushInfo = list(tagValues[summary.jumpSlot][:4])  # [push的值，push的字节数,push指令的地址，push指令所在的block]
+            # 检查一下，两个栈的值相不相等
+            stackTopInfo = executorValues[summary.jumpSlot]
+            assert stackTopInfo is not None  # 应该是一个确定的数
+            assert self.graph.hasEdge(curNode, pushInfo[0])  # 必须是当前块指向的某个block的offset
+            assert stackTopInfo == pushInfo[0]  # 两个执行器的结果应该一致
+        return pushInfo, summary.hasInvalid
+
+    def __execBlockByInstr(self, curNode: int, jumpType: str):
+        """
+        逐条执行基本块中的指令，结果与__execBlock一致
+        :return:(block末尾处的push信息，是否执行到了invalid)
+        """
+        curTagStack, curExecutor = self.tagStack, self.executor
+        curTagStack.setBeginBlock(curNode)
+        curExecutor.setBeginBlock(curNode)
+        pushInfo = None  # block末尾处的push信息
+        while not curExecutor.allInstrsExecuted():
+            opcode = curExecutor.getOpcode()
+            if opcode == 0xfe:  # invalid
+                return pushInfo, True
             elif opcode == 0x39:  # codecopy
                 # 不对offset和size做任何检查，检查留给优化工作去做
                 tmpOffset = curTagStack.getTagStackItem(1)
@@ -161,303 +424,68 @@ class PathGenerator:
                 tmpOffset.extend(tmpSize)
                 tmpOffset.append(curNode)
                 self.codecopyInfo.append(tmpOffset)
-            if curExecutor.isLastInstr() and self.blocks[curNode].jumpType not in ["terminal",
-                                                                                   "fall"]:  # uncondjump/jumpi
+            if curExecutor.isLastInstr() and jumpType not in ["terminal", "fall"]:  # uncondjump/jumpi
                 pushInfo = curTagStack.getTagStackTop()  # [push的值，push的字节数,push指令的地址，push指令所在的block]
                 # 检查一下，两个栈的值相不相等
                 stackTopInfo = curExecutor.getTagStackTop()
                 assert stackTopInfo is not None  # 应该是一个确定的数
-                assert pushInfo[0] in self.nodes  # 必须是一个block的offset
+                assert self.graph.hasEdge(curNode, pushInfo[0])  # 必须是当前块指向的某个block的offset
                 assert stackTopInfo == pushInfo[0]  # 两个执行器的结果应该一致
             curExecutor.execNextOpCode()
             curTagStack.execNextOpCode()
+        return pushInfo, False
 
-        # 第三步，根据跳转的类型，记录跳转边的信息
-        if self.blocks[curNode].jumpType in ["unconditional", "conditional"]:  # 是一条跳转边
-            pushInfo.append(curNode)  # 添加一条信息，就是jump所在的block
-            self.jumpEdgeInfo.append(pushInfo)
-        elif self.blocks[curNode].jumpType == "terminal":  # 应当立即返回，不必再往下走
-            if self.isLoopRelated[curNode]:
-                self.sccVisiting[curCallChainStr][curNode] = False
-            return
+    def __leavePathState(self, stateId: int):
+        """
+        在路径搜索中离开一个状态，将节点移出路径，并消除访问限制
+        """
+        self.pathRecorder.pop()
+        curNode = self.stateNodes[stateId]
+        if self.isLoopRelated[curNode]:
+            self.sccVisiting.discard((self.stateContexts[stateId], curNode))
 
-        # 第四步，继续进行dfs
-        # 如果出边会造成环形函数调用，则直接报错
-        if self.blocks[curNode].jumpType == "unconditional":
-            targetNode = pushInfo[0]  # 即将跳往的目的block
-            jumpEdge = self.uncondJumpEdges[[curNode, targetNode].__str__()]
-            if jumpEdge.isCallerEdge:  # 是一条调用边
-                if curReturnAddrStack.hasItem(jumpEdge.tetrad[1]):
+    def __restoreSnapshot(self, snapshot: tuple):
+        """
+        将执行器和调用上下文恢复为快照时的状态，O(1)
+        """
+        self.tagStack.restoreSnapshot(snapshot[0])
+        self.executor.restoreSnapshot(snapshot[1])
+        self.curContext = snapshot[2]
+
+    def __applyReturnAddrOp(self, outEdge: tuple):
+        """
+        在走一条出边之前，修改调用上下文，即返回地址栈
+        如果出边会造成环形函数调用，则直接报错
+        """
+        targetNode, op, addr = outEdge
+        if op == "call":
+            context = self.curContext
+            while context != 0:
+                if self.contexts[context][1] == addr:
                     # 如果返回地址栈中已经有了返回地址，则说明这个函数被调用过而且还没被返回，出现了环形函数调用的情况，此时需要放弃优化
                     self.log.fail("检测到环形函数调用链的情况，字节码无法被优化")
-                    exit(0)
-                # 栈中没有返回地址，可以调用
-                curReturnAddrStack.push(jumpEdge.tetrad[1])  # push返回地址
-                newCallChain = list(curCallChain)
-                newCallChain.append(self.node2FuncId[jumpEdge.targetNode])  # 将新函数的函数id加入函数调用链
-                self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, curExecutor, newCallChain)
-                curReturnAddrStack.pop()  # 已经走完了，返回信息栈需要pop掉这一个返回信息
-            elif jumpEdge.isReturnEdge:  # 是一条返回边
-                # 栈里必须还有地址，而且和之前push的返回地址相同
-                assert not curReturnAddrStack.empty() and targetNode == curReturnAddrStack.getTop()
-                stackTop = curReturnAddrStack.getTop()  # 保存之前的返回地址，防止栈因为走向终止节点而被清空
-                curReturnAddrStack.pop()  # 模拟返回后的效果
-                self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, curExecutor,
-                           list(curCallChain))  # 返回
-                curReturnAddrStack.push(stackTop)
-            else:  # 是一条普通的uncondjump边
-                self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, curExecutor,
-                           list(curCallChain))
-        elif self.blocks[curNode].jumpType == "conditional":
-            targetNode = pushInfo[0]
-            # 两条边都走一次
-            self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, curExecutor, list(curCallChain))
-            self.__dfs(curNode + self.blocks[curNode].length, curTagStack, curReturnAddrStack, curPathRecorder,
-                       curExecutor, list(curCallChain))
-        elif self.blocks[curNode].jumpType == "fall":
-            targetNode = curNode + self.blocks[curNode].length
-            self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, curExecutor, list(curCallChain))
-        else:  # terminal，前面已经返回了
-            assert 0  # 返回
-
-        # 第五步，消除访问限制并返回父节点
-        if self.isLoopRelated[curNode]:
-            self.sccVisiting[curCallChainStr][curNode] = False
-
-    # def __dfs(self, curNode: int, parentTagStack: TagStack, parentReturnAddrStack: Stack, parentPathRecorder: Stack,
-    #           curCallChain: list):
-    #     # 按照tagStack的结果进行路径搜索
-    #
-    #     # 先检查有没有超时
-    #     curTime = time.perf_counter()
-    #     if curTime - self.beginTime > self.timeoutLimit:# 超时
-    #         self.log.fail("路径搜索超时，放弃优化")
-    #         exit(0)
-    #
-    #     curTagStack = TagStack(self.cfg)
-    #     curTagStack.setTagStack(parentTagStack.getTagStack())
-    #     curReturnAddrStack = Stack()
-    #     curReturnAddrStack.setStack(parentReturnAddrStack.getStack())
-    #     curPathRecorder = Stack()
-    #     curPathRecorder.setStack(parentPathRecorder.getStack())
-    #     curPathRecorder.push(curNode)
-    #
-    #     # 第一步，检查当前是否进入了scc，若是，则要修改访问控制
-    #     curCallChainStr = curCallChain.__str__()  # 函数调用链的字符串
-    #     if self.isLoopRelated[curNode]:  # 当前访问的是一个scc，需要将其标记为true，防止死循环
-    #         if curCallChainStr not in self.sccVisiting.keys():  # 还没有建立访问控制
-    #             self.sccVisiting[curCallChainStr] = dict(zip(self.nodes, [False for i in range(0, len(self.nodes))]))
-    #         elif self.sccVisiting[curCallChainStr][curNode]:  # 访问限制已经建立，检查当前节点是否在当前函数调用链下被调用过。如果调用过就直接返回，不访问了
-    #             return
-    #         # 将当前节点设置为当前函数调用链下已访问
-    #         self.sccVisiting[curCallChainStr][curNode] = True
-    #
-    #     # 第二步，进行tagstack执行，这一步需要复制父节点的tagstack信息
-    #     curTagStack.setBeginBlock(curNode)
-    #     pushInfo = None
-    #     while not curTagStack.allInstrsExecuted():
-    #         opcode = curTagStack.getOpcode()
-    #         if opcode == 0xfe:  # invalid
-    #             # 在记录路径信息之前，检查路径是不是爆炸了
-    #             if len(self.paths) > self.maxPathNum:
-    #                 self.log.fail("路径数量超出最大限制，放弃优化")
-    #                 exit(0)
-    #             # 记录路径信息
-    #             path = Path(self.pathId, curPathRecorder.getStack())
-    #             self.paths.append(path)
-    #             self.pathId += 1
-    #             # 不必往下走，直接返回
-    #             if self.isLoopRelated[curNode]:
-    #                 self.sccVisiting[curCallChainStr][curNode] = False
-    #             return
-    #         elif opcode == 0x39:  # codecopy
-    #             # 不对offset和size做任何检查，检查留给优化工作去做
-    #             tmpOffset = curTagStack.getTagStackItem(1)
-    #             tmpSize = curTagStack.getTagStackItem(2)
-    #             tmpOffset.extend(tmpSize)
-    #             tmpOffset.append(curNode)
-    #             self.codecopyInfo.append(tmpOffset)
-    #         if curTagStack.isLastInstr() and self.blocks[curNode].jumpType not in ["terminal", "fall"]:
-    #             pushInfo = curTagStack.getTagStackTop()  # [push的值，push的字节数,push指令的地址，push指令所在的block]
-    #         curTagStack.execNextOpCode()
-    #
-    #     # 第三步，根据跳转的类型，记录跳转边的信息
-    #     if self.blocks[curNode].jumpType in ["unconditional", "conditional"]:  # 是一条跳转边
-    #         if pushInfo[0] is None:
-    #             self.log.fail(
-    #                 "跳转地址经过了计算，拒绝优化，跳转信息为：{}，当前路径为:{}".format(pushInfo, curPathRecorder.getTagStack().__str__()))
-    #             exit(0)
-    #         assert pushInfo[0] in self.nodes and pushInfo[0] in self.edges[curNode] # 必须是一个块的offset，而且必须是当前块指向的某个块
-    #         pushInfo.append(curNode)  # 添加一条信息，就是jump所在的block
-    #         self.jumpEdgeInfo.append(pushInfo)
-    #     elif self.blocks[curNode].jumpType == "terminal":  # 应当立即返回，不必再往下走
-    #         if self.isLoopRelated[curNode]:
-    #             self.sccVisiting[curCallChainStr][curNode] = False
-    #         return
-    #
-    #     # 第四步，继续进行dfs
-    #     # 如果出边会造成环形函数调用，或者是函数内scc死循环，则不走这些出边
-    #     # 否则，需要进行出边遍历
-    #     if self.blocks[curNode].jumpType == "unconditional":
-    #         targetNode = pushInfo[0]  # 即将跳往的目的block
-    #         jumpEdge = self.uncondJumpEdges[[curNode, targetNode].__str__()]
-    #         if jumpEdge.isCallerEdge:  # 是一条调用边
-    #             if curReturnAddrStack.hasItem(jumpEdge.tetrad[1]):
-    #                 # 如果返回地址栈中已经有了返回地址，则说明这个函数被调用过而且还没被返回，出现了环形函数调用的情况，此时需要放弃优化
-    #                 self.log.fail("检测到环形函数调用链的情况，字节码无法被优化")
-    #                 exit(0)
-    #             # 栈中没有返回地址，可以调用
-    #             curReturnAddrStack.push(jumpEdge.tetrad[1])  # push返回地址
-    #             newCallChain = list(curCallChain)
-    #             newCallChain.append(self.node2FuncId[jumpEdge.targetNode])  # 将新函数的函数id加入函数调用链
-    #             self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, newCallChain)
-    #             curReturnAddrStack.pop()  # 已经走完了，返回信息栈需要pop掉这一个返回信息
-    #         elif jumpEdge.isReturnEdge:  # 是一条返回边
-    #             # 栈里必须还有地址，而且和之前push的返回地址相同
-    #             assert not curReturnAddrStack.empty() and targetNode == curReturnAddrStack.getTop()
-    #             stackTop = curReturnAddrStack.getTop()  # 保存之前的返回地址，防止栈因为走向终止节点而被清空
-    #             curReturnAddrStack.pop()  # 模拟返回后的效果
-    #             self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))  # 返回
-    #             curReturnAddrStack.push(stackTop)
-    #         else:  # 是一条普通的uncondjump边
-    #             self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))
-    #     elif self.blocks[curNode].jumpType == "conditional":
-    #         targetNode = pushInfo[0]
-    #         # 两条边都走一次
-    #         self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))
-    #         self.__dfs(curNode + self.blocks[curNode].length, curTagStack, curReturnAddrStack, curPathRecorder,
-    #                    list(curCallChain))
-    #     elif self.blocks[curNode].jumpType == "fall":
-    #         targetNode = curNode + self.blocks[curNode].length
-    #         self.__dfs(targetNode, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))
-    #     else:  # terminal，前面已经返回了
-    #         assert 0  # 返回
-    #
-    #     if self.isLoopRelated[curNode]:
-    #         self.sccVisiting[curCallChainStr][curNode] = False
-
-    # # 原来的dfs，会路径爆炸
-    # def __dfs(self, curNode: int, parentTagStack: TagStack, parentReturnAddrStack: Stack, parentPathRecorder: Stack,
-    #           curCallChain: list):
-    #     """
-    #     路径记录：每访问一个新节点，则将其加入到路径栈，离开时pop一次(其实就是pop自己)
-    #     访问控制：每访问一个新节点，则将其设置为true状态，退出时设置为false
-    #     """
-    #
-    #     # 先检查有没有超时
-    #     curTime = time.perf_counter()
-    #     if curTime - self.beginTime > self.timeoutLimit:# 超时
-    #         self.log.fail("路径搜索超时，放弃优化")
-    #         exit(0)
-    #
-    #     curTagStack = TagStack(self.cfg)
-    #     curTagStack.setTagStack(parentTagStack.getTagStack())
-    #     curReturnAddrStack = Stack()
-    #     curReturnAddrStack.setStack(parentReturnAddrStack.getStack())
-    #     curPathRecorder = Stack()
-    #     curPathRecorder.setStack(parentPathRecorder.getStack())
-    #     curPathRecorder.push(curNode)
-    #
-    #     # 第一步，检查当前是否进入了scc，若是，则要修改访问控制
-    #     curCallChainStr = curCallChain.__str__()  # 函数调用链的字符串
-    #     if self.isLoopRelated[curNode]:  # 当前访问的是一个scc，需要将其标记为true，防止死循环
-    #         if curCallChainStr not in self.sccVisiting.keys():  # 还没有建立访问控制
-    #             self.sccVisiting[curCallChainStr] = dict(zip(self.nodes, [False for i in range(0, len(self.nodes))]))
-    #         elif self.sccVisiting[curCallChainStr][curNode]:  # 访问限制已经建立，检查当前节点是否在当前函数调用链下被调用过。如果调用过就直接返回，不访问了
-    #             return
-    #         # 将当前节点设置为当前函数调用链下已访问
-    #         self.sccVisiting[curCallChainStr][curNode] = True
-    #
-    #     # 第二步，进行tagstack执行，这一步需要复制父节点的tagstack信息
-    #     curTagStack.setBeginBlock(curNode)
-    #     pushInfo = None
-    #     while not curTagStack.allInstrsExecuted():
-    #         opcode = curTagStack.getOpcode()
-    #         if opcode == 0xfe:  # invalid
-    #             # 在记录路径信息之前，检查路径是不是爆炸了
-    #             if len(self.paths) > self.maxPathNum:
-    #                 self.log.fail("路径数量超出最大限制，放弃优化")
-    #                 exit(0)
-    #             # 记录路径信息
-    #             path = Path(self.pathId, curPathRecorder.getStack())
-    #             self.paths.append(path)
-    #             self.pathId += 1
-    #             # 不必往下走，直接返回
-    #             if self.isLoopRelated[curNode]:
-    #                 self.sccVisiting[curCallChainStr][curNode] = False
-    #             return
-    #         elif opcode == 0x39:  # codecopy
-    #             # 不对offset和size做任何检查，检查留给优化工作去做
-    #             tmpOffset = curTagStack.getTagStackItem(1)
-    #             tmpSize = curTagStack.getTagStackItem(2)
-    #             tmpOffset.extend(tmpSize)
-    #             tmpOffset.append(curNode)
-    #             self.codecopyInfo.append(tmpOffset)
-    #         if curTagStack.isLastInstr() and self.blocks[curNode].jumpType not in ["terminal",
-    #                                                                                "fall"]:  # uncondjump/jumpi
-    #             pushInfo = curTagStack.getTagStackTop()  # [push的值，push的字节数,push指令的地址，push指令所在的block]
-    #         curTagStack.execNextOpCode()
-    #
-    #     # 第三步，根据跳转的类型，记录跳转边的信息
-    #     if self.blocks[curNode].jumpType in ["unconditional", "conditional"]:  # 是一条跳转边
-    #         if pushInfo[0] is None:
-    #             self.log.fail(
-    #                 "跳转地址经过了计算，拒绝优化，跳转信息为：{}，当前路径为:{}".format(pushInfo, curPathRecorder.getTagStack().__str__()))
-    #             exit(0)
-    #         assert pushInfo[0] in self.nodes and pushInfo[0] in self.edges[curNode] # 必须是一个block的offset
-    #         pushInfo.append(curNode)  # 添加一条信息，就是jump所在的block
-    #         self.jumpEdgeInfo.append(pushInfo)
-    #     elif self.blocks[curNode].jumpType == "terminal":  # 应当立即返回，不必再往下走
-    #         if self.isLoopRelated[curNode]:
-    #             self.sccVisiting[curCallChainStr][curNode] = False
-    #         return
-    #
-    #     # 第四步，查看每一条出边
-    #     # 如果出边会造成环形函数调用，或者是函数内scc死循环，则不走这些出边
-    #     # 否则，需要进行出边遍历
-    #     for node in self.edges[curNode]:  # 查看每一个出边
-    #         if self.isLoopRelated[node]:  # 是一个环相关节点
-    #             if curCallChainStr in self.sccVisiting.keys():
-    #                 if self.sccVisiting[curCallChainStr][node]:  # 这个点已经访问过
-    #                     continue
-    #         key = [curNode, node].__str__()
-    #         if key in self.uncondJumpEdges.keys():  # 这是一条uncondjump边，但是不确定是调用边还是返回边
-    #             e = self.uncondJumpEdges[key]
-    #             if e.isCallerEdge:  # 是一条调用边
-    #                 if curReturnAddrStack.hasItem(e.tetrad[1]):
-    #                     # 如果栈中有返回地址，则说明这个函数被调用过而且还没被返回，出现了环形函数调用的情况，此时需要放弃优化
-    #                     self.log.fail("检测到环形函数调用链的情况，字节码无法被优化")
-    #                     exit(0)
-    #                 curReturnAddrStack.push(e.tetrad[1])  # push返回地址
-    #                 newCallChain = list(curCallChain)
-    #                 newCallChain.append(self.node2FuncId[e.targetNode])  # 将新函数的函数id加入函数调用链
-    #                 self.__dfs(node, curTagStack, curReturnAddrStack, curPathRecorder, newCallChain)
-    #                 curReturnAddrStack.pop()  # 已经走完了，返回信息栈需要pop掉这一个返回信息
-    #             elif e.isReturnEdge:  # 是一条返回边
-    #                 if curReturnAddrStack.empty():  # 栈里必须还有地址
-    #                     continue
-    #                 if e.tetrad[3] != curReturnAddrStack.getTop():  # 和之前push的返回地址相同，才能做返回
-    #                     continue
-    #                 stackTop = curReturnAddrStack.getTop()  # 保存之前的返回地址，防止栈因为走向终止节点而被清空
-    #                 curReturnAddrStack.pop()  # 模拟返回后的效果
-    #                 self.__dfs(node, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))  # 返回
-    #                 curReturnAddrStack.push(stackTop)
-    #             else:  # 是一条普通的uncondjump边
-    #                 # 6.4新问题：之前已经获取到了pushInfo，应当按照pushInfo[0]来跳，而不是瞎跳
-    #                 if node != pushInfo[0]:  # 不是tagStack执行后，应当出现的跳转边
-    #                     continue
-    #                 self.__dfs(node, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))
-    #         else:  # 不是unconditional jump
-    #             # 如果是jumpi，则随便挑一边跳
-    #             # 不可能是terminal，上面遇到terminal就直接返回了
-    #             self.__dfs(node, curTagStack, curReturnAddrStack, curPathRecorder, list(curCallChain))
-    #
-    #     if self.isLoopRelated[curNode]:
-    #         self.sccVisiting[curCallChainStr][curNode] = False
+                context = self.contexts[context][0]
+            # 栈中没有返回地址，可以调用，push返回地址
+            key = (self.curContext, addr)
+            if key not in self.contextIds:
+                self.contextIds[key] = len(self.contexts)
+                self.contexts.append(key)
+            self.curContext = self.contextIds[key]
+        elif op == "return":
+            # 栈里必须还有地址，而且和之前push的返回地址相同
+            parent, returnAddr = self.contexts[self.curContext]
+            assert self.curContext != 0 and targetNode == returnAddr
+            self.curContext = parent  # 模拟返回后的效果
 
     def getPath(self):
         return self.paths
 
+    def getInvPathNum(self):
+        return self.invPathNum
+
+    def getLoopRelatedInvNodes(self):
+        return self.loopRelatedInvNodes
+
     def getJumpEdgeInfo(self):
         return self.jumpEdgeInfo
 
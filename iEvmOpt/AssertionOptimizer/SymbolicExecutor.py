@@ -2,15 +2,18 @@ from Cfg.BasicBlock import BasicBlock
 from z3 import *
 
 from Cfg.Cfg import Cfg
-from Utils import Stack
+from Utils import PersistentStack
+from Utils.Logger import Logger
+from Utils.Opcodes import genDispatchTable, pushOpcodes, dupOpcodes, swapOpcodes, logOpcodes
 
 
 class SymbolicExecutor:
     def __init__(self, cfg: Cfg):
         self.cfg = cfg
+        self.log = Logger()
         self.curBlock: BasicBlock = None  # 当前执行的基本块
         self.PC = 0  # 当前执行指令的指针
-        self.stack = Stack()  # 符号执行栈
+        self.stack = PersistentStack()  # 符号执行栈，状态中只保存它的快照
         self.storage = dict()  # 使用字典存储，格式为  addr:data
         self.memory = dict()  # 使用字典存储，格式为  addr:data
         self.gasOpcCnt = 0  # 统计gas指令被调用的次数
@@ -24,6 +27,8 @@ class SymbolicExecutor:
         # 辅助信息
         self.lastInstrAddrOfBlock = 0  # block内最后一个指令的地址
         self.jumpCond = None  # 如果当前的Block为无条件Jump，记录跳转的条件
+        self.instrTable = None  # cfg的指令表，在设置执行块时获取
+        self.instrIndex = 0  # 当前执行的指令在指令表中的下标
 
     def clearExecutor(self):
         '''
@@ -47,7 +52,7 @@ class SymbolicExecutor:
         res = []
         res.append(self.curBlock)
         res.append(self.PC)
-        res.append(self.stack.getStack())
+        res.append(self.stack.getSnapshot())  # O(1)，不复制整个栈
         res.append(dict(self.storage))
         res.append(dict(self.memory))
         res.append(self.gasOpcCnt)
@@ -69,7 +74,7 @@ class SymbolicExecutor:
         '''
         self.curBlock = state[0]
         self.PC = state[1]
-        self.stack.setStack(state[2])
+        self.stack.restoreSnapshot(state[2])
         self.storage = state[3]
         self.memory = state[4]
         self.gasOpcCnt = state[5]
@@ -81,6 +86,7 @@ class SymbolicExecutor:
         self.lastInstrAddrOfBlock = state[11]
         self.jumpCond = state[12]
         self.ctx = state[13]
+        self.instrTable = self.cfg.getInstrTable()
 
     def checkIsCertainJumpDest(self):
         '''
@@ -130,7 +136,8 @@ class SymbolicExecutor:
         """
         self.curBlock = self.cfg.blocks[curBlockId]
         self.PC = self.curBlock.offset
-        self.lastInstrAddrOfBlock = int(self.curBlock.instrs[self.curBlock.instrNum - 1].split(":")[0])
+        self.lastInstrAddrOfBlock = self.curBlock.lastInstrAddr
+        self.instrTable = self.cfg.getInstrTable()
 
     def isLastInstr(self):
         return self.PC == self.lastInstrAddrOfBlock
@@ -176,8 +183,7 @@ class SymbolicExecutor:
         获取当前PC处的操作码
         :return:opcode
         '''
-        index = self.PC - self.curBlock.offset
-        return self.curBlock.bytecode[index]
+        return self.instrTable.opcodes[self.instrTable.indexOfAddr[self.PC]]
 
     def printState(self, printBlock: bool = True):
         """ 输出当前程序状态
@@ -194,176 +200,21 @@ class SymbolicExecutor:
     def execNextOpCode(self):
         ''' 从当前PC开始，执行下一条指令
         规定执行完当前指令之后，PC指向下一条指令的第一个字节
+        操作码与push的数据从指令表中读取，处理函数由分派表给出
         :return:None
         '''
         assert self.curBlock.offset <= self.PC <= self.curBlock.offset + self.curBlock.length
-        index = self.PC - self.curBlock.offset
-        assert index < len(self.curBlock.bytecode)
-        opCode = self.curBlock.bytecode[index]
-
-        match opCode:
-            case 0x00:  # stop
-                pass
-            case 0x01:  # add
-                self.__execAdd()
-            case 0x02:  # mul
-                self.__execMul()
-            case 0x03:
-                self.__execSub()
-            case 0x04:
-                self.__execDiv()
-            case 0x05:
-                self.__execSDiv()
-            case 0x06:
-                self.__execMod()
-            case 0x07:
-                self.__execSMod()
-            case 0x08:
-                self.__execAddMod()
-            case 0x09:
-                self.__execMulMod()
-            case 0x0a:
-                self.__execExp()
-            case 0x0b:
-                self.__execSignExtend()
-            case 0x10:
-                self.__execLT()
-            case 0x11:
-                self.__execGt()
-            case 0x12:
-                self.__execSlt()
-            case 0x13:
-                self.__execSgt()
-            case 0x14:
-                self.__execEq()
-            case 0x15:
-                self.__execIsZero()
-            case 0x16:
-                self.__execAnd()
-            case 0x17:
-                self.__execOr()
-            case 0x18:
-                self.__execXor()
-            case 0x19:
-                self.__execNot()
-            case 0x1a:
-                self.__execByte()
-            case 0x1b:
-                self.__execShl()
-            case 0x1c:
-                self.__execShr()
-            case 0x1d:
-                self.__execSar()
-            case 0x1f:
-                self.__execNonOp()
-            case 0x20:
-                self.__execSha3()
-            case 0x30:
-                self.__execAddress()
-            case 0x31:
-                self.__execBalance()
-            case 0x32:
-                self.__execOrigin()
-            case 0x33:
-                self.__execCaller()
-            case 0x34:
-                self.__execCallValue()
-            case 0x35:
-                self.__execCallDataLoad()
-            case 0x36:
-                self.__execCallDataSize()
-            case 0x37:
-                self.__execCallDataCopy()
-            case 0x38:
-                self.__execCodesize()
-            case 0x39:
-                self.__execCodecopy()
-            case 0x3a:
-                self.__execGasPrice()
-            case 0x3b:
-                self.__execExtCodeSize()
-            case 0x3c:
-                self.__execExtCodeCopy()
-            case 0x3d:
-                self.__execReturnDataSize()
-            case 0x3e:
-                self.__execReturnDataCopy()
-            case 0x3f:
-                self.__execExtCodeHash()
-            case 0x40:
-                self.__execBlockHash()
-            case 0x41:
-                self.__execCoinBase()
-            case 0x42:
-                self.__execTimeStamp()
-            case 0x43:
-                self.__execNumber()
-            case 0x44:
-                self.__execPrevrandao()
-            case 0x45:
-                self.__execGasLimit()
-            case 0x46:
-                self.__execChainId()
-            case 0x47:
-                self.__execSelfBalance()
-            case 0x48:
-                self.__execBaseFee()
-            case 0x50:
-                self.__execPop()
-            case 0x51:
-                self.__execMLoad()
-            case 0x52:
-                self.__execMStore()
-            case 0x53:
-                self.__execMStore8()
-            case 0x54:
-                self.__execSLoad()
-            case 0x55:
-                self.__execSStore()
-            case 0x56:
-                self.__execJump()
-            case 0x57:
-                self.__execJumpi()
-            case 0x58:
-                self.__execPc()
-            case 0x59:
-                self.__execMSize()
-            case 0x5a:
-                self.__execGas()
-            case 0x5b:
-                self.__execJumpDest()
-            case i if 0x60 <= opCode <= 0x7f:  # push
-                self.__execPush(opCode)
-            case i if 0x80 <= opCode <= 0x8f:  # dup
-                self.__execDup(opCode)
-            case i if 0x90 <= opCode <= 0x9f:  # swap
-                self.__execSwap(opCode)
-            case i if 0xa0 <= opCode <= 0xa4:  # log
-                self.__execLog(opCode)
-            case 0xf0:
-                self.__execCreate()
-            case 0xf1:
-                self.__execCall()
-            case 0xf2:
-                self.__execCallCode()
-            case 0xf3:
-                self.__execReturn()
-            case 0xf4:
-                self.__execDelegateCall()
-            case 0xf5:
-                self.__execCreate2()
-            case 0xfa:
-                self.__execStaticCall()
-            case 0xfd:
-                self.__execRevert()
-            case 0xfe:
-                self.__execInvalid()
-            case 0xff:
-                self.__execSelfDestruct()
-            case _:  # Pattern not attempted
-                err = 'Opcode {} is not found!'.format(hex(opCode))
-                assert 0, err
-        self.PC += 1
+        table = self.instrTable
+        index = table.indexOfAddr[self.PC]
+        opCode = table.opcodes[index]
+        handler = self.__handlers[opCode]
+        assert handler is not None, 'Opcode {} is not found!'.format(hex(opCode))
+        self.instrIndex = index
+        handler(self)
+        self.PC = table.addrs[index + 1]
+
+    def __execStop(self):  # 0x00
+        pass
 
     def __execAdd(self):  # 0x01
         a, b = self.stack.pop(), self.stack.pop()
@@ -720,22 +571,9 @@ class SymbolicExecutor:
         startAddr = self.stack.pop()
         endAddr = simplify(startAddr + 32)
         try:
-            str(startAddr)
-        except:
-            print("start")
-            print(type(startAddr))
-            print(startAddr.decl().name())
-            print(startAddr.sort())
-            exit(0)
-        try:
-            str(endAddr)
-        except:
-            print("end")
-            print(type(endAddr))
-            print(endAddr.decl().name())
-            print(endAddr.sort())
-            exit(0)
-        addr = startAddr.__str__() + '$' + endAddr.__str__()
+            addr = startAddr.__str__() + '$' + endAddr.__str__()
+        except Exception:
+            self.log.fail("MSTORE的存储地址无法转换为字符串:{},{}".format(startAddr.decl().name(), startAddr.sort()))
         data = self.stack.pop()
         if is_bool(data):  # 存储的是bool类型的数据
             data = If(data, BitVecVal(1, 256, self.ctx), BitVecVal(0, 256, self.ctx), self.ctx)
@@ -793,30 +631,24 @@ class SymbolicExecutor:
     def __execJumpDest(self):  # 0x5b
         pass
 
-    def __execPush(self, opCode):  # 0x60 <= opCode <= 0x7f
-        byteNum = opCode - 0x5f  # push的字节数
-        num = 0
-        for i in range(byteNum):
-            num <<= 8
-            self.PC += 1  # 指向最高位的字节
-            num |= self.curBlock.bytecode[self.PC - self.curBlock.offset]  # 低位加上相应的字节
-        num = BitVecVal(num, 256, self.ctx)
+    def __execPush(self):  # 0x60 <= opCode <= 0x7f
+        num = BitVecVal(self.instrTable.pushValues[self.instrIndex], 256, self.ctx)
         self.stack.push(num)
 
-    def __execDup(self, opCode):  # 0x80
-        pos = opCode - 0x80
+    def __execDup(self):  # 0x80 <= opCode <= 0x8f
+        pos = self.instrTable.opcodes[self.instrIndex] - 0x80
         self.stack.push(self.stack.getItem(self.stack.size() - 1 - pos))
 
-    def __execSwap(self, opCode):  # 0x90 <= opCode <= 0x9f
-        depth = opCode - 0x90 + 1
+    def __execSwap(self):  # 0x90 <= opCode <= 0x9f
+        depth = self.instrTable.opcodes[self.instrIndex] - 0x90 + 1
         stackSize = self.stack.size()
         pos = stackSize - 1 - depth
         self.stack.swap(stackSize - 1, pos)
 
-    def __execLog(self, opCode):  # 0xa0 <= opCode <= 0xa4
+    def __execLog(self):  # 0xa0 <= opCode <= 0xa4
         self.stack.pop()
         self.stack.pop()
-        for i in range(0xa0, opCode):
+        for i in range(0xa0, self.instrTable.opcodes[self.instrIndex]):
             self.stack.pop()
 
     def __execCreate(self):  # 0xf0
@@ -944,3 +776,86 @@ class SymbolicExecutor:
 
         # 记录返回数据的size
         self.returnDataSize = BitVecVal(tmpSize, 256, self.ctx)
+
+    # 操作码到处理函数的分派表，生成时会根据Utils.Opcodes中的元信息检查是否覆盖了所有操作码
+    __handlers = genDispatchTable(None, {
+        0x00: __execStop,
+        0x01: __execAdd,
+        0x02: __execMul,
+        0x03: __execSub,
+        0x04: __execDiv,
+        0x05: __execSDiv,
+        0x06: __execMod,
+        0x07: __execSMod,
+        0x08: __execAddMod,
+        0x09: __execMulMod,
+        0x0a: __execExp,
+        0x0b: __execSignExtend,
+        0x10: __execLT,
+        0x11: __execGt,
+        0x12: __execSlt,
+        0x13: __execSgt,
+        0x14: __execEq,
+        0x15: __execIsZero,
+        0x16: __execAnd,
+        0x17: __execOr,
+        0x18: __execXor,
+        0x19: __execNot,
+        0x1a: __execByte,
+        0x1b: __execShl,
+        0x1c: __execShr,
+        0x1d: __execSar,
+        0x1f: __execNonOp,
+        0x20: __execSha3,
+        0x30: __execAddress,
+        0x31: __execBalance,
+        0x32: __execOrigin,
+        0x33: __execCaller,
+        0x34: __execCallValue,
+        0x35: __execCallDataLoad,
+        0x36: __execCallDataSize,
+        0x37: __execCallDataCopy,
+        0x38: __execCodesize,
+        0x39: __execCodecopy,
+        0x3a: __execGasPrice,
+        0x3b: __execExtCodeSize,
+        0x3c: __execExtCodeCopy,
+        0x3d: __execReturnDataSize,
+        0x3e: __execReturnDataCopy,
+        0x3f: __execExtCodeHash,
+        0x40: __execBlockHash,
+        0x41: __execCoinBase,
+        0x42: __execTimeStamp,
+        0x43: __execNumber,
+        0x44: __execPrevrandao,
+        0x45: __execGasLimit,
+        0x46: __execChainId,
+        0x47: __execSelfBalance,
+        0x48: __execBaseFee,
+        0x50: __execPop,
+        0x51: __execMLoad,
+        0x52: __execMStore,
+        0x53: __execMStore8,
+        0x54: __execSLoad,
+        0x55: __execSStore,
+        0x56: __execJump,
+        0x57: __execJumpi,
+        0x58: __execPc,
+        0x59: __execMSize,
+        0x5a: __execGas,
+        0x5b: __execJumpDest,
+        0xf0: __execCreate,
+        0xf1: __execCall,
+        0xf2: __execCallCode,
+        0xf3: __execReturn,
+        0xf4: __execDelegateCall,
+        0xf5: __execCreate2,
+        0xfa: __execStaticCall,
+        0xfd: __execRevert,
+        0xfe: __execInvalid,
+        0xff: __execSelfDestruct,
+        pushOpcodes: __execPush,
+        dupOpcodes: __execDup,
+        swapOpcodes: __execSwap,
+        logOpcodes: __execLog,
+    })
@@ -1,45 +1,135 @@
+from array import array
+
+from Utils.Opcodes import disassemble, getOpcodeName
+
+
 class BasicBlock:
+    # 大合约中会有上万个基本块，使用slots并将指令信息存储为紧凑的数组，不再为每条指令保存字符串
+    # 字节码使用不可变的bytes存储，复制出的基本块与原基本块共享同一个对象，只有在被修改时才复制为bytearray(写时复制)
+    __slots__ = ("offset", "length", "blockType", "stackBalance", "__bytecode", "jumpType", "instrNum", "isInvalid",
+                 "couldBeCaller", "jumpiDest", "jumpDest", "instrAddrs", "opcodes", "pushValues", "lastInstrAddr",
+                 "removedByte", "__instrs")
 
     def __init__(self,
                  blockInfo: dict):
         """ 输出当前程序状态
-       :param blockInfo:从Json文件中读取到的node信息
+       :param blockInfo:从Json文件中读取到的node信息，指令信息直接由字节码解码得到，不再解析parsedOpcodes
+                        给出bytecode(bytes)时直接使用，不再经过bytecodeHex的十六进制字符串
        """
         # 块的基本信息
         self.offset = int(blockInfo["offset"])
         self.length = int(blockInfo["length"])
         self.blockType = blockInfo["type"]
         self.stackBalance = int(blockInfo["stackBalance"])
-        self.bytecode = bytearray.fromhex(blockInfo["bytecodeHex"])  # 字节码，存储为字节数组
-        self.bytecodeStr = blockInfo["bytecodeHex"]  # 字节码，存储为字符串
-        self.instrs = str(blockInfo["parsedOpcodes"]).split('\n')  # 存储的指令汇编码
-        self.instrsStr = blockInfo["parsedOpcodes"]  # 指令，存储为字符串
+        code = blockInfo.get("bytecode")
+        # 字节码，其他表示均由它生成
+        self.__bytecode = bytes.fromhex(blockInfo["bytecodeHex"]) if code is None else bytes(code)
         self.jumpType = ""  # 论文中提及的类型：unconditional、conditional、terminal、fall
-        self.instrNum = self.instrs.__len__()  # 指令的数量
         self.isInvalid = False  # 是否为invalid块
         self.couldBeCaller = False
 
-        checker = self.instrs[self.instrNum - 1].split(' ')[1]
-        match checker:
-            case "JUMP":
-                self.jumpType = "unconditional"
-                if self.instrs[self.instrNum - 2].split(' ')[1].find("PUSH") != -1:
-                    self.couldBeCaller = True
-            case "JUMPI":
-                self.jumpType = "conditional"
-            case "INVALID" | "REVERT" | "RETURN" | "STOP" | "SELFDESTRUCT":  # terminal
-                self.jumpType = "terminal"
-                if checker == "INVALID":
-                    self.isInvalid = True
-            case _:
-                self.jumpType = "fall"
+        # 预解码的指令数组，下标为指令在块内的序号
+        self.instrAddrs = None  # 指令的地址，用于优化时使用
+        self.opcodes = None  # 指令的操作码
+        self.pushValues = None  # push的数据，非push指令为None
+        self.__decode()
+        self.instrNum = len(self.instrAddrs)  # 指令的数量
+        # 最后一条指令的地址，exit block没有指令，取其offset
+        self.lastInstrAddr = self.instrAddrs[-1] if self.instrNum > 0 else self.offset
+        self.__instrs = None  # 指令的汇编码，在需要时才生成
+
+        if self.instrNum > 0:
+            checker = getOpcodeName(self.opcodes[-1])
+            match checker:
+                case "JUMP":
+                    self.jumpType = "unconditional"
+                    if self.instrNum > 1 and getOpcodeName(self.opcodes[-2]).find("PUSH") != -1:
+                        self.couldBeCaller = True
+                case "JUMPI":
+                    self.jumpType = "conditional"
+                case "INVALID" | "REVERT" | "RETURN" | "STOP" | "SELFDESTRUCT":  # terminal
+                    self.jumpType = "terminal"
+                    if checker == "INVALID":
+                        self.isInvalid = True
+                case _:
+                    self.jumpType = "fall"
+        else:  # exit block
+            self.jumpType = "fall"
 
         # 块的辅助信息
         self.jumpiDest = {}  # 记录jumpi的块条件为True的跳转目标节点的offset，格式为 True:offset,False:offset
         self.jumpDest = []  # 记录jump的块的跳转目标节点的offset，格式为 [offset1,offset2...]
-        self.instrAddrs = [int(instr.split(':')[0]) for instr in self.instrs]  # 存储的指令的地址，用于优化时使用
-        self.removedByte = dict(
-            zip([i for i in range(self.length)], [False for i in range(self.length)]))  # 下标为i的字节是否需要删除，用于删除冗余序列
+        self.removedByte = bytearray(self.length)  # 下标为i的字节是否需要删除，用于删除冗余序列，非0表示需要删除
+
+    def __decode(self):
+        """ 将块的字节码解码为指令数组
+        """
+        code = self.bytecode
+        addrs, opcodes, pushValues = [], [], []
+        pc = 0
+        while pc < self.length:
+            opcode = code[pc]
+            addrs.append(self.offset + pc)
+            opcodes.append(opcode)
+            if 0x60 <= opcode <= 0x7f:  # push
+                pushValues.append(int.from_bytes(code[pc + 1:pc + opcode - 0x5e], "big"))
+                pc += opcode - 0x5e
+            else:
+                pushValues.append(None)
+                pc += 1
+        # 解码完成之后不再修改，使用定长的存储方式，避免列表预留的空间
+        self.instrAddrs = array("I", addrs)
+        self.opcodes = bytes(opcodes)
+        self.pushValues = tuple(pushValues)
+
+    @property
+    def bytecode(self):
+        # 字节码，可能是与其他基本块共享的bytes，修改之前需要使用getWritableBytecode
+        return self.__bytecode
+
+    @bytecode.setter
+    def bytecode(self, bytecode):
+        self.__bytecode = bytecode
+
+    def getWritableBytecode(self):
+        """ 获取可以修改的字节码，第一次修改时复制出本基本块独占的bytearray
+        :return:bytearray
+        """
+        if not isinstance(self.__bytecode, bytearray):
+            self.__bytecode = bytearray(self.__bytecode)
+        return self.__bytecode
+
+    def shareBytecode(self):
+        """ 获取可以与其他基本块共享的字节码，之后任何一方修改时都会先复制
+        :return:bytes
+        """
+        if isinstance(self.__bytecode, bytearray):
+            self.__bytecode = bytes(self.__bytecode)
+        return self.__bytecode
+
+    @property
+    def bytecodeStr(self):
+        # 字节码，存储为字符串
+        return self.bytecode.hex()
+
+    @property
+    def instrs(self):
+        # 存储的指令汇编码，格式与EtherSolve一致
+        if self.__instrs is None:
+            if self.length == 0:
+                self.__instrs = ["{}: EXIT BLOCK".format(self.offset)]
+            else:
+                self.__instrs = disassemble(self.bytecode, self.offset)
+        return self.__instrs
+
+    @instrs.setter
+    def instrs(self, instrs: list):
+        self.__instrs = instrs
+
+    @property
+    def instrsStr(self):
+        # 指令，存储为字符串
+        return "\n".join(self.instrs)
 
     def printBlockInfo(self):
         """ 打印基本块的信息
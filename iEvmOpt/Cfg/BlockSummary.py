@@ -0,0 +1,139 @@
+from Cfg.InstrTable import InstrTable
+from Utils import Stack, PersistentStack
+from Utils.Opcodes import isKnownOpcode
+
+# tagstack和简化版符号执行器中，需要根据两个操作数的值计算结果的指令，其余指令的结果与入口栈中的值无关
+binaryOpcodes = (0x01, 0x02, 0x03, 0x04, 0x16, 0x17, 0x18, 0x1b, 0x1c)  # ADD MUL SUB DIV AND OR XOR SHL SHR
+
+
+class BlockSummary:
+    '''
+    基本块对栈的转移摘要，由基本块的指令编译一次得到，之后每次执行基本块时直接套用，不必逐条指令解释执行
+    摘要只描述栈的形状，与栈中元素的具体含义无关，因此tagstack和简化版符号执行器共享同一个摘要：
+    执行基本块时用到的每一个值都有一个槽位，槽位0~readDepth-1为入口栈中的元素(0为栈顶)，之后为基本块内产生的值，
+    基本块内产生的值有三种：push的常量、其余指令压入的与入口栈无关的值、需要根据两个操作数计算的值(见binaryOpcodes)
+    DUP和SWAP只移动槽位，不产生新的值。执行完之后，从栈中弹出popNum个元素，再按顺序压入outputs中的槽位，
+    入口栈中没有被修改过的元素不会被弹出，因此套用摘要的复杂度只与读取和修改过的栈元素数量有关
+    '''
+
+    def __init__(self, table: InstrTable, offset: int):
+        """
+        :param table:cfg的指令表
+        :param offset:基本块的offset
+        """
+        self.offset = offset
+        self.readDepth = 0  # 需要读取的入口栈元素数量，栈中元素不足时不能套用摘要
+        self.popNum = 0  # 需要从入口栈弹出的元素数量
+        self.nodes = []  # 基本块内产生的值，格式为 (类型,指令在指令表中的下标,操作数1的槽位,操作数2的槽位)，类型为"push"、"stackOp"或"binaryOp"
+        self.outputs = []  # 执行完之后需要压入栈中的槽位，从栈底到栈顶
+        self.codecopySlots = []  # 每个codecopy执行之前，栈中第2、3个元素的槽位，格式为 [(offset的槽位,size的槽位)]
+        self.jumpSlot = None  # 基本块以JUMP或JUMPI结束时，执行跳转指令之前的栈顶槽位
+        self.hasInvalid = False  # 执行到了INVALID，此时摘要只包含INVALID之前的指令
+        self.isValid = True  # 基本块中有未定义的指令时为False，不能套用摘要
+        self.endIndex = 0  # 执行结束时，下一条指令在指令表中的下标
+
+        self.__compile(table)
+
+    def __compile(self, table: InstrTable):
+        begin, end = table.getBlockRange(self.offset)
+        # 编译时的栈，从栈底到栈顶，入口栈中深度为k的元素记为-(k+1)，基本块内产生的第i个值记为i，编译完成之后再统一编号
+        stack = []
+        entryNum = 0
+
+        def extend(num: int):
+            # 栈中的元素不足num个时，从入口栈中补充
+            nonlocal entryNum
+            while len(stack) < num:
+                entryNum += 1
+                stack.insert(0, -entryNum)
+
+        index = begin
+        while index < end:
+            opcode = table.opcodes[index]
+            if opcode == 0xfe:  # invalid，不再往下执行
+                self.hasInvalid = True
+                break
+            if not isKnownOpcode(opcode):
+                self.isValid = False
+                break
+            if opcode == 0x39:  # codecopy
+                extend(3)
+                self.codecopySlots.append((stack[-2], stack[-3]))
+            if index == end - 1 and opcode in (0x56, 0x57):  # jump jumpi
+                extend(1)
+                self.jumpSlot = stack[-1]
+            if 0x60 <= opcode <= 0x7f:  # push
+                stack.append(len(self.nodes))
+                self.nodes.append(("push", index, None, None))
+            elif 0x80 <= opcode <= 0x8f:  # dup
+                pos = opcode - 0x80
+                extend(pos + 1)
+                stack.append(stack[-1 - pos])
+            elif 0x90 <= opcode <= 0x9f:  # swap
+                depth = opcode - 0x90 + 1
+                extend(depth + 1)
+                stack[-1], stack[-1 - depth] = stack[-1 - depth], stack[-1]
+            elif opcode in binaryOpcodes:
+                extend(2)
+                first, second = stack.pop(), stack.pop()
+                stack.append(len(self.nodes))
+                self.nodes.append(("binaryOp", index, first, second))
+            else:
+                extend(table.pops[index])
+                del stack[len(stack) - table.pops[index]:]
+                for i in range(table.pushes[index]):
+                    stack.append(len(self.nodes))
+                    self.nodes.append(("stackOp", index, None, None))
+            index += 1
+        self.endIndex = index
+
+        # 栈底处没有被修改过的入口栈元素，不需要弹出之后再压入
+        popNum = entryNum
+        while popNum > 0 and stack and stack[0] == -popNum:
+            stack.pop(0)
+            popNum -= 1
+
+        # 统一编号：入口栈元素的槽位为其深度，基本块内产生的值排在入口栈元素之后
+        def toSlot(item: int):
+            return -item - 1 if item < 0 else entryNum + item
+
+        self.readDepth, self.popNum = entryNum, popNum
+        self.nodes = [(kind, i, None if a is None else toSlot(a), None if b is None else toSlot(b))
+                      for kind, i, a, b in self.nodes]
+        self.outputs = [toSlot(item) for item in stack]
+        self.codecopySlots = [(toSlot(a), toSlot(b)) for a, b in self.codecopySlots]
+        if self.jumpSlot is not None:
+            self.jumpSlot = toSlot(self.jumpSlot)
+
+    def compile(self, genPushValue, genStackOpValue, genBinaryOp):
+        """ 根据执行器中元素的具体含义，将摘要编译为可以直接套用的形式，每个执行器只需要编译一次
+        :param genPushValue:函数，参数为指令在指令表中的下标，返回push的值
+        :param genStackOpValue:函数，参数为指令在指令表中的下标，返回其余指令压入的值
+        :param genBinaryOp:函数，参数为指令在指令表中的下标，返回计算结果的函数，该函数的参数为 (操作数1,操作数2)
+        :return:(槽位的初始值，计算步骤)，计算步骤的格式为 [(结果的槽位,计算结果的函数,操作数1的槽位,操作数2的槽位)]
+        """
+        template, steps = [], []
+        for kind, index, first, second in self.nodes:
+            match kind:
+                case "push":
+                    template.append(genPushValue(index))
+                case "stackOp":
+                    template.append(genStackOpValue(index))
+                case "binaryOp":
+                    steps.append((self.readDepth + len(template), genBinaryOp(index), first, second))
+                    template.append(None)
+        return template, steps
+
+    def apply(self, stack: Stack | PersistentStack, template: list, steps: list):
+        """ 对栈套用摘要，计算步骤按照指令的顺序执行
+        :param stack:执行器的栈，调用者需要保证其中至少有readDepth个元素
+        :param template:compile得到的槽位的初始值
+        :param steps:compile得到的计算步骤
+        :return:执行时每个槽位的值
+        """
+        values = stack.getTopItems(self.readDepth)
+        values.extend(template)
+        for slot, func, first, second in steps:
+            values[slot] = func(values[first], values[second])
+        stack.replaceTop(self.popNum, [values[slot] for slot in self.outputs])
+        return values
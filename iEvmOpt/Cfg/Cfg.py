@@ -1,4 +1,8 @@
 from Cfg.BasicBlock import BasicBlock
+from Cfg.BlockSummary import BlockSummary
+from Cfg.InstrTable import InstrTable
+from Cfg.OffsetIndex import OffsetIndex
+from GraphTools.CsrGraph import CsrGraph
 
 
 class Cfg:
@@ -11,7 +15,7 @@ class Cfg:
         self.exitBlockId = 0
 
         self.bytecodeLength = 0  # cfg的字节码长度，单位为字节
-        self.bytecodeStr = ""
+        self.bytecode = b""  # cfg的字节码，由所有基本块的字节码按offset顺序拼接而成
 
         self.beginIndexInBytecode = 0  # cfg在原字节码中的起始偏移量
         self.jumpDests = set()  # 存储所有jumpdest的offset，用于tagStack
@@ -19,18 +23,21 @@ class Cfg:
         # 额外的信息
         self.pushedData = set()  # 存储所有push过的数据
         self.invalidExist = False # 是否存在invalid节点
+        self.instrTable = None  # 所有执行器共享的指令表，第一次执行时才生成
+        self.blockSummaries = {}  # 基本块对栈的转移摘要，格式为 offset:BlockSummary，第一次获取时才生成
+        self.csrGraph = None  # CSR格式的图，供图算法和路径搜索使用，第一次获取时才生成
+        self.offsetIndex = None  # 基本块与函数的地址区间索引，第一次获取时才生成
 
-    def genBytecodeStr(self):
-        # 已经读入了所有的block，将它们拼接为一个长字符串，并设置长度
-        nodes = list(self.blocks.keys())
-        nodes.sort()
-        # print(nodes)
-        for node in nodes:
-            self.bytecodeStr += self.blocks[node].bytecodeStr
-
+    def genBytecode(self):
+        # 已经读入了所有的block，将它们的字节码一次性拼接起来，并设置长度
         # 注意，exit block的长度为，实际上并不需要考虑它的长度
-        assert self.bytecodeStr.__len__() % 2 == 0
-        self.bytecodeLength = self.bytecodeStr.__len__() // 2
+        self.bytecode = b"".join([self.blocks[node].bytecode for node in sorted(self.blocks.keys())])
+        self.bytecodeLength = len(self.bytecode)
+
+    @property
+    def bytecodeStr(self):
+        # cfg的字节码，存储为十六进制字符串
+        return self.bytecode.hex()
 
     def getBytecodeLen(self):
         return self.bytecodeLength
@@ -50,9 +57,74 @@ class Cfg:
         '''
         return self.beginIndexInBytecode
 
+    def getInstrTable(self):
+        '''
+        获取解码后的指令表，第一次获取时生成
+        :return:InstrTable
+        '''
+        if self.instrTable is None:
+            self.instrTable = InstrTable(self.blocks)
+        return self.instrTable
+
+    def resetInstrTable(self):
+        '''
+        基本块或其字节码发生变化之后，丢弃已生成的指令表和转移摘要，下一次获取时重新生成
+        :return:None
+        '''
+        self.instrTable = None
+        self.blockSummaries = {}
+
+    def getBlockSummary(self, offset: int):
+        '''
+        获取基本块对栈的转移摘要，第一次获取时根据指令表生成
+        :param offset:基本块的offset
+        :return:BlockSummary
+        '''
+        summary = self.blockSummaries.get(offset)
+        if summary is None:
+            summary = BlockSummary(self.getInstrTable(), offset)
+            self.blockSummaries[offset] = summary
+        return summary
+
+    def getCsrGraph(self):
+        '''
+        获取CSR格式的图，第一次获取时根据出边表生成
+        :return:CsrGraph
+        '''
+        if self.csrGraph is None:
+            self.csrGraph = CsrGraph(list(self.blocks.keys()), self.edges)
+        return self.csrGraph
+
+    def resetCsrGraph(self):
+        '''
+        修改了edges或inEdges之后，丢弃已生成的CSR图，下一次获取时重新生成
+        :return:None
+        '''
+        self.csrGraph = None
+
+    def getOffsetIndex(self):
+        '''
+        获取基本块与函数的地址区间索引，第一次获取时根据基本块生成
+        :return:OffsetIndex
+        '''
+        if self.offsetIndex is None:
+            self.offsetIndex = OffsetIndex(self.blocks)
+        return self.offsetIndex
+
+    def resetOffsetIndex(self):
+        '''
+        基本块发生变化之后，丢弃已生成的索引，下一次获取时重新生成
+        :return:None
+        '''
+        self.offsetIndex = None
+
     def addBasicBlock(self, block: BasicBlock):
         offset = int(block.offset)
         self.blocks[offset] = block
+        self.instrTable = None
+        self.blockSummaries = {}
+        self.csrGraph = None
+        self.offsetIndex = None
         if block.length > 0:  # exit的是0
             if block.bytecode[0] == 0x5b:  # jumpdest 开头
                 self.jumpDests.add(block.offset)
@@ -68,6 +140,7 @@ class Cfg:
         _from = int(edge["from"])
         # 可能存在重复的出边
         _toBlocks = list(set(edge["to"]))
+        self.csrGraph = None
         for t in _toBlocks:
             _to = int(t)
             self.edges[_from].append(_to)
@@ -0,0 +1,320 @@
+from AssertionOptimizer.TagStacks.SimplifiedExecutor import SimplifiedExecutor
+from Cfg.BasicBlock import BasicBlock
+from Cfg.Cfg import Cfg
+from Cfg.ContractLayout import ContractLayout
+from Utils.Logger import Logger
+from Utils.Opcodes import blockEndOpcodes, formatInstr, getPushByteNum, getStackEffect, isKnownOpcode, \
+    terminalOpcodes
+
+
+class CfgBuilder:
+
+    def __init__(self, bytecodeStr: str):
+        """ 不借助EtherSolve，在进程内直接由字节码构建CFG
+        生成的信息与EtherSolve输出的json文件格式一致，因此可以直接交给EtherSolver做后续处理
+        :param bytecodeStr:十六进制的字节码字符串，即原bin文件中的内容
+        """
+        bytecodeStr = bytecodeStr.strip()
+        if bytecodeStr.startswith("0x"):
+            bytecodeStr = bytecodeStr[2:]
+        self.bytecode = bytes.fromhex(bytecodeStr)  # 原字节码，只保存这一份
+        self.log = Logger()
+        self.maxStateNum = 200000  # 求解跳转边时最多访问的状态数，防止状态爆炸
+        self.stackLimit = 1024  # evm栈的深度上限
+
+        self.layout = None  # 各个段的位置信息
+
+        # 构造函数的划分结果，定位运行时字节码和构建构造函数cfg时共用
+        self.constructorBlocks = None
+        self.constructorEvalInfos = None
+        self.constructorLength = 0
+
+    def build(self):
+        """ 构建构造函数和运行时函数的CFG
+        :return:与EtherSolve输出的json文件格式一致的字典
+        """
+        runtimeCfgInfo = self.buildRuntime()
+        return {
+            "constructorCfg": self.buildConstructor(),
+            "runtimeCfg": runtimeCfgInfo
+        }
+
+    def buildRuntime(self):
+        """ 只构建运行时函数的CFG，构造函数只做划分基本块的线性扫描，用于定位运行时字节码
+        :return:运行时函数的cfg信息，与EtherSolve输出的json文件中runtimeCfg的格式一致
+        """
+        self.log.info("正在使用内置的CfgBuilder构建CFG")
+        # 第一步，划分构造函数的基本块，扫描时会根据codecopy的参数确定构造函数函数体的结束位置
+        self.__splitConstructor()
+
+        # 第二步，根据构造函数中codecopy与return的参数，定位运行时字节码
+        self.layout = ContractLayout(len(self.bytecode), self.constructorLength)
+        if not self.layout.locateRuntime(self.bytecode, self.constructorEvalInfos):
+            self.log.fail("未能在构造函数中定位运行时字节码")
+
+        # 第三步，划分运行时函数的基本块，末尾的metadata不属于函数体
+        runtimeBegin = self.layout.runtimeBegin
+        runtimeCode = self.bytecode[runtimeBegin:runtimeBegin + self.layout.runtimeSize]
+        runtimeBlocks, _, runtimeLength = self.__splitBlocks(runtimeCode, self.layout.getRuntimeBodyLimit())
+        self.layout.setRuntimeLength(runtimeLength)
+
+        # 第四步，求解跳转边，生成cfg信息
+        return self.__genCfgInfo(runtimeCode, runtimeBlocks, runtimeLength)
+
+    def buildConstructor(self):
+        """ 构建构造函数的CFG，只有在需要修改构造函数时才会用到
+        :return:构造函数的cfg信息，与EtherSolve输出的json文件中constructorCfg的格式一致
+        """
+        self.__splitConstructor()
+        return self.__genCfgInfo(self.bytecode, self.constructorBlocks, self.constructorLength)
+
+    def __splitConstructor(self):
+        if self.constructorBlocks is None:
+            self.constructorBlocks, self.constructorEvalInfos, self.constructorLength = \
+                self.__splitBlocks(self.bytecode, len(self.bytecode))
+
+    def __splitBlocks(self, code: bytes, limit: int):
+        """ 对字节码做线性扫描，划分基本块
+        扫描时会对含有codecopy的基本块做局部执行，如果codecopy的offset是常量，且位于已扫描的位置之后，
+        说明该offset之后的内容是数据段，扫描的终点随之提前
+        :param code:待划分的字节码
+        :param limit:扫描的终点
+        :return:[基本块列表，含codecopy的基本块的局部执行信息，函数体的长度]
+                基本块的格式为 [(指令地址,操作码,push的数据)...]
+                局部执行信息的格式为 [[codecopy的参数列表],[return的参数列表]]
+        """
+        blocks = []
+        evalInfos = []
+        curBlock = []
+        pc = 0
+        while pc < limit:
+            opcode = code[pc]
+            if opcode == 0x5b and curBlock:  # jumpdest是一个新的基本块的开头
+                limit = self.__finishBlock(code, curBlock, blocks, evalInfos, limit)
+                curBlock = []
+            byteNum = getPushByteNum(opcode)
+            curBlock.append((pc, opcode, code[pc + 1:pc + 1 + byteNum] if byteNum > 0 else None))
+            pc += 1 + byteNum
+            if opcode in blockEndOpcodes or not isKnownOpcode(opcode):  # 未定义的操作码同样会终止执行
+                limit = self.__finishBlock(code, curBlock, blocks, evalInfos, limit)
+                curBlock = []
+        if curBlock:
+            self.__finishBlock(code, curBlock, blocks, evalInfos, limit)
+
+        # 函数体末尾可能存在一个无法到达的stop或者invalid，如solc在metadata前插入的invalid，它不属于函数体
+        if len(blocks) > 1 and len(blocks[-1]) == 1 and blocks[-1][0][1] in (0x00, 0xfe):
+            lastOpcode = blocks[-2][-1][1]
+            if lastOpcode == 0x56 or lastOpcode in terminalOpcodes or not isKnownOpcode(lastOpcode):
+                blocks.pop()
+
+        if not blocks:
+            return blocks, evalInfos, 0
+        lastAddr, lastOpcode, lastData = blocks[-1][-1]
+        return blocks, evalInfos, lastAddr + 1 + (len(lastData) if lastData is not None else 0)
+
+    def __finishBlock(self, code: bytes, curBlock: list, blocks: list, evalInfos: list, limit: int):
+        """ 记录一个划分完毕的基本块，如果其中含有codecopy，则对其做局部执行，并尝试提前扫描的终点
+        :return:新的扫描终点
+        """
+        blocks.append(curBlock)
+        if 0x39 not in [instr[1] for instr in curBlock]:
+            return limit
+        copyArgs, returnArgs, _ = self.__evalBlock(self.__genNodeInfo(code, curBlock))
+        evalInfos.append([copyArgs, returnArgs])
+        blockEnd = curBlock[-1][0] + 1
+        for args in copyArgs:
+            if args[1] is not None and blockEnd <= args[1] < limit:
+                limit = args[1]
+        return limit
+
+    def __genNodeInfo(self, code: bytes, block: list, blockType: str = "common"):
+        """ 生成一个基本块在json文件中的信息
+        :param code:基本块所在的字节码
+        :param block:基本块，格式为 [(指令地址,操作码,push的数据)...]
+        :param blockType:基本块的类型
+        :return:node信息
+        """
+        offset = block[0][0]
+        instrs = []
+        stackBalance = 0
+        for addr, opcode, data in block:
+            instrs.append(formatInstr(addr, opcode, data))
+            popNum, pushNum = getStackEffect(opcode)
+            stackBalance += pushNum - popNum
+        lastAddr, _, lastData = block[-1]
+        end = lastAddr + 1 + (len(lastData) if lastData is not None else 0)
+        return {
+            "offset": offset,
+            "length": end - offset,
+            "type": blockType,
+            "stackBalance": stackBalance,
+            "bytecode": code[offset:end],  # 直接给出字节码，BasicBlock不需要再解析十六进制字符串
+            "parsedOpcodes": "\n".join(instrs)
+        }
+
+    def __evalBlock(self, nodeInfo: dict):
+        """ 对单个基本块做局部执行，因为不知道栈中原有的内容，因此在执行之前，先往栈中压入128个None
+        :param nodeInfo:基本块的node信息
+        :return:[codecopy的参数列表，return的参数列表，跳转的目标]
+        """
+        cfg = Cfg()
+        cfg.addBasicBlock(BasicBlock(nodeInfo))
+        executor = SimplifiedExecutor(cfg)
+        executor.setExecutorState([None for i in range(128)])
+        executor.setBeginBlock(nodeInfo["offset"])
+        copyArgs, returnArgs, jumpTarget = [], [], None
+        while not executor.allInstrsExecuted():
+            opcode = executor.getOpcode()
+            if not isKnownOpcode(opcode):
+                break
+            match opcode:
+                case 0x39:  # codecopy
+                    copyArgs.append([executor.getTagStackItem(i) for i in range(3)])
+                case 0xf3:  # return
+                    returnArgs.append([executor.getTagStackItem(i) for i in range(2)])
+                case 0x56 | 0x57:  # jump jumpi
+                    jumpTarget = executor.getTagStackTop()
+            executor.execNextOpCode()
+        return copyArgs, returnArgs, jumpTarget
+
+    def __exploreJumps(self, cfg: Cfg):
+        """ 从起始节点出发，使用SimplifiedExecutor对栈状态做工作表遍历，求解所有可达的跳转边
+        状态以 (基本块,栈中的jumpdest地址) 作为标识，栈中其余的值对跳转目标没有影响，不参与标识
+        遇到递归调用时不再往下走，因此栈的深度以及状态的数量都是有限的
+        :param cfg:只包含基本块，没有边的cfg
+        :return:[跳转目标，调用节点可能的返回地址，所有返回边的目标，可达的节点]
+                跳转目标的格式为 jump所在block:{目标block}
+                返回地址的格式为 调用节点:{返回地址}
+        """
+        jumpTargets = {}
+        returnSites = {}
+        returnTargets = set()
+        reachedNodes = set()
+        visitedStates = set()
+        executor = SimplifiedExecutor(cfg)
+        worklist = [(cfg.initBlockId, [])]
+        while worklist:
+            node, stack = worklist.pop()
+            stateKey = (node, tuple([item if item in cfg.jumpDests else None for item in stack]))
+            if stateKey in visitedStates:
+                continue
+            if len(visitedStates) >= self.maxStateNum:
+                self.log.warning("求解跳转边时访问的状态数超出上限，部分跳转边可能缺失")
+                break
+            visitedStates.add(stateKey)
+            reachedNodes.add(node)
+            block = cfg.blocks[node]
+            if block.jumpType == "terminal" or block.length == 0:
+                continue
+
+            executor.clear()
+            executor.setExecutorState(stack)
+            executor.setBeginBlock(node)
+            target, jumpStack = None, None  # 跳转的目标，以及可能是调用节点时，执行跳转指令之前的栈
+            while not executor.allInstrsExecuted():
+                if executor.isLastInstr():
+                    target = executor.getTagStackTop()
+                    if block.jumpType == "unconditional" and block.couldBeCaller:  # 只在需要查找返回地址时复制整个栈
+                        jumpStack = executor.getExecutorState()
+                executor.execNextOpCode()
+            outStack = executor.getExecutorState()
+            if len(outStack) > self.stackLimit:  # 栈溢出，不会再往下执行
+                continue
+
+            fallNode = node + block.length
+            match block.jumpType:
+                case "fall":
+                    if fallNode != cfg.exitBlockId:
+                        worklist.append((fallNode, outStack))
+                case "conditional":
+                    if target in cfg.jumpDests:
+                        jumpTargets.setdefault(node, set()).add(target)
+                        worklist.append((target, outStack))
+                    worklist.append((fallNode, outStack))
+                case "unconditional":
+                    if target not in cfg.jumpDests:
+                        continue
+                    jumpTargets.setdefault(node, set()).add(target)
+                    if block.couldBeCaller:  # 在本节点内push了跳转地址，栈上离栈顶最近的jumpdest地址可能是返回地址
+                        pos = len(jumpStack) - 2
+                        while pos >= 0 and jumpStack[pos] not in cfg.jumpDests:
+                            pos -= 1
+                        if pos >= 0:
+                            returnSites.setdefault(node, set()).add(jumpStack[pos])
+                            if jumpStack[pos] in jumpStack[:pos]:
+                                # 返回地址已经在栈中，说明从同一个调用点进入的调用还没有返回，是一次递归调用
+                                # 被调用函数的执行过程以及返回到这个调用点的边，已经在外层的调用中遍历过了，不必再往下走，
+                                # 否则每一层递归都会压入新的返回地址，状态的数量没有上限
+                                continue
+                    else:  # 使用栈上已有的地址进行跳转，可能是返回边
+                        returnTargets.add(target)
+                    worklist.append((target, outStack))
+        return jumpTargets, returnSites, returnTargets, reachedNodes
+
+    def __genCfgInfo(self, code: bytes, blocks: list, codeLength: int):
+        """ 求解跳转边，生成一个cfg的json信息
+        与EtherSolve一致：terminal节点和无法求解的跳转都会连向exit节点，exit节点的offset为函数体的长度
+        :param code:cfg所在的字节码
+        :param blocks:划分好的基本块
+        :param codeLength:函数体的长度
+        :return:cfg的json信息，格式为 {"nodes":[...],"successors":[{"from":offset,"to":[offset...]}...]}
+        """
+        nodeInfos = [self.__genNodeInfo(code, b) for b in blocks]
+        nodeInfos.append({
+            "offset": codeLength,
+            "length": 0,
+            "type": "exit",
+            "stackBalance": 0,
+            "bytecode": b"",
+            "parsedOpcodes": "{}: EXIT BLOCK".format(codeLength)
+        })
+        cfg = Cfg()
+        for info in nodeInfos:
+            cfg.addBasicBlock(BasicBlock(info))
+        cfg.exitBlockId = codeLength
+
+        jumpTargets, returnSites, returnTargets, reachedNodes = self.__exploreJumps(cfg)
+
+        # 生成边，对于遍历时没有求解出目标的跳转，再单独对其所在的基本块做一次局部执行
+        edges = {}
+        for info in nodeInfos[:-1]:
+            node = info["offset"]
+            block = cfg.blocks[node]
+            fallNode = node + block.length
+            if block.jumpType in ["unconditional", "conditional"] and node not in jumpTargets:
+                _, _, target = self.__evalBlock(info)
+                if target in cfg.jumpDests:
+                    jumpTargets[node] = {target}
+            targets = sorted(jumpTargets.get(node, set()))
+            match block.jumpType:
+                case "terminal":
+                    edges[node] = [cfg.exitBlockId]
+                case "fall":
+                    edges[node] = [fallNode]
+                case "conditional":
+                    edges[node] = targets + [fallNode] if targets else [fallNode, cfg.exitBlockId]
+                case "unconditional":
+                    edges[node] = targets if targets else [cfg.exitBlockId]
+
+        # 标记基本块的类型：从起始节点出发，遇到已确认的函数调用时直接跳到返回地址，能到达的节点为dispatcher，其余为common
+        dispatcherNodes = set()
+        queue = [cfg.initBlockId]
+        while queue:
+            node = queue.pop()
+            if node in dispatcherNodes or node == cfg.exitBlockId:
+                continue
+            dispatcherNodes.add(node)
+            confirmedReturnSites = returnSites.get(node, set()) & returnTargets
+            queue.extend(confirmedReturnSites if confirmedReturnSites else edges[node])
+        for info in nodeInfos[:-1]:
+            info["type"] = "dispatcher" if info["offset"] in dispatcherNodes else "common"
+
+        if len(reachedNodes) < len(nodeInfos) - 1:
+            self.log.info("CfgBuilder发现{}个无法从起始节点到达的Block".format(len(nodeInfos) - 1 - len(reachedNodes)))
+        return {
+            "nodes": nodeInfos,
+            "successors": [{"from": node, "to": tos} for node, tos in edges.items()]
+        }
+
+    def getLayout(self):
+        return self.layout
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # windows下没有fcntl，使用msvcrt加锁
+    fcntl = None
+    import msvcrt
+
+from Cfg.BasicBlock import BasicBlock
+from Cfg.Cfg import Cfg
+from Cfg.ContractLayout import ContractLayout
+from Utils.Logger import Logger
+
+cacheMagic = b"IEOC"
+cacheVersion = 7  # 缓存格式或cfg构建逻辑发生变化时，需要增加版本号，使旧的缓存失效
+noneOffset = 0xffffffff  # 表示jumpiDest或metadata的位置没有设置
+
+
+class CfgCache:
+
+    def __init__(self, cacheDir: str = None, maxSize: int = 512 * 1024 * 1024):
+        """ 以字节码的哈希值为键的cfg磁盘缓存
+        缓存的内容为修复之后的构造函数cfg与运行时cfg（包括jumpDests、pushedData、couldBeCaller等信息），以及各个段的位置和数据段
+        使用紧凑的二进制格式存储，缓存的总大小超出上限时，按最近使用时间淘汰
+        :param cacheDir:缓存目录，默认为 ~/.cache/iEvmOpt/cfg
+        :param maxSize:缓存的总大小上限，单位为字节
+        """
+        if cacheDir is None:
+            cacheDir = os.path.join(os.path.expanduser("~"), ".cache", "iEvmOpt", "cfg")
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        self.log = Logger()
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    def getKey(self, bytecodeStr: str, backend: str):
+        """ 计算缓存的键
+        :param bytecodeStr:原字节码字符串
+        :param backend:构建cfg使用的工具，不同工具得到的cfg可能不同
+        :return:键
+        """
+        bytecodeStr = bytecodeStr.strip()
+        if bytecodeStr.startswith("0x"):
+            bytecodeStr = bytecodeStr[2:]
+        h = hashlib.sha256()
+        h.update("{}:{}:".format(cacheVersion, backend).encode())
+        h.update(bytecodeStr.lower().encode())
+        return h.hexdigest()
+
+    def __getPath(self, key: str):
+        return os.path.join(self.cacheDir, key + ".cfg")
+
+    def load(self, key: str):
+        """ 读取缓存
+        :param key:键
+        :return:[构造函数cfg(没有构建时为None)，运行时cfg，构造函数数据段，运行时数据段，各个段的位置]，没有命中时返回None
+        """
+        path = self.__getPath(key)
+        try:
+            with open(path, "rb") as f:
+                data = zlib.decompress(f.read())
+            if data[:4] != cacheMagic or struct.unpack_from("<H", data, 4)[0] != cacheVersion:
+                raise ValueError("CFG缓存的格式不一致")
+            pos = 7
+            constructorCfg = None
+            if data[6] == 1:  # 构造函数的cfg是按需构建的，可能不存在
+                constructorCfg, pos = self.__readCfg(data, pos)
+            cfg, pos = self.__readCfg(data, pos)
+            constructorDataSeg, pos = self.__readBytes(data, pos)
+            dataSeg, pos = self.__readBytes(data, pos)
+            layout, pos = self.__readLayout(data, pos)
+        except (OSError, zlib.error, struct.error, ValueError, IndexError):  # 不存在或者已经损坏
+            self.__updateStats(False)
+            return None
+        os.utime(path)  # 更新最近使用时间
+        hits = self.__updateStats(True)
+        if hits is None:
+            self.log.info("命中CFG缓存:{}".format(key[:16]))
+        else:
+            self.log.info("命中CFG缓存:{}，缓存累计命中{}次".format(key[:16], hits))
+        return constructorCfg, cfg, constructorDataSeg, dataSeg, layout
+
+    def store(self, key: str, constructorCfg: Cfg, cfg: Cfg, constructorDataSeg: bytes, dataSeg: bytes,
+              layout: ContractLayout):
+        """ 写入缓存，先写入临时文件再替换，保证并发读写时不会读到不完整的文件
+        """
+        data = bytearray(cacheMagic)
+        data += struct.pack("<H", cacheVersion)
+        data += bytes([0 if constructorCfg is None else 1])
+        if constructorCfg is not None:
+            self.__writeCfg(data, constructorCfg)
+        self.__writeCfg(data, cfg)
+        self.__writeBytes(data, constructorDataSeg)
+        self.__writeBytes(data, dataSeg)
+        self.__writeLayout(data, layout)
+        try:
+            fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(bytes(data), 1))
+            os.replace(tmpPath, self.__getPath(key))
+        except OSError:
+            self.log.warning("CFG缓存写入失败")
+            return
+        self.__evict()
+
+    def __evict(self):
+        """ 缓存总大小超出上限时，淘汰最久没有使用的缓存
+        """
+        entries = []
+        totalSize = 0
+        for name in os.listdir(self.cacheDir):
+            if not name.endswith(".cfg"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cacheDir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            totalSize += st.st_size
+        entries.sort()
+        for mtime, size, name in entries:
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(os.path.join(self.cacheDir, name))
+            except OSError:
+                pass
+            totalSize -= size
+
+    def __updateStats(self, isHit: bool):
+        """ 更新缓存的命中统计，多个进程共用一个缓存目录，读取、修改、写回都在文件锁内进行，避免丢失计数
+        :return:累计的命中次数，无法加锁时为None
+        """
+        statsPath = os.path.join(self.cacheDir, "stats.json")
+        try:
+            lockFile = open(os.path.join(self.cacheDir, "stats.lock"), "a+")
+        except OSError:
+            return None
+        with lockFile:
+            try:
+                self.__lock(lockFile, True)
+            except OSError:
+                return None
+            try:
+                stats = {"hits": 0, "misses": 0}
+                try:
+                    with open(statsPath, "r") as f:
+                        stats.update(json.load(f))
+                except (OSError, ValueError):
+                    pass
+                stats["hits" if isHit else "misses"] += 1
+                try:
+                    fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(stats, f)
+                    os.replace(tmpPath, statsPath)
+                except OSError:
+                    pass
+                return stats["hits"]
+            finally:
+                self.__lock(lockFile, False)
+
+    def __lock(self, lockFile, isLock: bool):
+        """ 对锁文件加锁或解锁，加锁时阻塞直到获得锁
+        :param lockFile:打开的锁文件
+        :param isLock:True为加锁，False为解锁
+        """
+        if fcntl is not None:
+            fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX if isLock else fcntl.LOCK_UN)
+        else:
+            lockFile.seek(0)
+            msvcrt.locking(lockFile.fileno(), msvcrt.LK_LOCK if isLock else msvcrt.LK_UNLCK, 1)
+
+    # 以下为二进制格式的读写，所有整数均为小端序
+    # 文件的格式(zlib压缩)：
+    #   "IEOC", u16 版本号, u8 是否含有构造函数cfg, [构造函数cfg], 运行时cfg, bytes 构造函数数据段, bytes 运行时数据段, 各个段的位置
+    # cfg的格式：
+    #   u32 基本块数量 n, u32 initBlockId, u32 exitBlockId, u32 beginIndex
+    #   u32[n] offset, u32[n] length, i32[n] stackBalance, u8[n] 类型序号, u8[n] couldBeCaller, u32[n] jumpiDest[True]
+    #   str 类型表(以\n分隔), bytes 函数体字节码
+    #   出边表、入边表、jumpDest各一组: u32[n] 每个基本块的数量, u32[] 所有目标
+    #   u32 pushedData的数量, 每个数据为 u8 字节数 + 字节
+    # 各个段的位置的格式：
+    #   u32 原字节码长度, u32 构造函数函数体长度, u32 运行时字节码起始位置, u32 运行时字节码长度, u32 运行时函数体长度,
+    #   u32 metadata起始位置
+    def __writeCfg(self, data: bytearray, cfg: Cfg):
+        blocks = list(cfg.blocks.values())
+        types = sorted(set([b.blockType for b in blocks]))
+        data += struct.pack("<IIII", len(blocks), cfg.initBlockId, cfg.exitBlockId, cfg.getBeginIndex())
+        data += array("I", [b.offset for b in blocks]).tobytes()
+        data += array("I", [b.length for b in blocks]).tobytes()
+        data += array("i", [b.stackBalance for b in blocks]).tobytes()
+        data += bytes([types.index(b.blockType) for b in blocks])
+        data += bytes([1 if b.couldBeCaller else 0 for b in blocks])
+        data += array("I", [b.jumpiDest.get(True, noneOffset) for b in blocks]).tobytes()
+        self.__writeStr(data, "\n".join(types))
+        self.__writeBytes(data, cfg.bytecode)
+        for lists in ([cfg.edges[b.offset] for b in blocks], [cfg.inEdges[b.offset] for b in blocks],
+                      [b.jumpDest for b in blocks]):
+            data += array("I", [len(l) for l in lists]).tobytes()
+            data += array("I", [t for l in lists for t in l]).tobytes()
+        data += struct.pack("<I", len(cfg.pushedData))
+        for d in cfg.pushedData:
+            byteNum = (d.bit_length() + 7) // 8
+            data += struct.pack("<B", byteNum) + d.to_bytes(byteNum, "big")
+
+    def __readCfg(self, data: bytes, pos: int):
+        blockNum, initBlockId, exitBlockId, beginIndex = struct.unpack_from("<IIII", data, pos)
+        pos += 16
+        offsets, pos = self.__readArray(data, pos, "I", blockNum)
+        lengths, pos = self.__readArray(data, pos, "I", blockNum)
+        stackBalances, pos = self.__readArray(data, pos, "i", blockNum)
+        typeIds = data[pos:pos + blockNum]
+        couldBeCallers = data[pos + blockNum:pos + 2 * blockNum]
+        pos += 2 * blockNum
+        jumpiTrueDests, pos = self.__readArray(data, pos, "I", blockNum)
+        typesStr, pos = self.__readStr(data, pos)
+        types = typesStr.split("\n")
+        code, pos = self.__readBytes(data, pos)
+        edgeLists = []
+        for i in range(3):
+            counts, pos = self.__readArray(data, pos, "I", blockNum)
+            targets, pos = self.__readArray(data, pos, "I", sum(counts))
+            lists = []
+            begin = 0
+            for c in counts:
+                lists.append(list(targets[begin:begin + c]))
+                begin += c
+            edgeLists.append(lists)
+        pushedDataNum = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
+        pushedData = set()
+        for i in range(pushedDataNum):
+            byteNum = data[pos]
+            pushedData.add(int.from_bytes(data[pos + 1:pos + 1 + byteNum], "big"))
+            pos += 1 + byteNum
+
+        # 重新构造cfg，字节码的偏移量即为基本块在函数体中的offset
+        cfg = Cfg()
+        for i in range(blockNum):
+            offset, length = offsets[i], lengths[i]
+            block = BasicBlock({"offset": offset, "length": length, "type": types[typeIds[i]],
+                                "stackBalance": stackBalances[i], "bytecode": code[offset:offset + length]})
+            block.couldBeCaller = couldBeCallers[i] == 1
+            if jumpiTrueDests[i] != noneOffset:
+                block.jumpiDest[True] = jumpiTrueDests[i]
+                block.jumpiDest[False] = offset + length
+            block.jumpDest = edgeLists[2][i]
+            cfg.addBasicBlock(block)
+        for i in range(blockNum):
+            cfg.edges[offsets[i]] = edgeLists[0][i]
+            cfg.inEdges[offsets[i]] = edgeLists[1][i]
+        cfg.genBytecode()
+        cfg.initBlockId = initBlockId
+        cfg.exitBlockId = exitBlockId
+        cfg.setBeginIndex(beginIndex)
+        cfg.pushedData = pushedData
+        return cfg, pos
+
+    def __writeLayout(self, data: bytearray, layout: ContractLayout):
+        metadataBegin = layout.getMetadataBegin()
+        data += struct.pack("<IIIIII", layout.codeLength, layout.constructorLength, layout.runtimeBegin,
+                            layout.runtimeSize, layout.runtimeLength, noneOffset if metadataBegin is None else metadataBegin)
+
+    def __readLayout(self, data: bytes, pos: int):
+        codeLength, constructorLength, runtimeBegin, runtimeSize, runtimeLength, metadataBegin = \
+            struct.unpack_from("<IIIIII", data, pos)
+        layout = ContractLayout(codeLength, constructorLength)
+        layout.runtimeBegin = runtimeBegin
+        layout.runtimeSize = runtimeSize
+        layout.runtimeLength = runtimeLength
+        layout.metadataBegin = None if metadataBegin == noneOffset else metadataBegin
+        return layout, pos + 24
+
+    def __readArray(self, data: bytes, pos: int, typecode: str, num: int):
+        res = array(typecode)
+        res.frombytes(data[pos:pos + num * res.itemsize])
+        return res, pos + num * res.itemsize
+
+    def __writeBytes(self, data: bytearray, content: bytes):
+        data += struct.pack("<I", len(content)) + content
+
+    def __readBytes(self, data: bytes, pos: int):
+        length = struct.unpack_from("<I", data, pos)[0]
+        return data[pos + 4:pos + 4 + length], pos + 4 + length
+
+    def __writeStr(self, data: bytearray, content: str):
+        self.__writeBytes(data, content.encode())
+
+    def __readStr(self, data: bytes, pos: int):
+        content, pos = self.__readBytes(data, pos)
+        return content.decode(), pos
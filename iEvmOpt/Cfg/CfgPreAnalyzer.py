@@ -0,0 +1,136 @@
+from Cfg.Cfg import Cfg
+from Utils.Logger import Logger
+
+# 与TagStack中的__execOp1、__execOp2对应的操作码，这些运算会保留操作数中的跳转地址
+op1Opcodes = {0x03, 0x04, 0x16, 0x17, 0x18, 0x1b, 0x1c}  # SUB DIV AND OR XOR SHL SHR
+op2Opcodes = {0x01, 0x02}  # ADD MUL
+unknownItem = (None, False)  # 未知的栈元素，格式为 (值,值是否可能是跳转地址)
+
+
+class CfgPreAnalyzer:
+
+    def __init__(self, cfg: Cfg):
+        """ 对cfg中的所有指令做一次线性的预分析，构造函数cfg与运行时cfg通用
+        指令数组来自cfg共享的指令表，对每个基本块只扫描一遍，得到：
+            每个基本块内push的数据、可能的调用节点(跳转目标在块内即可确定的无条件跳转)、所有push过的数据
+        分析只依赖指令，不依赖边，因此可以在修复之前进行，修复时使用每个基本块内push的数据，修复之后再写回cfg
+        跳转目标的求解规则与TagStack一致，但不需要为每个基本块压入128个None，栈底之下的元素一律视为未知
+        :param cfg:已经读入基本块的cfg
+        """
+        self.cfg = cfg
+        self.log = Logger()
+
+        # 预解码的指令数组，直接使用cfg共享的指令表
+        self.instrTable = None  # cfg共享的指令表
+        self.instrAddrs = None  # 指令的地址
+        self.opcodes = None  # 操作码
+        self.pushValues = None  # push的数据，非push指令为None
+        self.blockInstrRange = None  # 基本块的指令在数组中的下标范围，格式为 offset:(begin,end)
+
+        # 分析结果
+        self.blockPushes = {}  # 每个基本块内push的数据，格式为 offset:[(push指令的地址,push的字节数,push的数据)]
+        self.callerBlocks = set()  # 跳转目标在块内确定，且为jumpdest的基本块，即可能的调用节点
+        self.pushedData = set()  # 无条件跳转的基本块中push过的数据
+
+    def analyze(self):
+        """ 进行预分析
+        """
+        self.__decode()
+        instrAddrs, opcodes, pushValues = self.instrAddrs, self.opcodes, self.pushValues
+        for offset, (begin, end) in self.blockInstrRange.items():
+            pushes = [(instrAddrs[i], opcodes[i] - 0x5f, pushValues[i]) for i in range(begin, end)
+                      if pushValues[i] is not None]
+            self.blockPushes[offset] = pushes
+            if self.cfg.blocks[offset].jumpType != "unconditional":
+                continue
+            # 与之前的TagStack遍历一致，只统计无条件跳转的基本块中push的数据
+            self.pushedData.update([p[2] for p in pushes])
+            if self.__evalJumpTarget(begin, end) in self.cfg.jumpDests:
+                self.callerBlocks.add(offset)
+
+    def __decode(self):
+        """ 获取cfg的指令表，指令表按基本块解码，与执行器看到的指令一致
+        """
+        self.instrTable = self.cfg.getInstrTable()
+        self.instrAddrs = self.instrTable.addrs
+        self.opcodes = self.instrTable.opcodes
+        self.pushValues = self.instrTable.pushValues
+        self.blockInstrRange = self.instrTable.blockRange
+
+    def __evalJumpTarget(self, begin: int, end: int):
+        """ 在块内执行一个以jump结尾的基本块，获取跳转前的栈顶元素
+        :param begin:基本块第一条指令的下标
+        :param end:基本块最后一条指令的下标+1
+        :return:栈顶元素的值，未知时返回None
+        """
+        stack = []
+
+        def pop():
+            return stack.pop() if stack else unknownItem
+
+        for i in range(begin, end - 1):  # 最后一条指令是jump
+            opcode = self.opcodes[i]
+            if self.pushValues[i] is not None:
+                value = self.pushValues[i]
+                stack.append((value, value in self.cfg.jumpDests))
+            elif 0x80 <= opcode <= 0x8f:  # dup
+                depth = opcode - 0x7f
+                stack.append(stack[-depth] if depth <= len(stack) else unknownItem)
+            elif 0x90 <= opcode <= 0x9f:  # swap
+                depth = opcode - 0x8f
+                if depth + 1 > len(stack):
+                    stack[0:0] = [unknownItem] * (depth + 1 - len(stack))
+                stack[-1], stack[-1 - depth] = stack[-1 - depth], stack[-1]
+            elif opcode in op1Opcodes:
+                first, second = pop(), pop()
+                assert not (first[1] and second[1]) or first[0] == second[0]
+                if first[1] != second[1]:  # 只有一个是跳转地址，则保留
+                    stack.append(first if first[1] else second)
+                else:
+                    stack.append(unknownItem)
+            elif opcode in op2Opcodes:
+                first, second = pop(), pop()
+                assert not (first[1] and second[1] and first[0] != second[0])
+                if first[1] and second[1]:
+                    stack.append(first)
+                elif first[1] or second[1]:
+                    addr, other = (first, second) if first[1] else (second, first)
+                    if other[0] is None:  # 跳转地址与未知数运算，结果一定不是跳转地址
+                        self.log.warning("可疑的跳转地址与未知值之间出现了运算")
+                        stack.append(unknownItem)
+                    else:
+                        stack.append(addr)
+                else:
+                    stack.append(unknownItem)
+            else:
+                for j in range(self.instrTable.pops[i]):
+                    pop()
+                stack.extend([unknownItem] * self.instrTable.pushes[i])
+        return pop()[0]
+
+    def apply(self):
+        """ 将预分析的结果写回cfg：标记可能的调用节点，记录push过的数据
+        """
+        for offset in self.callerBlocks:
+            self.cfg.blocks[offset].couldBeCaller = True
+        self.cfg.pushedData = self.pushedData
+
+    def setJumpDests(self):
+        """ 根据cfg的边，设置无条件跳转的目标，以及条件跳转为True和False时的目标
+        """
+        for offset, b in self.cfg.blocks.items():
+            if b.jumpType == "unconditional":
+                b.jumpDest = list(self.cfg.edges[offset])
+            elif b.jumpType == "conditional":
+                fallBlockOffset = b.offset + b.length
+                dests = list(self.cfg.edges[offset])
+                jumpiTrueOffset = dests[0] if dests[0] != fallBlockOffset else dests[1]
+                b.jumpiDest[True] = jumpiTrueOffset
+                b.jumpiDest[False] = fallBlockOffset
+
+    def getPushSources(self, values: set):
+        """ 获取push了给定数据的基本块
+        :param values:数据的集合
+        :return:基本块的offset列表
+        """
+        return [offset for offset, pushes in self.blockPushes.items() if any(p[2] in values for p in pushes)]
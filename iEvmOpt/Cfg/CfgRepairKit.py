@@ -1,22 +1,42 @@
 from AssertionOptimizer.TagStacks.SimplifiedExecutor import SimplifiedExecutor
 from AssertionOptimizer.SymbolicExecutor import SymbolicExecutor
 from Cfg.Cfg import Cfg
+from Cfg.CfgPreAnalyzer import CfgPreAnalyzer
 from Utils.Logger import Logger
 
 
 class CfgRepairKit:
-    def __init__(self, cfg: Cfg):
+    def __init__(self, cfg: Cfg, targeted: bool = True, analyzer: CfgPreAnalyzer = None):
         """
         :param cfg:
+        :param targeted:是否先进行定向修复，即只对能够到达可疑跳转的基本块进行遍历
+        :param analyzer:已经完成分析的预分析器，定向修复时使用其中每个基本块内push的数据，为None时在需要时自行分析
         """
         self.cfg = cfg
+        self.analyzer = analyzer
         self.inEdge = cfg.inEdges
         self.edges = cfg.edges
         self.nodes = list(cfg.blocks.keys())
         self.blocks = cfg.blocks
         self.todoNodes = set()  # 没有入边的节点
         self.fixNeeded = False  # 是否需要修复
-        self.visiting = dict(zip(self.nodes, [False for i in self.nodes]))
+
+        # 工作表遍历需要的信息
+        self.states = {}  # 基本块入口处合并后的状态，格式为 (offset,栈顶指纹):栈，放宽的标识见__explore
+        self.worklist = []  # 待执行的状态标识
+        self.pending = set()  # 已经在工作表中的状态标识
+        self.fingerprintDepth = 32  # 栈顶指纹包含的元素数量
+        self.nodeStateNum = {}  # 每个基本块的状态数量
+        self.maxStatePerNode = 64  # 每个基本块最多保留的不同标识的状态数，超出之后使用放宽的标识
+        self.widenedDepth = 2  # 放宽的标识中保留的跳转地址数量
+        self.maxStateNum = 200000  # 最多访问的状态数，防止状态爆炸
+        self.stateOverflow = False
+        self.stackLimit = 1024  # evm栈的深度上限
+
+        # 定向修复需要的信息
+        self.targeted = targeted
+        self.slice = None  # 允许执行的基本块集合，None表示不做限制
+        self.repairedEdgeNum = 0  # 已经修复的边的数量
         self.log = Logger()
 
     def fix(self):
@@ -30,10 +50,12 @@ class CfgRepairKit:
         if not self.fixNeeded:
             return
 
-        # 从起始节点开始，使用tagStack，进行简单的dfs遍历，尝试进行修复
-
-        # self.__dfs(0, SimplifiedExecutor(self.cfg))
-        self.__dfs(0, SimplifiedExecutor(self.cfg))
+        # 从起始节点开始，使用SimplifiedExecutor对状态做工作表遍历，尝试进行修复
+        # 定向修复时只对能够到达可疑跳转的切片做遍历
+        if self.targeted:
+            self.__targetedFix()
+        else:
+            self.__explore()
 
     def __check(self):
         """
@@ -64,66 +86,177 @@ class CfgRepairKit:
         """
         return self.edges, self.inEdge
 
-    def __dfs(self, curNode: int, parentExecutor: SimplifiedExecutor):
+    def __targetedFix(self):
         """
-        进行dfs，使用原有的边，尝试进行修复
-        该dfs不会走回头路，不会走已经走过的路
-        :param curNode:
-        :return:
+        定向修复：缺失的边一定是某个无条件跳转跳到了一个没有入边的节点，而跳转地址只能来自push的数据，因此：
+        1.找到push了没有入边的节点地址的基本块，作为数据的来源
+        2.从来源出发，沿着已有的边能够到达的无条件跳转，都可能是缺失的边的起点
+        3.只有能够到达这些跳转的基本块，才会影响跳转时的栈，它们组成了需要遍历的切片
+        修复了新的边之后，切片可能会扩大，因此重新生成切片并遍历，直到切片不再变化
+        遍历时按照栈上的跳转地址走，不依赖已有的边，因此切片不变时再次遍历也不会修复出新的边
+        :return:None
+        """
+        while True:
+            sliceNodes = self.__genSlice()
+            if len(sliceNodes) == 0 or sliceNodes == self.slice:
+                return
+            self.slice = sliceNodes
+            self.log.info("定向修复，遍历的基本块数量:{}/{}".format(len(self.slice), len(self.blocks)))
+            edgeNum = self.repairedEdgeNum
+            self.__explore()
+            if self.repairedEdgeNum == edgeNum or self.isFixed():
+                return
+
+    def __getPushSources(self):
         """
-        if self.visiting[curNode] or curNode == self.cfg.exitBlockId or self.blocks[curNode].jumpType == "terminal":
+        获取push了没有入边的节点地址的基本块
+        :return:基本块的offset列表
+        """
+        orphans = set([node for node in self.todoNodes if len(self.inEdge[node]) == 0])
+        if len(orphans) == 0:
+            return []
+        if self.analyzer is None:
+            self.analyzer = CfgPreAnalyzer(self.cfg)
+            self.analyzer.analyze()
+        return self.analyzer.getPushSources(orphans)
+
+    def __genSlice(self):
+        """
+        生成定向修复时需要遍历的切片，即能够到达可疑跳转的所有基本块
+        :return:基本块offset的集合
+        """
+        exitBlockId = self.cfg.exitBlockId
+        # 从数据的来源出发，正向搜索可能的跳转
+        reached = set(self.__getPushSources())
+        queue = list(reached)
+        while queue:
+            node = queue.pop()
+            for _to in self.edges[node]:
+                if _to not in reached and _to != exitBlockId:
+                    reached.add(_to)
+                    queue.append(_to)
+        jumps = [node for node in reached if self.blocks[node].jumpType == "unconditional"]
+
+        # 从可疑的跳转出发，反向搜索能够到达它们的基本块
+        sliceNodes = set(jumps)
+        queue = list(jumps)
+        while queue:
+            node = queue.pop()
+            for _from in self.inEdge[node]:
+                if _from not in sliceNodes:
+                    sliceNodes.add(_from)
+                    queue.append(_from)
+        return sliceNodes
+
+    def __explore(self):
+        """
+        从起始节点开始，使用工作表对状态进行遍历，尝试进行修复，直到所有状态都不再变化
+        状态以 (基本块,栈顶若干个元素中的jumpdest地址) 作为标识，标识相同的状态在基本块入口处合并：
+        两个栈从栈顶开始对齐，不相同的元素置为None，深度不同时只保留较浅的部分
+        栈的深度小于指纹长度时，指纹本身就包含了深度，因此只有较深的栈会被截断
+        一个基本块的标识数量超出上限时(如递归调用不断压入不同的返回地址)，之后到达的状态改用放宽的标识：
+        只保留栈顶附近的前widenedDepth个jumpdest地址，即返回地址的指纹，不再记录它们的位置。
+        返回地址不同的状态不会被合并，因此在上限之后才到达的调用(如另一个调用点对递归函数的调用)，仍然能修复出返回边
+        jumpdest地址的数量是有限的，因此标识的数量也是有限的，又因为元素只会从数值变为None、栈只会变浅，所以遍历一定能到达不动点
+        :return:None
+        """
+        self.states, self.worklist, self.pending, self.nodeStateNum = {}, [], set(), {}
+        self.stateOverflow = False
+        executor = SimplifiedExecutor(self.cfg)
+        self.__mergeState(self.cfg.initBlockId, [])
+        while self.worklist:
+            key = self.worklist.pop()
+            self.pending.discard(key)
+            node = key[0]
+            block = self.blocks[node]
+
+            # 第一步，从合并后的入口状态开始执行基本块
+            executor.clear()
+            executor.setExecutorState(self.states[key])
+            executor.setBeginBlock(node)
+            jumpInfo = None
+            while not executor.allInstrsExecuted():
+                if executor.isLastInstr():
+                    jumpInfo = executor.getTagStackTop()
+                executor.execNextOpCode()
+            outStack = executor.getExecutorState()
+            if len(outStack) > self.stackLimit:  # 栈溢出，不会再往下执行
+                continue
+
+            # 第二步，查看是否跳到一个没有入边的节点，是则添加新跳转边，再将状态传给后继节点
+            # 不顾原来的边关系，直接按照栈上的跳转地址走
+            fallNode = node + block.length
+            match block.jumpType:
+                case "fall":
+                    self.__mergeState(fallNode, outStack)
+                case "conditional":
+                    if jumpInfo is not None:
+                        self.__mergeState(jumpInfo, outStack)
+                    self.__mergeState(fallNode, outStack)
+                case "unconditional":
+                    if jumpInfo is None:  # underflow或者合并会导致None
+                        continue
+                    self.__addJumpEdge(node, jumpInfo)
+                    self.__mergeState(jumpInfo, outStack)
+
+    def __mergeState(self, node: int, stack: list):
+        """
+        将一个状态合并到基本块的入口，状态发生变化时加入工作表
+        :param node:基本块的offset
+        :param stack:进入基本块时的栈
+        :return:None
+        """
+        if node not in self.blocks or node == self.cfg.exitBlockId or self.blocks[node].jumpType == "terminal":
+            return
+        if self.slice is not None and node not in self.slice:  # 定向修复时，不在切片中的基本块无法到达可疑的跳转
             return
-        self.visiting[curNode] = True
-
-        # 第一步，进行tagstack执行，这一步需要复制父节点的符号执行信息
-        curExecutor = SimplifiedExecutor(self.cfg)
-        curExecutor.setExecutorState(parentExecutor.getExecutorState())
-        curExecutor.setBeginBlock(curNode)
-        jumpInfo = None
-        while not curExecutor.allInstrsExecuted():
-            if curExecutor.isLastInstr():
-                jumpInfo = curExecutor.getTagStackTop()
-            curExecutor.execNextOpCode()
-
-        # 第二步，查看是否跳到一个没有入边的节点，是则:
-        # 若原来只是跳到exit block，则删除这条边
-        # 添加新跳转边
-        jumpInfoDigit = None
-        jumpInfoStr = jumpInfo.__str__()
-        if jumpInfoStr.isdigit():  # 是一个数字，检查是否跳到了没有入边的点
-            jumpInfoDigit = int(jumpInfoStr)
-
-        if self.blocks[curNode].jumpType == "unconditional":
-            if jumpInfo is None:  # underflow会导致None
-                self.visiting[curNode] = False
+        jumpDests = self.cfg.jumpDests
+        fingerprint = tuple([item if item in jumpDests else None for item in stack[-self.fingerprintDepth:]])
+        key = (node, fingerprint)
+        oldStack = self.states.get(key)
+        isWidened = False
+        if oldStack is None and self.nodeStateNum.get(node, 0) >= self.maxStatePerNode:
+            # 只按照返回地址的指纹合并，格式为 (offset,None,从栈顶开始的jumpdest地址)
+            returnAddrs = tuple([item for item in reversed(fingerprint) if item is not None][:self.widenedDepth])
+            key = (node, None, returnAddrs)
+            oldStack = self.states.get(key)
+            isWidened = True
+        if oldStack is None:
+            if len(self.states) >= self.maxStateNum:
+                if not self.stateOverflow:
+                    self.log.warning("修复边时访问的状态数超出上限，部分缺失的边可能无法修复")
+                    self.stateOverflow = True
                 return
-            if jumpInfoDigit is not None:  # 是一个数字，检查是否跳到了没有入边的点
-                if jumpInfoDigit in self.todoNodes and jumpInfoDigit not in self.edges[curNode]:
-                    if len(self.edges[curNode]) == 1 and self.edges[curNode][0] == self.cfg.exitBlockId:  # 原来只是跳到Exit
-                        self.edges[curNode] = []
-                        self.inEdge[self.cfg.exitBlockId].remove(curNode)
-                    self.log.info("修复缺失的入边：{}->{}".format(curNode, jumpInfoDigit))
-                    self.edges[curNode].append(jumpInfoDigit)
-                    self.inEdge[jumpInfoDigit].append(curNode)
-
-        # 不顾原来的边关系，直接做dfs
-        if jumpInfoDigit is None:  # 从栈中无法找到地址
-            assert self.blocks[curNode].jumpType not in ["conditional", "unconditional"]
-            if self.blocks[curNode].jumpType == "fall":
-                self.__dfs(curNode + self.blocks[curNode].length, curExecutor)
+            self.states[key] = list(stack)
+            if not isWidened:
+                self.nodeStateNum[node] = self.nodeStateNum.get(node, 0) + 1
         else:
-            if self.blocks[curNode].jumpType == "conditional":  # fall 边
-                self.__dfs(jumpInfoDigit, curExecutor)
-                self.__dfs(curNode + self.blocks[curNode].length, curExecutor)
-            elif self.blocks[curNode].jumpType == "unconditional":
-                self.__dfs(jumpInfoDigit, curExecutor)
-            elif self.blocks[curNode].jumpType == "fall":
-                self.__dfs(curNode + self.blocks[curNode].length, curExecutor)
-            else:  # terminal only
-                assert 0  # 返回
-
-        self.visiting[curNode] = False
+            depth = min(len(oldStack), len(stack))
+            joinedStack = [a if a == b else None for a, b in zip(oldStack[len(oldStack) - depth:], stack[len(stack) - depth:])]
+            if joinedStack == oldStack:  # 没有变化，不需要再执行
+                return
+            self.states[key] = joinedStack
+        if key not in self.pending:
+            self.pending.add(key)
+            self.worklist.append(key)
 
+    def __addJumpEdge(self, curNode: int, target: int):
+        """
+        如果无条件跳转的目标是一个没有入边的节点，则添加这条跳转边
+        若原来只是跳到exit block，则删除这条边
+        :param curNode:跳转所在的基本块
+        :param target:跳转的目标
+        :return:None
+        """
+        if target not in self.todoNodes or target in self.edges[curNode]:
+            return
+        if len(self.edges[curNode]) == 1 and self.edges[curNode][0] == self.cfg.exitBlockId:  # 原来只是跳到Exit
+            self.edges[curNode] = []
+            self.inEdge[self.cfg.exitBlockId].remove(curNode)
+        self.log.info("修复缺失的入边：{}->{}".format(curNode, target))
+        self.edges[curNode].append(target)
+        self.inEdge[target].append(curNode)
+        self.repairedEdgeNum += 1
 
     # def __dfs(self, curNode: int, parentTagStack: SimplifiedExecutor):
     #     """
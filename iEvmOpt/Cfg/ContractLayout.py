@@ -0,0 +1,126 @@
+from AssertionOptimizer.TagStacks.SimplifiedExecutor import SimplifiedExecutor
+from Cfg.Cfg import Cfg
+from Utils.Opcodes import isKnownOpcode
+
+
+class ContractLayout:
+
+    def __init__(self, codeLength: int, constructorLength: int):
+        """ 合约字节码中各个段的位置，单位均为字节，位置均为在原字节码中的偏移量
+        原字节码的结构为： 构造函数函数体 | 构造函数数据段 | 运行时函数体 | 运行时数据段(含metadata)
+        运行时函数体的位置由构造函数中codecopy与return的参数确定，不需要在字符串中查找
+        :param codeLength:原字节码的长度
+        :param constructorLength:构造函数函数体的长度
+        """
+        self.codeLength = codeLength
+        self.constructorLength = constructorLength
+        self.runtimeBegin = None  # 运行时函数体的起始位置
+        self.runtimeSize = None  # 构造函数复制的运行时字节码长度，包括运行时数据段和metadata
+        self.runtimeLength = None  # 运行时函数体的长度
+        self.metadataBegin = None  # metadata的起始位置，不存在metadata时为None
+
+    def collectCopyInfos(self, cfg: Cfg):
+        """ 对构造函数中含有codecopy的基本块做局部执行，获取codecopy与return的参数
+        因为不知道栈中原有的内容，因此在执行之前，先往栈中压入128个None
+        :param cfg:构造函数的cfg
+        :return:[[codecopy的参数列表],[return的参数列表]]的列表，每个含有codecopy的基本块对应一项
+        """
+        evalInfos = []
+        executor = SimplifiedExecutor(cfg)
+        for offset, block in cfg.blocks.items():
+            if 0x39 not in block.bytecode:
+                continue
+            executor.clear()
+            executor.setExecutorState([None for i in range(128)])
+            executor.setBeginBlock(offset)
+            copyArgs, returnArgs = [], []
+            while not executor.allInstrsExecuted():
+                opcode = executor.getOpcode()
+                if not isKnownOpcode(opcode):
+                    break
+                match opcode:
+                    case 0x39:  # codecopy
+                        copyArgs.append([executor.getTagStackItem(i) for i in range(3)])
+                    case 0xf3:  # return
+                        returnArgs.append([executor.getTagStackItem(i) for i in range(2)])
+                executor.execNextOpCode()
+            evalInfos.append([copyArgs, returnArgs])
+        return evalInfos
+
+    def locateRuntime(self, code: bytes, evalInfos: list):
+        """ 根据构造函数中codecopy与return的参数，确定运行时字节码在原字节码中的位置
+        构造函数会将运行时字节码codecopy到内存中，再将同一段内存return，因此两者的目标地址和长度一致
+        :param code:原字节码
+        :param evalInfos:构造函数中含有codecopy的基本块的局部执行信息
+        :return:是否定位成功
+        """
+        candidates = []
+        for copyArgs, returnArgs in evalInfos:
+            for dest, offset, size in copyArgs:
+                if offset is None or size is None:
+                    continue
+                if offset < self.constructorLength or offset + size > self.codeLength:
+                    continue
+                if [dest, size] in returnArgs:
+                    self.setRuntime(code, offset, size)
+                    return True
+                candidates.append((size, offset))
+        if not candidates:
+            return False
+        size, offset = max(candidates)  # 找不到对应的return时，取被复制的最长的一段
+        self.setRuntime(code, offset, size)
+        return True
+
+    def setRuntime(self, code: bytes, runtimeBegin: int, runtimeSize: int):
+        """ 设置运行时字节码的位置，并确定其末尾的metadata的位置
+        metadata是cbor编码的map，其长度存储在最后两个字节中
+        :param code:原字节码
+        :param runtimeBegin:运行时字节码的起始位置
+        :param runtimeSize:运行时字节码的长度(含metadata)
+        """
+        self.runtimeBegin = runtimeBegin
+        self.runtimeSize = runtimeSize
+        self.metadataBegin = None
+        runtimeEnd = runtimeBegin + runtimeSize
+        if runtimeSize < 2:
+            return
+        metadataBegin = runtimeEnd - 2 - int.from_bytes(code[runtimeEnd - 2:runtimeEnd], "big")
+        if runtimeBegin <= metadataBegin < runtimeEnd - 2 and 0xa1 <= code[metadataBegin] <= 0xa5:
+            self.metadataBegin = metadataBegin
+
+    def setRuntimeLength(self, runtimeLength: int):
+        """ 设置运行时函数体的长度，函数体之后到原字节码末尾的内容均为运行时数据段
+        :param runtimeLength:运行时函数体的长度
+        """
+        self.runtimeLength = runtimeLength
+
+    def getRuntimeBodyLimit(self):
+        """ 获取运行时函数体可能的最大长度，即运行时字节码中metadata之前的部分
+        :return:相对于运行时字节码起始位置的长度
+        """
+        if self.metadataBegin is None:
+            return self.runtimeSize
+        return self.metadataBegin - self.runtimeBegin
+
+    def getConstructorRange(self):
+        return 0, self.constructorLength
+
+    def getConstructorDataRange(self):
+        return self.constructorLength, self.runtimeBegin
+
+    def getRuntimeRange(self):
+        return self.runtimeBegin, self.runtimeBegin + self.runtimeLength
+
+    def getRuntimeDataRange(self):
+        return self.runtimeBegin + self.runtimeLength, self.codeLength
+
+    def getMetadataBegin(self):
+        return self.metadataBegin
+
+    def slice(self, code: bytes, segRange: tuple):
+        """ 从原字节码中截取一个段，不复制字节码
+        :param code:原字节码
+        :param segRange:段的范围，格式为 (起始位置,结束位置)，单位为字节
+        :return:段的memoryview
+        """
+        return memoryview(code)[segRange[0]:segRange[1]]
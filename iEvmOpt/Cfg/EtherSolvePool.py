@@ -0,0 +1,358 @@
+import atexit
+import hashlib
+import os
+import platform
+import queue
+import secrets
+import shutil
+import signal
+import socket
+import socketserver
+import struct
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Utils.Logger import Logger
+
+workerReadyMagic = 0x45535752  # 常驻进程的就绪标记，与EtherSolveWorker.java中的READY_MAGIC一致
+daemonUnavailable = -2  # 守护进程无法启动常驻进程时的返回值
+daemonEnvName = "IEVMOPT_ETHERSOLVE_DAEMON"  # 守护进程的地址通过该环境变量传给各个优化进程
+intStruct = struct.Struct(">i")
+
+
+# 常驻进程和守护进程都使用长度前缀的二进制帧通信，所有整数均为大端序的int32
+# 请求为 参数个数n + n个参数，每个参数为 UTF-8字节数 + UTF-8字节；响应为一个整数
+def writeArgs(stream, args: list):
+    data = [intStruct.pack(len(args))]
+    for arg in args:
+        arg = arg.encode("utf-8")
+        data.append(intStruct.pack(len(arg)))
+        data.append(arg)
+    stream.write(b"".join(data))
+    stream.flush()
+
+
+def readExactly(stream, size: int):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("帧不完整")
+        data += chunk
+    return data
+
+
+def readInt(stream):
+    return intStruct.unpack(readExactly(stream, 4))[0]
+
+
+def writeInt(stream, value: int):
+    stream.write(intStruct.pack(value))
+    stream.flush()
+
+
+def readArgs(stream):
+    return [readExactly(stream, readInt(stream)).decode("utf-8") for i in range(readInt(stream))]
+
+
+def getWorkerCmd(cwd: str):
+    """ 获取启动常驻进程的命令。EtherSolveWorker.java按源文件的哈希编译到 ~/.cache/iEvmOpt/ethersolve 下，只编译一次，
+    之后所有进程都直接加载编译好的类；没有javac或者编译失败时，使用源文件启动器，每次启动都会重新编译
+    :param cwd:EtherSolve.jar和EtherSolveWorker.java所在的目录
+    :return:命令
+    """
+    srcCmd = ["java", "-cp", "EtherSolve.jar", "EtherSolveWorker.java"]
+    srcPath = os.path.join(cwd, "EtherSolveWorker.java")
+    try:
+        with open(srcPath, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        classRoot = os.path.join(os.path.expanduser("~"), ".cache", "iEvmOpt", "ethersolve")
+        classDir = os.path.join(classRoot, digest)
+        if not os.path.isfile(os.path.join(classDir, "EtherSolveWorker.class")):
+            if shutil.which("javac") is None:
+                return srcCmd
+            os.makedirs(classRoot, exist_ok=True)
+            tmpDir = tempfile.mkdtemp(dir=classRoot)  # 先编译到临时目录再改名，多个进程同时编译时不会读到不完整的类
+            p = subprocess.run(["javac", "-cp", "EtherSolve.jar", "-d", tmpDir, srcPath], cwd=cwd,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if p.returncode != 0:
+                shutil.rmtree(tmpDir, ignore_errors=True)
+                return srcCmd
+            try:
+                os.rename(tmpDir, classDir)
+            except OSError:  # 其他进程已经编译完成
+                shutil.rmtree(tmpDir, ignore_errors=True)
+    except OSError:
+        return srcCmd
+    return ["java", "-cp", os.pathsep.join(["EtherSolve.jar", classDir]), "EtherSolveWorker"]
+
+
+class EtherSolveWorker:
+
+    def __init__(self, workerCmd: list, cwd: str, timeOutLimit: int):
+        """ 一个常驻的EtherSolve进程，通过标准输入输出上的二进制帧与之通信，EtherSolve自身的输出直接写到标准错误
+        :param workerCmd:启动进程的命令
+        :param cwd:进程的工作目录
+        :param timeOutLimit:启动和每次执行的超时时间
+        """
+        self.plf = platform.system().lower()
+        self.timeOutLimit = timeOutLimit
+        self.replies = queue.Queue()  # 进程返回的整数
+        self.process = subprocess.Popen(workerCmd, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        start_new_session=self.plf != 'windows')
+        # 使用单独的线程读取输出，这样等待结果时才能设置超时
+        self.reader = threading.Thread(target=self.__readReplies, daemon=True)
+        self.reader.start()
+        if self.__waitReply() != workerReadyMagic:
+            self.kill()
+            raise RuntimeError("EtherSolve常驻进程启动失败")
+
+    def __readReplies(self):
+        try:
+            while True:
+                self.replies.put(readInt(self.process.stdout))
+        except (OSError, EOFError):
+            self.replies.put(None)  # 进程已经退出
+
+    def __waitReply(self):
+        try:
+            return self.replies.get(timeout=self.timeOutLimit)
+        except queue.Empty:
+            return "TIMEOUT"
+
+    def execute(self, args: list):
+        """ 在常驻进程中执行一次EtherSolve
+        :param args:EtherSolve的参数
+        :return:返回值，超时返回-1，进程意外退出返回1
+        """
+        try:
+            writeArgs(self.process.stdin, args)
+        except OSError:
+            return 1
+        res = self.__waitReply()
+        if res == "TIMEOUT":
+            self.kill()
+            return -1
+        if res is None:
+            return 1
+        return res
+
+    def isAlive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        if not self.isAlive():
+            return
+        if self.plf == 'windows':
+            os.system("taskkill /F /T /PID " + str(self.process.pid))
+        else:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        self.process.wait()
+
+    def close(self):
+        if not self.isAlive():
+            return
+        self.process.stdin.close()  # 输入结束后，常驻进程会自行退出
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+
+class EtherSolvePool:
+
+    def __init__(self, workerNum: int = 3, timeOutLimit: int = 300, useDaemon: bool = True):
+        """ EtherSolve常驻进程池，同一个进程内的多次调用（多个合约、json和html等多种输出）都复用已经启动的JVM
+        设置了守护进程的环境变量时，所有调用都交给守护进程执行，这样多个优化进程可以共用守护进程中的JVM
+        常驻进程按需启动，如果无法启动（例如只有jre），则标记为不可用，由调用者退回到每次启动一个JVM的方式
+        :param workerNum:常驻进程的最大数量
+        :param timeOutLimit:每次执行的超时时间
+        :param useDaemon:是否使用环境变量给出的守护进程
+        """
+        self.workerNum = workerNum
+        self.timeOutLimit = timeOutLimit
+        self.cwd = os.path.dirname(os.path.abspath(__file__))
+        self.workerCmd = None  # 第一次启动常驻进程时才确定，可能需要编译EtherSolveWorker.java
+        self.workerCmdLock = threading.Lock()
+        self.daemonAddr = os.environ.get(daemonEnvName) if useDaemon else None  # 格式为 host:port:token
+        self.log = Logger()
+
+        self.available = True  # 常驻进程是否可用
+        self.idleWorkers = queue.Queue()  # 空闲的常驻进程
+        self.workerCnt = 0  # 已经启动的常驻进程数量
+        self.lock = threading.Lock()
+        self.execCnt = 0  # 执行次数计数
+
+    def __getWorkerCmd(self):
+        with self.workerCmdLock:
+            if self.workerCmd is None:
+                self.workerCmd = getWorkerCmd(self.cwd)
+            return self.workerCmd
+
+    def __acquireWorker(self):
+        with self.lock:
+            if not self.available:
+                return None
+            startNew = self.idleWorkers.empty() and self.workerCnt < self.workerNum
+            if startNew:
+                self.workerCnt += 1
+        if not startNew:
+            worker = self.idleWorkers.get()  # None表示有一个常驻进程退出了，由当前调用者重新启动
+            if worker is not None:
+                return worker
+            if not self.available:
+                self.idleWorkers.put(None)  # 唤醒其他等待者
+                return None
+        try:
+            return EtherSolveWorker(self.__getWorkerCmd(), self.cwd, self.timeOutLimit)
+        except Exception:
+            with self.lock:
+                self.workerCnt -= 1
+                self.available = False
+            self.idleWorkers.put(None)
+            self.log.warning("无法启动EtherSolve常驻进程，将为每次调用单独启动EtherSolve")
+            return None
+
+    def __releaseWorker(self, worker: EtherSolveWorker):
+        # 超时被杀死或意外退出的进程不再复用，之后按需重新启动
+        self.idleWorkers.put(worker if worker.isAlive() else None)
+
+    def isAvailable(self):
+        return self.available
+
+    def execute(self, args: list):
+        """ 使用一个常驻进程执行EtherSolve
+        :param args:EtherSolve的参数，如 ["-c", "-j", "-o", "out.json", "in.bin"]
+        :return:返回值，超时返回-1；常驻进程不可用时返回None
+        """
+        if self.daemonAddr is not None:
+            returnCode = self.__executeByDaemon(args)
+            if returnCode != daemonUnavailable:
+                return returnCode
+            return None
+        worker = self.__acquireWorker()
+        if worker is None:
+            return None
+        try:
+            returnCode = worker.execute(args)
+        finally:
+            self.__releaseWorker(worker)
+        with self.lock:
+            self.execCnt += 1
+        return returnCode
+
+    def __executeByDaemon(self, args: list):
+        """ 交给守护进程执行，守护进程无法连接时，之后的调用都改为使用本进程的常驻进程
+        :param args:EtherSolve的参数
+        :return:返回值
+        """
+        try:
+            host, port, token = self.daemonAddr.rsplit(":", 2)
+            # 超时由守护进程处理，这里多等待一段时间
+            with socket.create_connection((host, int(port)), timeout=self.timeOutLimit + 30) as sock:
+                with sock.makefile("rwb") as stream:
+                    writeArgs(stream, [token] + args)
+                    returnCode = readInt(stream)
+        except (OSError, EOFError, ValueError):
+            self.log.warning("无法连接EtherSolve守护进程，改为使用本进程的常驻进程")
+            self.daemonAddr = None
+            return self.execute(args)
+        with self.lock:
+            self.execCnt += 1
+        return returnCode
+
+    def executeAll(self, argsList: list):
+        """ 并行地执行多个EtherSolve调用
+        :param argsList:每次调用的参数
+        :return:每次调用的返回值
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(len(argsList), self.workerNum))) as executor:
+            return list(executor.map(self.execute, argsList))
+
+    def close(self):
+        with self.lock:
+            self.available = False
+        while not self.idleWorkers.empty():
+            worker = self.idleWorkers.get()
+            if worker is not None:
+                worker.close()
+
+
+class EtherSolveDaemon:
+
+    def __init__(self, workerNum: int = 3, timeOutLimit: int = 300):
+        """ 跨进程共享的EtherSolve常驻进程池，监听本机的一个随机端口
+        批量优化合约的脚本为每个合约启动一个Main.py进程，脚本启动守护进程，并通过环境变量把地址传给每个Main.py进程，
+        这样所有合约的EtherSolve调用都复用守护进程中的JVM。请求的第一个参数为随机生成的令牌，令牌不一致的请求会被忽略
+        :param workerNum:常驻进程的最大数量
+        :param timeOutLimit:每次执行的超时时间
+        """
+        self.pool = EtherSolvePool(workerNum, timeOutLimit, useDaemon=False)
+        self.token = secrets.token_hex(16)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon.handle(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def handle(self, rfile, wfile):
+        try:
+            args = readArgs(rfile)
+        except (OSError, EOFError, UnicodeDecodeError):
+            return
+        if len(args) == 0 or args[0] != self.token:
+            return
+        returnCode = self.pool.execute(args[1:])
+        writeInt(wfile, daemonUnavailable if returnCode is None else returnCode)
+
+    def getAddress(self):
+        host, port = self.server.server_address
+        return "{}:{}:{}".format(host, port, self.token)
+
+    def getEnv(self):
+        """ 获取子进程使用的环境变量
+        :return:在当前环境变量中加入守护进程地址后的副本
+        """
+        env = dict(os.environ)
+        env[daemonEnvName] = self.getAddress()
+        return env
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread = None
+        self.server.server_close()
+        self.pool.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+etherSolvePool = None  # 进程内共享的常驻进程池
+etherSolvePoolLock = threading.Lock()
+
+
+def getEtherSolvePool():
+    """ 获取进程内共享的EtherSolve常驻进程池，第一次调用时创建，进程退出时关闭
+    :return:EtherSolvePool
+    """
+    global etherSolvePool
+    with etherSolvePoolLock:
+        if etherSolvePool is None:
+            etherSolvePool = EtherSolvePool()
+            atexit.register(etherSolvePool.close)
+    return etherSolvePool
@@ -0,0 +1,65 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+
+import cli.MainCLI;
+import picocli.CommandLine;
+
+/**
+ * 常驻的EtherSolve进程，由EtherSolvePool启动。EtherSolvePool先用javac将其编译到缓存目录，
+ * 之后通过 java -cp EtherSolve.jar:缓存目录 EtherSolveWorker 启动，没有javac时才使用源文件启动器
+ * 与EtherSolvePool之间使用长度前缀的二进制帧通信，所有整数均为大端序的int32：
+ * 启动完毕后输出就绪标记READY_MAGIC；
+ * 每个请求为 参数个数n + n个参数，每个参数为 UTF-8字节数 + UTF-8字节，n为0或者输入结束时退出；
+ * 每个响应为EtherSolve的返回值。
+ * EtherSolve自身的标准输出被重定向到标准错误，标准输出只用于传递响应
+ */
+public class EtherSolveWorker {
+    private static final int READY_MAGIC = 0x45535752;
+
+    public static void main(String[] args) throws Exception {
+        DataInputStream in = new DataInputStream(new BufferedInputStream(System.in));
+        DataOutputStream out = new DataOutputStream(new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+        System.setOut(System.err);
+        out.writeInt(READY_MAGIC);
+        out.flush();
+        while (true) {
+            String[] esArgs;
+            try {
+                esArgs = readArgs(in);
+            } catch (EOFException e) {
+                break;
+            }
+            if (esArgs.length == 0) {
+                break;
+            }
+            int exitCode;
+            try {
+                exitCode = new CommandLine(new MainCLI()).execute(esArgs);
+            } catch (Throwable t) {
+                t.printStackTrace();
+                exitCode = 1;
+            }
+            System.err.flush();
+            out.writeInt(exitCode);
+            out.flush();
+        }
+    }
+
+    private static String[] readArgs(DataInputStream in) throws IOException {
+        int argc = in.readInt();
+        String[] res = new String[argc];
+        for (int i = 0; i < argc; i++) {
+            byte[] buf = new byte[in.readInt()];
+            in.readFully(buf);
+            res[i] = new String(buf, StandardCharsets.UTF_8);
+        }
+        return res;
+    }
+}
@@ -1,51 +1,228 @@
 import os
 import shutil
 import signal
+import string
 import subprocess
+import tempfile
 import json
-from AssertionOptimizer.TagStacks.TagStack import TagStack
 from Cfg.BasicBlock import BasicBlock
 from Cfg.Cfg import Cfg
+from Cfg.CfgBuilder import CfgBuilder
+from Cfg.CfgCache import CfgCache
+from Cfg.CfgPreAnalyzer import CfgPreAnalyzer
+from Cfg.ContractLayout import ContractLayout
+from Cfg.EtherSolvePool import getEtherSolvePool
 from Cfg.CfgRepairKit import CfgRepairKit
 from Utils.Logger import Logger
 import platform
 
 class EtherSolver:
 
-    def __init__(self, srcPath: str, outputPath: str, outputHtml=False):
-        """ 使用EtherSolve工具分析字节码文件，得到对应的json、html文件并通过json文件构造cfg
-        :param srcPath:输入字节码路径
-        :param outputPath:输出路径
-        :param outputHtml:生成CFG的HTML文件
+    def __init__(self, srcPath: str, outputPath: str, outputHtml=False, useEtherSolve=False, useCache=True,
+                 bytecode=None):
+        """ 构建字节码文件的cfg，默认使用内置的CfgBuilder，也可以使用EtherSolve工具分析字节码文件，得到对应的json文件并通过json文件构造cfg
+        :param srcPath:输入字节码路径，直接给出字节码时为None
+        :param outputPath:输出路径，为None时不输出json和html文件
+        :param outputHtml:生成CFG的HTML文件，需要使用EtherSolve
+        :param useEtherSolve:使用EtherSolve构建cfg
+        :param useCache:使用cfg磁盘缓存，字节码相同时直接读取之前构建好的cfg
+        :param bytecode:内存中的字节码，可以是十六进制字符串，也可以是bytes（原始字节或十六进制文本），给出时不读取srcPath
         """
         self.srcPath = srcPath  # 输入bin文件的路径
         self.outputPath = outputPath  # 输出的目录名
         self.outputHtml = outputHtml
-        self.srcName = os.path.basename(srcPath).split(".")[0]  # 原bin文件的文件名
+        self.useEtherSolve = useEtherSolve
+        self.useCache = useCache
+        if srcPath is not None:
+            self.srcName = os.path.basename(srcPath).split(".")[0]  # 原bin文件的文件名
+        else:
+            self.srcName = "contract"
+        self.inputStr = None if bytecode is None else self.__toBytecodeStr(bytecode)  # 输入的字节码字符串
 
-        self.constructorCfg = Cfg()
+        self.constructorCfg = None  # 构造函数的cfg，第一次获取时才构建
+        self.constructorCfgInfo = None  # 构造函数的json信息，构建构造函数的cfg时使用
+        self.cfgBuilder = None  # 内置的CfgBuilder，构建构造函数的cfg时复用
         self.cfg = Cfg()
-        self.constructorDataSeg = None  # 构建函数体后的数据段
-        self.dataSeg = None  # 函数体后的数据段
+        self.constructorDataSeg = None  # 构建函数体后的数据段，为原字节码的切片
+        self.dataSeg = None  # 函数体后的数据段，为原字节码的切片
         self.log = Logger()
         self.timeOutLimit = 300  # 5min
 
+        # 本次运行独占的临时目录，EtherSolve的输出文件都先写到这里，再移动到输出目录，使多个优化进程可以同时运行
+        self.scratchDir = None
+
+        # 原字节码，以及各个段在其中的位置。使用EtherSolve时，各个段的位置根据构造函数cfg确定
+        self.originalCode = None
+        self.layout = None
+
         # 确定当前平台，以方便杀死子进程
         self.plf = platform.system().lower() # 'windows'/ 'linux'
 
+    def __toBytecodeStr(self, bytecode):
+        """ 将内存中的字节码统一转换为十六进制字符串
+        :param bytecode:十六进制字符串，或者bytes。bytes的内容是十六进制文本时按文本处理，否则视为原始字节
+        :return:十六进制字符串
+        """
+        if isinstance(bytecode, str):
+            return bytecode
+        bytecode = bytes(bytecode)
+        try:
+            text = bytecode.decode("ascii").strip()
+        except UnicodeDecodeError:
+            return bytecode.hex()
+        hexText = text[2:] if text.startswith("0x") else text
+        if len(hexText) % 2 == 0 and all(c in string.hexdigits for c in hexText):
+            return text
+        return bytecode.hex()
+
+    def __readInput(self):
+        """ 读取输入的字节码字符串，只读取一次
+        """
+        if self.inputStr is None:
+            with open(self.srcPath, "r") as f:
+                self.inputStr = f.read()
+        return self.inputStr
+
     def execSolver(self):
-        self.log.info("正在使用EtherSolve生成JSON文件")
+        # 首先查找cfg缓存
+        cache = None
+        cacheKey = None
+        if self.useCache:
+            cache = CfgCache()
+            cacheKey = cache.getKey(self.__readInput(), "ethersolve" if self.useEtherSolve else "native")
+            cachedInfo = cache.load(cacheKey)
+            if cachedInfo is not None:
+                self.constructorCfg, self.cfg, self.constructorDataSeg, self.dataSeg, self.layout = cachedInfo
+                if self.outputHtml:
+                    try:
+                        self.__execEtherSolve(self.__getHtmlArgsList())
+                        self.__moveOutputFiles(False)
+                    finally:
+                        self.__removeScratchDir()
+                self.log.info("CFG处理完毕")
+                return
+
+        # 使用EtherSolve时，所有的输出文件都暂时放在本次运行的临时目录当中，后面我们再将它们移动到输出目录里
+        # json与html的生成互不依赖，交给EtherSolve常驻进程池一起执行
+        esArgsList = []
+        if self.useEtherSolve:
+            self.log.info("正在使用EtherSolve生成JSON文件")
+            esArgsList.append(["-c", "-j", "-o", self.__getEsOutputPath("_cfg.json"), self.__getRelSrcPath()])
+        if self.outputHtml:  # 生成HTML用于观察测试
+            esArgsList += self.__getHtmlArgsList()
+        try:
+            if len(esArgsList) != 0:
+                self.__execEtherSolve(esArgsList)
+
+            if self.useEtherSolve:
+                jsonInfo = self.__readEtherSolveJson()
+            else:
+                jsonInfo = self.__execCfgBuilder()
+
+            # 使用json信息构建CFG
+            self.__buildCfg(jsonInfo)
+            if cache is not None:
+                cache.store(cacheKey, self.constructorCfg, self.cfg, self.constructorDataSeg, self.dataSeg, self.layout)
+
+            self.__moveOutputFiles(self.useEtherSolve)
+        finally:
+            self.__removeScratchDir()
+        self.log.info("CFG处理完毕")
+
+    def __createScratchDir(self):
+        """ 创建本次运行独占的临时目录
+        """
+        if self.scratchDir is None:
+            self.scratchDir = tempfile.mkdtemp(prefix="iEvmOpt_" + self.srcName + "_")
+
+    def __removeScratchDir(self):
+        if self.scratchDir is not None:
+            shutil.rmtree(self.scratchDir, ignore_errors=True)
+            self.scratchDir = None
+
+    def __getEsOutputPath(self, suffix: str):
+        """ 获取EtherSolve输出文件的路径，因为EtherSolve不接受绝对地址的输出目录，因此返回相对于EtherSolve工作目录的路径
+        :param suffix:输出文件名的后缀
+        """
+        self.__createScratchDir()
+        return os.path.relpath(os.path.join(self.scratchDir, self.srcName + suffix), os.path.dirname(__file__))
 
+    def __getHtmlArgsList(self):
+        self.log.info("正在使用EtherSolve生成运行时CFG和构造函数CFG的HTML报告")
+        return [["-c", "-H", "-o", self.__getEsOutputPath("_runtime_cfg.html"), self.__getRelSrcPath()],
+                ["-r", "-H", "-o", self.__getEsOutputPath("_constructor_cfg.html"), self.__getRelSrcPath()]]
+
+    def __moveOutputFiles(self, moveJson: bool):
+        # 为了不占用iEvmOpt的大小，将所有的输出文件都移动到输出目录当中
+        # 如果原目录下已经存在同名的文件，则直接删除
+        # 没有输出目录时（直接给出字节码并返回结果），输出文件随临时目录一起删除
+        if self.outputPath is None:
+            return
+        if moveJson:
+            if os.path.exists(self.outputPath + "/" + self.srcName + "_cfg.json"):
+                os.remove(self.outputPath + "/" + self.srcName + "_cfg.json")
+            shutil.move(self.scratchDir + "/" + self.srcName + "_cfg.json", self.outputPath)
+        if self.outputHtml:
+            if os.path.exists(self.outputPath + "/" + self.srcName + "_runtime_cfg.html"):
+                os.remove(self.outputPath + "/" + self.srcName + "_runtime_cfg.html")
+            shutil.move(self.scratchDir + "/" + self.srcName + "_runtime_cfg.html", self.outputPath)
+            if os.path.exists(self.outputPath + "/" + self.srcName + "_constructor_cfg.html"):
+                os.remove(self.outputPath + "/" + self.srcName + "_constructor_cfg.html")
+            shutil.move(self.scratchDir + "/" + self.srcName + "_constructor_cfg.html", self.outputPath)
+
+    def __execCfgBuilder(self):
+        """ 使用内置的CfgBuilder在进程内构建cfg，不需要启动java子进程，也不需要读写中间文件
+        :return:cfg的json信息
+        """
+        self.cfgBuilder = CfgBuilder(self.__readInput())
+        jsonInfo = {"runtimeCfg": self.cfgBuilder.buildRuntime()}  # 构造函数的cfg在需要时才构建
+        self.originalCode = self.cfgBuilder.bytecode
+        self.layout = self.cfgBuilder.getLayout()
+        return jsonInfo
+
+    def __readEtherSolveJson(self):
+        """ 读入EtherSolve生成的json文件
+        :return:cfg的json信息
+        """
+        with open(self.scratchDir + "/" + self.srcName + "_cfg.json", 'r', encoding='UTF-8') as f:
+            jsonInfo = json.load(f)
+        f.close()
+        return jsonInfo
+
+    def __getRelSrcPath(self):
         # 对文件的路径进行处理
         #  坑：EtherSolve不接受绝对地址的输出目录，因此将输入目录和输出目录改为相对目录
         # 相对与当前文件的相对地址，然后在使用子进程进行处理时，指定工作目录为当前文件所在目录
-        # 即，对于EtherSolve的一切输出，将暂时输出到CfgOutput当中，后面我们再将它们移动到输出目录里
-        relSrcPathForEs = os.path.relpath(self.srcPath, os.path.dirname(__file__))  # 为EtherSolve确定的相对路径
-
-        # 生成JSON文件
+        # 即，对于EtherSolve的一切输出，将暂时输出到本次运行的临时目录当中，后面我们再将它们移动到输出目录里
+        # 直接给出字节码时，EtherSolve只能读取文件，因此先将字节码写到临时目录中
+        if self.srcPath is None:
+            self.__createScratchDir()
+            self.srcPath = os.path.join(self.scratchDir, self.srcName + ".bin")
+            with open(self.srcPath, "w") as f:
+                f.write(self.__readInput())
+        return os.path.relpath(self.srcPath, os.path.dirname(__file__))  # 为EtherSolve确定的相对路径
+
+    def __execEtherSolve(self, esArgsList: list):
+        """ 执行EtherSolve，优先使用常驻进程池，常驻进程不可用时，每次调用单独启动一个EtherSolve子进程。超时或出错时放弃优化
+        :param esArgsList:每次调用EtherSolve的参数
+        """
+        returnCodes = getEtherSolvePool().executeAll(esArgsList)
+        for i in range(len(esArgsList)):
+            if returnCodes[i] is None:  # 常驻进程不可用
+                returnCodes[i] = self.__execEtherSolveProcess(esArgsList[i])
+            if returnCodes[i] == -1:
+                self.log.fail("EtherSolve处理超时", -1)
+            if returnCodes[i] != 0:
+                self.log.fail("EtherSolve处理出错", -1)
+
+    def __execEtherSolveProcess(self, esArgs: list):
+        """ 启动一个EtherSolve子进程
+        :param esArgs:EtherSolve的参数
+        :return:返回值，超时返回-1
+        """
         returnCode = 0
-        cmd = "java -jar EtherSolve.jar -c -j -o CfgOutput/" + self.srcName + "_cfg.json " + relSrcPathForEs
-        p = subprocess.Popen(cmd, cwd=os.path.dirname(__file__),shell=True)
+        cmd = "java -jar EtherSolve.jar " + " ".join(esArgs)
+        p = subprocess.Popen(cmd, cwd=os.path.dirname(__file__),shell=True, start_new_session=self.plf == 'linux')
         try:
             p.wait(timeout=self.timeOutLimit)
             returnCode = p.returncode
@@ -56,85 +233,15 @@ class EtherSolver:
             elif self.plf == 'linux':
                 os.killpg(p.pid, signal.SIGKILL)
             returnCode = -1
-            self.log.fail("EtherSolve处理超时")
-            exit(-1)
-        if returnCode != 0:
-            self.log.fail("EtherSolve处理出错")
-            exit(-1)
-
-        # 生成HTML用于观察测试
-        if self.outputHtml:
-            self.log.info("正在使用EtherSolve生成运行时CFG的HTML报告")
-
-            cmd = "java -jar EtherSolve.jar -c -H -o CfgOutput/" + self.srcName + "_runtime_cfg.html " + relSrcPathForEs
-            p = subprocess.Popen(cmd, cwd=os.path.dirname(__file__),shell=True)
-            try:
-                p.wait(timeout=self.timeOutLimit)
-                returnCode = p.returncode
-            except:
-                if self.plf == 'windows':
-                    cmd = "taskkill /F /PID " + str(p.pid)
-                    os.system(cmd)
-                elif self.plf == 'linux':
-                    os.killpg(p.pid, signal.SIGKILL)
-                returnCode = -1
-                self.log.fail("EtherSolve处理超时")
-                exit(-1)
-            if returnCode != 0:
-                self.log.fail("EtherSolve处理出错")
-                exit(-1)
-
-            self.log.info("正在使用EtherSolve生成构造函数CFG的HTML报告")
-            cmd = "java -jar EtherSolve.jar -r -H -o CfgOutput/" + self.srcName + "_constructor_cfg.html " + relSrcPathForEs
-            p = subprocess.Popen(cmd, cwd=os.path.dirname(__file__),shell=True)
-            try:
-                p.wait(timeout=self.timeOutLimit)
-                returnCode = p.returncode
-            except:
-                if self.plf == 'windows':
-                    cmd = "taskkill /F /PID " + str(p.pid)
-                    os.system(cmd)
-                elif self.plf == 'linux':
-                    os.killpg(p.pid, signal.SIGKILL)
-                returnCode = -1
-                self.log.fail("EtherSolve处理超时")
-                exit(-1)
-            if returnCode != 0:
-                self.log.fail("EtherSolve处理出错")
-                exit(-1)
-
-        # 使用输出文件构建CFG
-        self.__buildCfg()
+        return returnCode
 
-        # 为了不占用iEvmOpt的大小，将所有的输出文件都移动到输出目录当中
-        # 如果原目录下已经存在同名的文件，则直接删除
-        if os.path.exists(self.outputPath + "/" + self.srcName + "_cfg.json"):
-            os.remove(self.outputPath + "/" + self.srcName + "_cfg.json")
-        shutil.move(os.path.dirname(__file__) + "/CfgOutput/" + self.srcName + "_cfg.json", self.outputPath)
-        if self.outputHtml:
-            if os.path.exists(self.outputPath + "/" + self.srcName + "_runtime_cfg.html"):
-                os.remove(self.outputPath + "/" + self.srcName + "_runtime_cfg.html")
-            shutil.move(os.path.dirname(__file__) + "/CfgOutput/" + self.srcName + "_runtime_cfg.html", self.outputPath)
-            if os.path.exists(self.outputPath + "/" + self.srcName + "_constructor_cfg.html"):
-                os.remove(self.outputPath + "/" + self.srcName + "_constructor_cfg.html")
-            shutil.move(os.path.dirname(__file__) + "/CfgOutput/" + self.srcName + "_constructor_cfg.html",
-                        self.outputPath)
-
-        self.log.info("EtherSolve处理完毕")
-
-    def __buildCfg(self):
+    def __buildCfg(self, jsonInfo: dict):
+        """ 使用json信息构建cfg
+        :param jsonInfo:EtherSolve格式的cfg信息
+        """
         self.log.info("正在构建CFG")
-        # 读入json文件
-        with open(os.path.dirname(__file__) + "/CfgOutput/" + self.srcName + "_cfg.json", 'r', encoding='UTF-8') as f:
-            jsonInfo = json.load(f)
-        f.close()
-        # 读取构建信息
-        for b in jsonInfo["constructorCfg"]["nodes"]:  # 读取基本块
-            block = BasicBlock(b)
-            self.constructorCfg.addBasicBlock(block)
-        for e in jsonInfo["constructorCfg"]["successors"]:  # 读取边
-            self.constructorCfg.addEdge(e)
-        self.constructorCfg.genBytecodeStr()
+        # 构造函数的cfg只在需要修改构造函数时才会用到，这里只记录其json信息
+        self.constructorCfgInfo = jsonInfo.get("constructorCfg")
 
         # 读取运行时信息
         for b in jsonInfo["runtimeCfg"]["nodes"]:  # 读取基本块
@@ -142,12 +249,13 @@ class EtherSolver:
             self.cfg.addBasicBlock(block)
         for e in jsonInfo["runtimeCfg"]["successors"]:  # 读取边
             self.cfg.addEdge(e)
-        self.cfg.genBytecodeStr()
+        self.cfg.genBytecode()
+
+        # 确定各个段的位置，并划分数据段
+        self.__genLayout()
 
         # 避个坑，这里检查一下是否存在invalid，如果都不存在invalid，则在这里就可以返回了，在Assertion里面检测到没有invalid,程序会结束
         if not self.cfg.invalidExist:
-            self.constructorDataSeg = ""  # 设置一下，不然会报错
-            self.dataSeg = ""
             return
 
         # 获取起始基本块和终止基本块
@@ -156,131 +264,115 @@ class EtherSolver:
         self.cfg.exitBlockId = max(self.cfg.blocks.keys())
         assert len(self.cfg.edges[self.cfg.exitBlockId]) == 0
 
-        self.constructorCfg.initBlockId = min(self.constructorCfg.blocks.keys())
-        assert self.constructorCfg.initBlockId == 0
-        self.constructorCfg.exitBlockId = max(self.constructorCfg.blocks.keys())
-        assert len(self.constructorCfg.edges[self.constructorCfg.exitBlockId]) == 0
-
         #############               使用CfgRepairKit进行检测和修复              #############
         # 修复不一定是成功的，毕竟只是做简单的dfs
         # 只是输出Warning，后续还要对没有入边的节点做判断，看看是否属于是selfdestruct引起的，如果是，则尝试再次进行修复
 
-        runtimeKit = CfgRepairKit(self.cfg)
+        # 预分析只依赖指令，在修复之前进行，修复时复用其中每个基本块内push的数据
+        analyzer = CfgPreAnalyzer(self.cfg)
+        analyzer.analyze()
+        runtimeKit = CfgRepairKit(self.cfg, analyzer=analyzer)
         runtimeKit.fix()
         if not runtimeKit.isFixed():  # 修复失败
             self.log.warning("运行时函数边修复失败")
         else:
             self.log.info("运行时函数边修复成功")
         self.cfg.edges, self.cfg.inEdges = runtimeKit.getRepairedEdges()
+        self.cfg.resetCsrGraph()
 
         # ##############              修复结束                   ################
 
-        # 添加unconditional、conditional跳转目标块的信息
-        for offset, b in self.cfg.blocks.items():
-            if b.jumpType == "unconditional":
-                b.jumpDest = list(self.cfg.edges[offset])
-            elif b.jumpType == "conditional":
-                fallBlockOffset = b.offset + b.length
-                dests = list(self.cfg.edges[offset])
-                jumpiTrueOffset = dests[0] if dests[0] != fallBlockOffset else dests[1]
-                b.jumpiDest[True] = jumpiTrueOffset
-                b.jumpiDest[False] = fallBlockOffset
-
-        for offset, b in self.constructorCfg.blocks.items():
-            if b.jumpType == "unconditional":
-                b.jumpDest = list(self.constructorCfg.edges[offset])
-                # b.printBlockInfo()
-            elif b.jumpType == "conditional":
-                fallBlockOffset = b.offset + b.length
-                dests = list(self.constructorCfg.edges[offset])
-                jumpiTrueOffset = dests[0] if dests[0] != fallBlockOffset else dests[1]
-                b.jumpiDest[True] = jumpiTrueOffset
-                b.jumpiDest[False] = fallBlockOffset
-                # b.printBlockInfo()
-
-        # 对每一个unconditional jump的block，进行tagStack执行，看是否有可能出现：
-        #   jump的地址是在block内部计算得到的
-        # 这种情况下，这个block也有可能是调用节点
-        # 因为不知道栈中原有的内容，因此在做执行之前，先往栈中压入128个None
-        # 为了获取cfg中Push过的所有数据，在这里记录一下
-        pushedData = set()
-        preInfo = [[None, None, None, None, False] for i in range(128)]
-        pushInfo = None
-        tagStack = TagStack(self.cfg)
-        for offset, b in self.cfg.blocks.items():
-            if b.jumpType != "unconditional":
-                continue
-            tagStack.clear()
-            tagStack.setTagStack(preInfo)
-            tagStack.setBeginBlock(offset)
-            while not tagStack.allInstrsExecuted():
-                opcode = tagStack.getOpcode()
-                if tagStack.isLastInstr():
-                    pushInfo = tagStack.getTagStackTop()
-                tagStack.execNextOpCode()
-                if 0x60 <= opcode <= 0x7f:  # 是一个push指令，获取push的数据
-                    tmp = tagStack.getTagStackTop()
-                    pushedData.add(tmp[0])
-            if pushInfo[0] is None:  # 置为了untag
-                continue
-            # 检查pushinfo是否与可能的跳转边一致
-            # 如果一致，则这个跳转边可能是调用边
-            # 如果一致，则这个跳转边一定不是返回边
-            if pushInfo[0] in self.cfg.jumpDests:  # and self.cfg.inEdges[pushInfo[0]].__len__() > 1错误的
-                b.couldBeCaller = True
-        self.cfg.pushedData = pushedData
-
-        pushedData = set()
-        tagStack = TagStack(self.constructorCfg)
-        for offset, b in self.constructorCfg.blocks.items():
-            if b.jumpType != "unconditional":
-                continue
-            tagStack.clear()
-            tagStack.setTagStack(preInfo)
-            tagStack.setBeginBlock(offset)
-            while not tagStack.allInstrsExecuted():
-                opcode = tagStack.getOpcode()
-                if tagStack.isLastInstr():
-                    pushInfo = tagStack.getTagStackTop()
-                tagStack.execNextOpCode()
-                if 0x60 <= opcode <= 0x7f:  # 是一个push指令，获取push的数据
-                    tmp = tagStack.getTagStackTop()
-                    pushedData.add(tmp[0])
-            if pushInfo[0] is None:  # 置为了untag
-                continue
-            # 检查pushinfo是否与可能的跳转边一致
-            # 如果一致，则这个跳转边可能是调用边
-            # 如果一致，则这个跳转边一定不是返回边
-            if pushInfo[0] in self.constructorCfg.jumpDests:  # and self.cfg.inEdges[pushInfo[0]].__len__() > 1错误的
-                b.couldBeCaller = True
-        self.constructorCfg.pushedData = pushedData
-
-        # 设置起始偏移量
-        with open(self.srcPath, "r") as f:
-            originalStr = f.read()  # 将原字符串读入
-        funcBodyBeginIndex = originalStr.find(self.cfg.bytecodeStr)
-        assert funcBodyBeginIndex != -1
-        assert originalStr.count(self.cfg.bytecodeStr) == 1
-        self.cfg.setBeginIndex(funcBodyBeginIndex // 2)  # 因为是字符串的偏移量，因此要除以2
-        self.constructorCfg.setBeginIndex(0)  # 构造函数的起始偏移量是0
-
-        # 注意，这里的构造函数数据段是指，构造函数函数字节码之后，运行时函数字节码之前的字符串
-        self.constructorDataSeg = originalStr[self.constructorCfg.getBytecodeLen() * 2:funcBodyBeginIndex]
-        # 这里的运行时数据段，不仅仅指运行时函数后面的data，还包括metadata
-        self.dataSeg = originalStr[funcBodyBeginIndex + self.cfg.bytecodeLength * 2:]
+        # 将修复之前的预分析结果写回cfg：
+        #   添加unconditional、conditional跳转目标块的信息
+        #   对每一个unconditional jump的block，检查jump的地址是否在block内部计算得到，这种情况下，这个block也有可能是调用节点
+        #   获取cfg中Push过的所有数据
+        analyzer.apply()
+        analyzer.setJumpDests()
 
         self.log.info("CFG构建完毕")
         # self.cfg.output()
-        # self.constructorCfg.output()
+
+    def __preAnalyze(self, cfg: Cfg):
+        analyzer = CfgPreAnalyzer(cfg)
+        analyzer.analyze()
+        analyzer.apply()
+        analyzer.setJumpDests()
+
+    def __buildConstructorCfg(self):
+        """ 构建构造函数的cfg
+        构造函数只在对运行时字节码做了修改、需要处理构造函数中的codecopy时才会用到，因此推迟到第一次获取时才构建，
+        这样对于没有可优化的Assertion的合约，不需要为构造函数付出任何代价
+        """
+        self.log.info("正在构建构造函数CFG")
+        if self.constructorCfgInfo is None:  # 使用内置的CfgBuilder，或者运行时cfg是从缓存中读取的
+            if self.cfgBuilder is None:
+                self.cfgBuilder = CfgBuilder(self.__readInput())
+            self.constructorCfgInfo = self.cfgBuilder.buildConstructor()
+        cfg = Cfg()
+        for b in self.constructorCfgInfo["nodes"]:  # 读取基本块
+            cfg.addBasicBlock(BasicBlock(b))
+        for e in self.constructorCfgInfo["successors"]:  # 读取边
+            cfg.addEdge(e)
+        cfg.genBytecode()
+        self.constructorCfgInfo = None
+
+        cfg.initBlockId = min(cfg.blocks.keys())
+        assert cfg.initBlockId == 0
+        cfg.exitBlockId = max(cfg.blocks.keys())
+        assert len(cfg.edges[cfg.exitBlockId]) == 0
+        cfg.setBeginIndex(0)  # 构造函数的起始偏移量是0
+        self.__preAnalyze(cfg)
+        self.constructorCfg = cfg
+
+    def __genLayout(self):
+        """ 确定原字节码中各个段的位置，并设置cfg的起始偏移量和数据段
+        使用CfgBuilder时，各个段的位置已经在构建cfg时确定。使用EtherSolve时，由构造函数的函数体长度，
+        以及构造函数中codecopy与return的参数确定运行时函数体的位置，无法确定时才在原字节码中查找一次
+        """
+        if self.layout is None:
+            originalStr = self.__readInput().strip()
+            if originalStr.startswith("0x"):
+                originalStr = originalStr[2:]
+            self.originalCode = code = bytes.fromhex(originalStr)
+            runtimeCode = self.cfg.bytecode
+            # 需要构造函数中codecopy与return的参数，因此使用EtherSolve时，构造函数的cfg总是会被构建
+            constructorCfg = self.getConstructorCfg()
+            layout = ContractLayout(len(code), constructorCfg.getBytecodeLen())
+            located = layout.locateRuntime(code, layout.collectCopyInfos(constructorCfg))
+            if not located or code[layout.runtimeBegin:layout.runtimeBegin + len(runtimeCode)] != runtimeCode:
+                runtimeBegin = code.find(runtimeCode, layout.constructorLength)
+                if runtimeBegin == -1:
+                    self.log.fail("未能在原字节码中定位运行时函数体")
+                layout.setRuntime(code, runtimeBegin, len(code) - runtimeBegin)
+            layout.setRuntimeLength(self.cfg.bytecodeLength)
+            self.layout = layout
+        assert self.layout.slice(self.originalCode, self.layout.getRuntimeRange()) == self.cfg.bytecode
+
+        self.cfg.setBeginIndex(self.layout.runtimeBegin)
+        # 注意，这里的构造函数数据段是指，构造函数函数字节码之后，运行时函数字节码之前的字节码
+        self.constructorDataSeg = self.layout.slice(self.originalCode, self.layout.getConstructorDataRange())
+        # 这里的运行时数据段，不仅仅指运行时函数后面的data，还包括metadata
+        self.dataSeg = self.layout.slice(self.originalCode, self.layout.getRuntimeDataRange())
 
     def getConstructorCfg(self):
+        if self.constructorCfg is None:
+            self.__buildConstructorCfg()
         return self.constructorCfg
 
     def getCfg(self):
         return self.cfg
 
-    def getConstructorDataSegStr(self):
+    def getConstructorDataSeg(self):
         return self.constructorDataSeg
 
+    def getConstructorDataSegStr(self):
+        return self.constructorDataSeg.hex()
+
     def getDataSeg(self):
         return self.dataSeg
+
+    def getDataSegStr(self):
+        return self.dataSeg.hex()
+
+    def getLayout(self):
+        return self.layout
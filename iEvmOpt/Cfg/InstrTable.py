@@ -0,0 +1,61 @@
+from array import array
+
+from Utils.Opcodes import stackPops, stackPushes
+
+
+class InstrTable:
+
+    def __init__(self, blocks: dict):
+        """ 整个函数体的指令表，将所有基本块的字节码一次性解码为按列存储的数组，供各个执行器共享
+        下标为指令在表中的序号，指令按地址从小到大排列，每个基本块单独解码，指令不会跨越基本块
+        基本块的字节码被修改之后，需要重新生成指令表，见Cfg.resetInstrTable
+        :param blocks:cfg中的基本块，格式为 起始offset:BasicBlock
+        """
+        self.addrs = array("I")  # 指令的地址，末尾额外存放一个哨兵，为最后一个基本块的结束地址
+        self.opcodes = bytearray()  # 操作码
+        self.pushValues = []  # push的数据，非push指令为None
+        self.pops = bytearray()  # 出栈元素数量
+        self.pushes = bytearray()  # 入栈元素数量
+        self.blockIds = array("I")  # 指令所在基本块的offset
+        self.blockRange = {}  # 基本块的指令在表中的下标范围，格式为 offset:(begin,end)
+        self.indexOfAddr = []  # 地址到指令下标的映射，不是指令开头的地址为-1
+
+        self.__decode(blocks)
+        self.opcodes = bytes(self.opcodes)
+        self.pops = bytes(self.pops)
+        self.pushes = bytes(self.pushes)
+
+    def __decode(self, blocks: dict):
+        addrs, opcodes, pushValues, blockIds = self.addrs, self.opcodes, self.pushValues, self.blockIds
+        endAddr = 0
+        for offset in sorted(blocks.keys()):
+            block = blocks[offset]
+            code = block.bytecode
+            begin = len(addrs)
+            pc = 0
+            while pc < block.length:
+                opcode = code[pc]
+                addrs.append(offset + pc)
+                opcodes.append(opcode)
+                blockIds.append(offset)
+                if 0x60 <= opcode <= 0x7f:  # push
+                    pushValues.append(int.from_bytes(code[pc + 1:pc + opcode - 0x5e], "big"))
+                    pc += opcode - 0x5e
+                else:
+                    pushValues.append(None)
+                    pc += 1
+            self.blockRange[offset] = (begin, len(addrs))
+            endAddr = max(endAddr, offset + block.length)
+        addrs.append(endAddr)  # 哨兵，执行完最后一条指令之后的PC
+
+        self.pops = bytearray(stackPops[op] for op in opcodes)
+        self.pushes = bytearray(stackPushes[op] for op in opcodes)
+        self.indexOfAddr = [-1] * (endAddr + 1)
+        for i in range(len(addrs)):
+            self.indexOfAddr[addrs[i]] = i
+
+    def getBlockRange(self, offset: int):
+        return self.blockRange[offset]
+
+    def getInstrNum(self):
+        return len(self.opcodes)
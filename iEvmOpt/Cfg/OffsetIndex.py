@@ -0,0 +1,59 @@
+from array import array
+from bisect import bisect_left, insort
+
+
+class OffsetIndex:
+    '''
+    基本块与函数的地址区间索引，区间按起始地址排序，使用二分查找回答与地址位置相关的查询
+    基本块之间互不重叠，因此按起始地址排序后，结束地址也是有序的。长度为0的基本块(如exit block)不包含任何地址，不放入区间中
+    '''
+
+    def __init__(self, blocks: dict):
+        """
+        :param blocks:cfg中的基本块，格式为 起始offset:BasicBlock
+        """
+        self.nodes = array("i", sorted(blocks.keys()))  # 所有基本块的起始地址，包括长度为0的基本块
+        self.blockBegins = array("i")  # 非空基本块的起始地址
+        self.blockEnds = array("i")  # 非空基本块的结束地址(不包含)
+        for offset in self.nodes:
+            length = blocks[offset].length
+            if length != 0:
+                self.blockBegins.append(offset)
+                self.blockEnds.append(offset + length)
+        self.funcRanges = []  # 函数的地址区间，格式为 [(起始地址,结束地址(不包含),函数id)]，按起始地址排序
+
+    def addFunction(self, funcId: int, begin: int, end: int):
+        """ 添加一个函数的地址区间，函数之间互不重叠
+        :param funcId:函数id
+        :param begin:函数第一个基本块的起始地址
+        :param end:函数最后一个基本块的结束地址(不包含)
+        """
+        insort(self.funcRanges, (begin, end, funcId))
+
+    def blockEndingAt(self, addr: int):
+        """ 获取在某个地址结束的基本块，即下一个基本块从该地址开始
+        :param addr:结束地址(不包含)
+        :return:基本块的起始地址，没有则返回None
+        """
+        i = bisect_left(self.blockEnds, addr)
+        if i < len(self.blockEnds) and self.blockEnds[i] == addr:
+            return self.blockBegins[i]
+        return None
+
+    def blocksInRange(self, lo: int, hi: int):
+        """ 获取起始地址位于[lo,hi)之间的所有基本块
+        :param lo:区间的起始地址
+        :param hi:区间的结束地址(不包含)
+        :return:基本块起始地址的列表，从小到大排列
+        """
+        return self.nodes[bisect_left(self.nodes, lo):bisect_left(self.nodes, hi)].tolist()
+
+    def nextFunctionBegin(self, addr: int):
+        """ 获取起始地址不小于某个地址的第一个函数
+        :param addr:地址
+        :return:函数的起始地址，没有则返回None
+        """
+        i = bisect_left(self.funcRanges, (addr,))
+        if i < len(self.funcRanges):
+            return self.funcRanges[i][0]
+        return None
@@ -0,0 +1,79 @@
+from array import array
+
+
+class CsrGraph:
+    '''
+    以压缩稀疏行(CSR)格式存储的有向图，节点按offset从小到大编号为0~N-1
+    节点i的后继为 succ[succStart[i]:succStart[i + 1]]，前驱为 pred[predStart[i]:predStart[i + 1]]，存储的都是节点的编号
+    '''
+
+    def __init__(self, nodes: list, edges: dict):
+        """ 根据出边表生成图，入边由出边反向得到，因此两者总是一致的
+        :param nodes:节点的offset列表
+        :param edges:出边表，格式为 from:[to1,to2...]，同一个节点的出边保持原来的顺序
+        """
+        self.nodeOffsets = array("i", sorted(nodes))  # 编号到offset的映射
+        self.indexOf = {offset: i for i, offset in enumerate(self.nodeOffsets)}  # offset到编号的映射
+        self.succStart = array("i")
+        self.succ = array("i")
+        self.predStart = array("i")
+        self.pred = array("i")
+        self.__build(edges)
+
+    def __build(self, edges: dict):
+        indexOf = self.indexOf
+        nodeNum = len(self.nodeOffsets)
+        succStart, succ = self.succStart, self.succ
+        inDegree = [0] * nodeNum
+        for offset in self.nodeOffsets:
+            succStart.append(len(succ))
+            for _to in edges.get(offset, ()):
+                index = indexOf[_to]
+                succ.append(index)
+                inDegree[index] += 1
+        succStart.append(len(succ))
+
+        # 按入度计算每个节点的前驱区间，再按编号顺序填入前驱
+        predStart = self.predStart
+        total = 0
+        for i in range(nodeNum):
+            predStart.append(total)
+            total += inDegree[i]
+        predStart.append(total)
+        self.pred = array("i", bytes(4 * total))
+        pred = self.pred
+        fill = list(predStart[:nodeNum])
+        for i in range(nodeNum):
+            for j in range(succStart[i], succStart[i + 1]):
+                _to = succ[j]
+                pred[fill[_to]] = i
+                fill[_to] += 1
+
+    def getNodeNum(self):
+        return len(self.nodeOffsets)
+
+    def getIndex(self, offset: int):
+        return self.indexOf[offset]
+
+    def getOffset(self, index: int):
+        return self.nodeOffsets[index]
+
+    def hasNode(self, offset: int):
+        return offset in self.indexOf
+
+    def getSuccIndexes(self, index: int):
+        return self.succ[self.succStart[index]:self.succStart[index + 1]]
+
+    def getPredIndexes(self, index: int):
+        return self.pred[self.predStart[index]:self.predStart[index + 1]]
+
+    def hasEdge(self, _from: int, _to: int):
+        """ 判断两个节点之间是否有边
+        :param _from:起始节点的offset
+        :param _to:终止节点的offset
+        """
+        index = self.indexOf.get(_to)
+        if index is None:
+            return False
+        i = self.indexOf[_from]
+        return index in self.succ[self.succStart[i]:self.succStart[i + 1]]
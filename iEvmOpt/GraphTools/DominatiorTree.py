@@ -1,130 +1,208 @@
 # 代码思路来源：https://www.luogu.com.cn/problem/solution/P5180
+# Cooper-Harvey-Kennedy算法来源：A Simple, Fast Dominance Algorithm
 # 输入与输出：使用Init方法输入，然后使用getIdom获取直接支配节点的映射关系
+from array import array
 
-class side:
-    def __init__(self):
-        self.y = 0
-        self.next = 0
+from GraphTools.CsrGraph import CsrGraph
 
 
 class DominatorTreeBuilder:
     """用于生成支配树，需要注意的是，在该类当中，图的点是用从1开始的连续数字来表示，返回值也是
+    图的边直接从CSR图中读取，标号为k的点对应CSR图中编号为k-1的节点
+    计算时使用以CSR图的节点编号为下标的平坦int列表(下标访问比array更快)，不使用递归
     """
 
-    def __init__(self):
+    def __init__(self, algorithm: str = "lengauerTarjan"):
+        """
+        :param algorithm:使用的算法，"lengauerTarjan"为Lengauer-Tarjan算法，"cooperHarveyKennedy"为基于逆后序迭代的Cooper-Harvey-Kennedy算法
+        """
+        assert algorithm in ["lengauerTarjan", "cooperHarveyKennedy"]
+        self.algorithm = algorithm
         self.n = 0
-        self.m = 0
-        self.cs = 0
-        self.co = 0
-
-        self.e = []
-        self.lin = []
-        self.dfn = []
-        self.ord = []
-        self.fa = []
-        self.idom = []
-        self.sdom = []
-        self.uni = []
-        self.mn = []
-        self.ans = []
-
-    def __ins(self, _id: int, x: int, y: int):
-        self.cs += 1
-        self.e[self.cs].y = y
-        self.e[self.cs].next = self.lin[_id][x]
-        self.lin[_id][x] = self.cs
+        self.graph = None
+        self.idom = []  # 下标为CSR图的节点编号，值为直接支配节点的编号，起始节点以及不可达的节点为-1
 
     def initGraph(self, nodeNum: int, edges: list):
         """用于初始化构造支配树所需要的信息
         :param nodeNum:图的节点数量，因为只记录了数量，因此图的节点是用 1~nodeNum之间的数字来标识
         :param edges: 图的边，格式为[[n1,n2],[n3,n4]......]
         """
-        self.n = nodeNum
-        self.m = len(edges)
-
-        self.e = [side() for _ in range(2 * self.m + self.n + 9)]
-        for _ in range(3):
-            self.lin.append([0 for _ in range(self.n + 9)])
-        self.dfn = [0 for _ in range(self.n + 9)]
-        self.ord = [0 for _ in range(self.n + 9)]
-        self.fa = [0 for _ in range(self.n + 9)]
-        self.idom = [0 for _ in range(self.n + 9)]
-        self.sdom = [0 for _ in range(self.n + 9)]
-        self.uni = [0 for _ in range(self.n + 9)]
-        self.mn = [0 for _ in range(self.n + 9)]
-        self.ans = [0 for _ in range(self.n + 9)]
-
-        for i in range(0, self.m):
-            x, y = edges[i][0], edges[i][1]
-            self.__ins(0, x, y)
-            self.__ins(1, y, x)
-
-    def __tarjan(self, k: int):
-        self.co += 1
-        self.dfn[k] = self.co
-        self.ord[self.co] = k
-        i = self.lin[0][k]
-        while i != 0:
-            if self.dfn[self.e[i].y] == 0:
-                self.fa[self.e[i].y] = k
-                self.__tarjan(self.e[i].y)
-            i = self.e[i].next
-
-    def __queryNni(self, k: int):
-        if k == self.uni[k]:
-            return k
-        res = self.__queryNni(self.uni[k])
-        if self.dfn[self.sdom[self.mn[self.uni[k]]]] < self.dfn[self.sdom[self.mn[k]]]:
-            self.mn[k] = self.mn[self.uni[k]]
-        self.uni[k] = res
-        return res
+        edgeDict = {}
+        for x, y in edges:
+            edgeDict.setdefault(x, []).append(y)
+        self.initGraphFromCsr(CsrGraph(list(range(1, nodeNum + 1)), edgeDict))
+
+    def initGraphFromCsr(self, graph: CsrGraph):
+        """使用CSR图初始化构造支配树所需要的信息
+        从起始节点不可达的节点不会被访问，它们的边也会被忽略，因此不需要事先从图中移除
+        :param graph:CSR图，图的节点数量为graph.getNodeNum()
+        """
+        self.graph = graph
+        self.n = graph.getNodeNum()
 
     def buildTreeFrom(self, beginNode: int):
-        """ 返回值为支配树的直接支配节点关系，格式为 {n:n的直接支配节点}
+        """ 生成支配树，结果使用getIdom获取
         :param beginNode:图的起始节点
         """
-        self.__tarjan(beginNode)
-        for i in range(1, self.n + 1):
-            self.sdom[i] = i
-            self.uni[i] = i
-            self.mn[i] = i
-
-        for i in range(self.co, 1, -1):
-            t = self.ord[i]
-
-            j = self.lin[1][t]
-            while j != 0:
-                y = self.e[j].y
-                if self.dfn[y] == 0:
-                    continue
-                self.__queryNni(y)
-                if self.dfn[self.sdom[self.mn[y]]] < self.dfn[self.sdom[t]]:
-                    self.sdom[t] = self.sdom[self.mn[y]]
-                j = self.e[j].next
-
-            self.uni[t] = self.fa[t]
-            self.__ins(2, self.sdom[t], t)
-
-            t = self.fa[t]
-            j = self.lin[2][t]
-            while j != 0:
-                y = self.e[j].y
-                self.__queryNni(y)
-                self.idom[y] = t if t == self.sdom[self.mn[y]] else self.mn[y]
-                j = self.e[j].next
+        graph = self.graph
+        self.__build(beginNode - 1, graph.succStart, graph.succ, graph.predStart, graph.pred)
 
-            self.lin[2][t] = 0
-
-        for i in range(2, self.co + 1):
-            t = self.ord[i]
-            if self.idom[t] != self.sdom[t]:
-                self.idom[t] = self.idom[self.idom[t]]
+    def buildPostTreeFrom(self, endNode: int):
+        """ 生成后支配树，即在反向图上从终止节点开始生成支配树，结果同样使用getIdom获取，值为直接后支配节点
+        无法到达终止节点的节点(如死循环中的节点)没有后支配节点
+        :param endNode:图的终止节点
+        """
+        graph = self.graph
+        self.__build(endNode - 1, graph.predStart, graph.pred, graph.succStart, graph.succ)
+
+    def __build(self, root: int, succStart: array, succ: array, predStart: array, pred: array):
+        match self.algorithm:
+            case "lengauerTarjan":
+                self.idom = self.__lengauerTarjan(root, succStart, succ, predStart, pred)
+            case "cooperHarveyKennedy":
+                self.idom = self.__cooperHarveyKennedy(root, succStart, succ, predStart, pred)
+
+    def __preorder(self, root: int, succStart: array, succ: array):
+        """ 非递归的dfs，访问顺序与递归时一致
+        :return:(先序序列, 每个节点的dfs序(从1开始，0为不可达), 每个节点在dfs树上的父节点)
+        """
+        n = self.n
+        dfn = [0] * n
+        fa = [-1] * n
+        order = [root]
+        dfn[root] = 1
+        callNodes, callEdges = [root], [succStart[root]]
+        while callNodes:
+            k = callNodes[-1]
+            j, end = callEdges[-1], succStart[k + 1]
+            while j < end:
+                y = succ[j]
+                j += 1
+                if dfn[y] == 0:
+                    callEdges[-1] = j
+                    fa[y] = k
+                    order.append(y)
+                    dfn[y] = len(order)
+                    callNodes.append(y)
+                    callEdges.append(succStart[y])
+                    break
+            else:
+                callNodes.pop()
+                callEdges.pop()
+        return order, dfn, fa
+
+    def __lengauerTarjan(self, root: int, succStart: array, succ: array, predStart: array, pred: array):
+        """ Lengauer-Tarjan算法，带路径压缩的并查集，O(ElogV)
+        sdom、uni、mn存储的都是节点编号，比较半支配点时比较它们的dfs序
+        """
+        n = self.n
+        order, dfn, fa = self.__preorder(root, succStart, succ)
+        sdom = list(range(n))
+        uni = list(range(n))  # 并查集中的父节点
+        mn = list(range(n))  # 并查集路径上半支配点dfs序最小的节点
+        idom = [-1] * n
+        bucket = [[] for _ in range(n)]  # 半支配点为下标的节点
+
+        def queryNni(k: int):
+            # 找到k所在集合的根，同时对路径进行压缩，压缩的顺序与递归时一致：先处理离根近的节点
+            path = []
+            while uni[k] != k:
+                path.append(k)
+                k = uni[k]
+            for x in reversed(path):
+                u = uni[x]
+                if dfn[sdom[mn[u]]] < dfn[sdom[mn[x]]]:
+                    mn[x] = mn[u]
+                uni[x] = k
+
+        for i in range(len(order) - 1, 0, -1):
+            t = order[i]
+            for j in range(predStart[t], predStart[t + 1]):
+                y = pred[j]
+                if dfn[y] == 0:  # 不可达的前驱
+                    continue
+                queryNni(y)
+                if dfn[sdom[mn[y]]] < dfn[sdom[t]]:
+                    sdom[t] = sdom[mn[y]]
+
+            uni[t] = fa[t]
+            bucket[sdom[t]].append(t)
+
+            t = fa[t]
+            for y in bucket[t]:
+                queryNni(y)
+                idom[y] = t if t == sdom[mn[y]] else mn[y]
+            bucket[t] = []
+
+        for i in range(1, len(order)):
+            t = order[i]
+            if idom[t] != sdom[t]:
+                idom[t] = idom[idom[t]]
+        return idom
+
+    def __cooperHarveyKennedy(self, root: int, succStart: array, succ: array, predStart: array, pred: array):
+        """ Cooper-Harvey-Kennedy算法，按逆后序反复求前驱在支配树上的公共祖先，直到不再变化
+        """
+        n = self.n
+        # 非递归的dfs求后序
+        postNum = [-1] * n  # 后序编号，-1为不可达
+        postOrder = []
+        visited = bytearray(n)
+        visited[root] = 1
+        callNodes, callEdges = [root], [succStart[root]]
+        while callNodes:
+            k = callNodes[-1]
+            j, end = callEdges[-1], succStart[k + 1]
+            while j < end:
+                y = succ[j]
+                j += 1
+                if not visited[y]:
+                    visited[y] = 1
+                    callEdges[-1] = j
+                    callNodes.append(y)
+                    callEdges.append(succStart[y])
+                    break
+            else:
+                callNodes.pop()
+                callEdges.pop()
+                postNum[k] = len(postOrder)
+                postOrder.append(k)
+
+        idom = [-1] * n
+        idom[root] = root
+        reversePostOrder = postOrder[-2::-1]  # 不包含起始节点
+        changed = True
+        while changed:
+            changed = False
+            for b in reversePostOrder:
+                newIdom = -1
+                for j in range(predStart[b], predStart[b + 1]):
+                    p = pred[j]
+                    if idom[p] == -1:  # 还没有处理过，或者不可达
+                        continue
+                    if newIdom == -1:
+                        newIdom = p
+                        continue
+                    # 求两个节点在支配树上的公共祖先
+                    x, y = p, newIdom
+                    while x != y:
+                        while postNum[x] < postNum[y]:
+                            x = idom[x]
+                        while postNum[y] < postNum[x]:
+                            y = idom[y]
+                    newIdom = x
+                if idom[b] != newIdom:
+                    idom[b] = newIdom
+                    changed = True
+        idom[root] = -1
+        return idom
 
     def getIdom(self):
-        """ 返回值为支配树的直接支配节点关系，格式为{n:n的直接支配节点}
+        """ 返回值为支配树的直接支配节点关系，格式为{n:n的直接支配节点}，起始节点以及不可达的节点为0
         """
-        return {i:self.idom[i] for i in range(1, self.n + 1)}
+        idom = self.idom
+        return {i + 1: idom[i] + 1 for i in range(self.n)}
 
     def outputIdom(self):
-        for i in range(1, self.n + 1):
-            print("node:{},idom:{}".format(i,self.idom[i]))
+        for i, d in self.getIdom().items():
+            print("node:{},idom:{}".format(i, d))
@@ -1,49 +1,34 @@
+from GraphTools.CsrGraph import CsrGraph
+
+
 class GraphMapper:
     '''
     将原图中以偏移量为节点标号的图映射到以1~N为标号的图
+    新标号直接取CSR图中的节点编号加一，不再复制一份边表
     '''
 
-    def __init__(self, nodes: list, edges: dict):
-        self.offsetGraphNodes = list(nodes)
-        self.offsetGraphEdges = dict(edges)
-
-        self.offsetToNewMapper = {}  # 旧节点到新节点的映射
-        self.newToOffsetMapper = {}  # 新节点到旧节点的映射
-        self.newGraphNodes = []
-        self.newGraphEdges = {}
-        self.__buildMap()
-
-    def __buildMap(self):
-        # 构建映射
-        self.newGraphNodes = [i for i in range(1, self.offsetGraphNodes.__len__() + 1)]
-        for i in range(self.offsetGraphNodes.__len__()):
-            offsetNode = self.offsetGraphNodes[i]
-            newNode = self.newGraphNodes[i]
-            self.offsetToNewMapper[offsetNode] = newNode
-            self.newToOffsetMapper[newNode] = offsetNode
-        for _from in self.offsetGraphEdges.keys():
-            _newFrom = self.offsetToNewMapper[_from]
-            self.newGraphEdges[_newFrom] = []
-            for _to in self.offsetGraphEdges[_from]:
-                _newTo = self.offsetToNewMapper[_to]
-                self.newGraphEdges[_newFrom].append(_newTo)
+    def __init__(self, graph: CsrGraph):
+        self.graph = graph
 
     def newToOffset(self, newNode: int):
-        return self.newToOffsetMapper[newNode]
+        return self.graph.nodeOffsets[newNode - 1]
 
     def offsetToNew(self, offsetNode: int):
-        return self.offsetToNewMapper[offsetNode]
+        return self.graph.indexOf[offsetNode] + 1
 
     def getNewNodes(self):
-        return self.newGraphNodes
+        return range(1, self.graph.getNodeNum() + 1)
 
     def getNewEdges(self):
-        return self.newGraphEdges
+        # 映射后的出边表，只在输出时使用
+        graph = self.graph
+        return {i + 1: [j + 1 for j in graph.getSuccIndexes(i)] for i in range(graph.getNodeNum())}
 
     def output(self):
-        print(self.newGraphNodes)
-        print("offset to new:{}".format(self.offsetToNewMapper))
-        print("new to offset:{}".format(self.newToOffsetMapper))
-        for _from in self.newGraphEdges.keys():
-            for _to in self.newGraphEdges[_from]:
+        print(list(self.getNewNodes()))
+        print("offset to new:{}".format({offset: i + 1 for offset, i in self.graph.indexOf.items()}))
+        print("new to offset:{}".format({i + 1: offset for offset, i in self.graph.indexOf.items()}))
+        newGraphEdges = self.getNewEdges()
+        for _from in newGraphEdges.keys():
+            for _to in newGraphEdges[_from]:
                 print("{}->{}".format(_from, _to))
@@ -1,42 +1,49 @@
+from GraphTools.CsrGraph import CsrGraph
+from GraphTools.TarjanAlgorithm import TarjanAlgorithm
+
+
 class SccCompressor:
+    '''
+    将图中的每个强连通分量收缩为一个点，得到缩点之后的DAG
+    强连通分量由非递归的tarjan求出，缩点图直接由每个点所在的强连通分量编号生成，整体复杂度为O(V+E)
+    缩点图的点为强连通分量的编号，编号从大到小即为缩点图的一个拓扑序
+    '''
+
     def __init__(self):
-        self.nodes = []  # 存储所有点，格式为 [n1,n2,n3...]
-        self.scc = []  # 存储scc中的点
-        self.edges = {}  # 存储出边表，格式为 from:[to1,to2...]
-        self.inEdges = {}  # 存储入边表，格式为 to:[from1,from2...]
-        self.sccId: int = -1  # scc的标号
-
-    def setInfo(self, nodes: list, scc: list, edges: dict, inEdges: dict, sccId: int):  # 注意，这里的nodes是不包含压缩后的新点的
-        self.nodes = list(nodes)  # 存储所有点，格式为 [n1,n2,n3...]
-        self.scc = list(scc)  # 存储scc中的点
-        self.edges = dict(edges)  # 存储出边表，格式为 from:[to1,to2...]
-        self.inEdges = dict(inEdges)  # 存储入边表，格式为 to:[from1,from2...]
-        self.sccId = int(sccId)  # scc的标号
+        self.nodes = []  # 存储缩点图的点，即强连通分量的编号，格式为 [s1,s2,s3...]
+        self.edges = {}  # 存储缩点图的出边表(去重)，格式为 from:[to1,to2...]
+        self.inEdges = {}  # 存储缩点图的入边表(去重)，格式为 to:[from1,from2...]
+        self.sccList = []  # 每个强连通分量包含的原图的点，下标为强连通分量的编号
+        self.graph = None  # 原图的CSR图
+        self.tarjan = None
+
+    def setInfo(self, nodes: list, edges: dict):
+        """
+        :param nodes:原图的点，格式为 [n1,n2,n3...]
+        :param edges:原图的出边表，格式为 from:[to1,to2...]
+        """
+        self.graph = CsrGraph(nodes, edges)
 
     def compress(self):
-        if len(self.scc) > 1:
-            # 将其收缩为一个点，ID为sccCnt+1
-            self.nodes.append(self.sccId)
-            self.edges[self.sccId] = []
-            self.inEdges[self.sccId] = []
-            for i in self.scc:
-                # 让i的所有入边(起始点不在强连通分量内的)指向收缩的点
-                for inNode in self.inEdges[i]:
-                    if inNode not in self.scc:
-                        self.edges[inNode] = [self.sccId if node == i else node for node in
-                                              self.edges[inNode]]  # 将其替换为新的点
-                        self.inEdges[self.sccId].append(inNode)
-                # 添加收缩点的出边：从i指向的，不是当前scc内的点
-                for outNode in self.edges[i]:
-                    if outNode not in self.scc:
-                        self.edges[self.sccId].append(outNode)
-                        self.inEdges[outNode] = [self.sccId if node == i else node for node in
-                                                 self.inEdges[outNode]]  # 将其替换为新的点
-            # scc中的点全部被处理，现在直接从图结构中去除该连同分量相关的点、边
-            for i in self.scc:
-                self.nodes.remove(i)
-                self.edges.pop(i)
-                self.inEdges.pop(i)
+        graph = self.graph
+        nodeOffsets = graph.nodeOffsets
+        self.tarjan = TarjanAlgorithm(graph, nodeOffsets)
+        for offset in nodeOffsets:  # 从编号最小的点开始，依次从没有访问过的点开始做tarjan
+            if not self.tarjan.isVisited(offset):
+                self.tarjan.tarjan(offset)
+        self.sccList = self.tarjan.getSccList()
+        dag = self.tarjan.getCondensation()
+        self.nodes = list(range(dag.getNodeNum()))
+        self.edges = {sccId: list(dag.getSuccIndexes(sccId)) for sccId in self.nodes}
+        self.inEdges = {sccId: list(dag.getPredIndexes(sccId)) for sccId in self.nodes}
+
+    def getSccId(self, node: int):
+        """ 获取原图的点所在的强连通分量编号，即该点在缩点图中对应的点
+        """
+        return self.tarjan.getSccId(node)
+
+    def getSccList(self):
+        return self.sccList
 
     def getNodes(self):
         return self.nodes
@@ -1,39 +1,151 @@
-from collections import deque as stack
+from array import array
+
+from GraphTools.CsrGraph import CsrGraph
 
 
 # 代码思路来自https://zhuanlan.zhihu.com/p/348703439
 
 class TarjanAlgorithm:
-    def __init__(self, _nodes: list, _edges: dict):
-        self.nodes = _nodes  # 节点列表
-        self.edges = _edges  # 存储出边表，格式为 id:[n1,n2...]
+    def __init__(self, graph: CsrGraph, _nodes: list):
+        """ 在CSR图的一个子图上求强连通分量，子图由给定的节点以及它们之间的边组成，不需要另外生成子图的边表
+        使用显式的栈代替递归，不受python递归深度的限制；dfsN、low、是否在栈中都是以节点编号为下标的数组，每条边只处理一次
+        数组只在创建时按整个图的大小分配一次，对同一个图的多个子图求强连通分量时，使用reset复用同一个实例
+        :param graph:整个cfg的CSR图
+        :param _nodes:子图的节点offset列表
+        """
+        self.graph = graph
+        nodeNum = graph.getNodeNum()
+        self.inSubGraph = bytearray(nodeNum)  # 下标为节点编号，非0表示节点在子图中
+        self.dfsN = array("i", [-1]) * nodeNum  # 下标为节点编号，-1表示还没有访问过
+        self.low = array("i", [0]) * nodeNum
+        self.onStack = bytearray(nodeNum)  # 下标为节点编号，非0表示节点在栈中
+        self.sccIds = array("i", [-1]) * nodeNum  # 下标为节点编号，值为节点所在强连通分量在sccList中的下标，-1表示没有访问过
+        self.nodes = []  # 节点列表
+        self.timeStamp = 0
+        self.s = []
+        self.sccList = []
+        self.reset(_nodes)
+
+    def reset(self, _nodes: list):
+        """ 换成同一个图上的另一个子图，只清理上一个子图中的节点，耗时与两个子图的大小成正比
+        上一次的tarjan都已经执行完毕，栈为空，访问过的节点都在sccList中
+        :param _nodes:子图的节点offset列表
+        """
+        indexOf = self.graph.indexOf
+        for offset in self.nodes:
+            self.inSubGraph[indexOf[offset]] = 0
+        for scc in self.sccList:
+            for offset in scc:
+                i = indexOf[offset]
+                self.dfsN[i] = -1
+                self.sccIds[i] = -1
+        assert len(self.s) == 0
+        self.nodes = _nodes
+        for offset in _nodes:
+            self.inSubGraph[indexOf[offset]] = 1
         self.timeStamp = 0
-        self.dfsN = {}
-        self.low = {}
-        self.visited = dict(zip(self.edges.keys(), [False for i in self.edges.keys()]))
-        self.s = stack()
         self.sccList = []
 
     def tarjan(self, n):
-        self.dfsN[n] = self.low[n] = self.timeStamp
-        self.visited[n] = True
+        """ 从一个节点开始做tarjan
+        :param n:起始节点的offset
+        """
+        self.__tarjan(self.graph.indexOf[n])
+
+    def __tarjan(self, root):
+        graph = self.graph
+        succStart, succ, nodeOffsets = graph.succStart, graph.succ, graph.nodeOffsets
+        inSubGraph, dfsN, low, onStack, s = self.inSubGraph, self.dfsN, self.low, self.onStack, self.s
+
+        # 调用栈，分别记录节点以及下一条要处理的出边
+        callNodes = [root]
+        callEdges = [succStart[root]]
+        dfsN[root] = low[root] = self.timeStamp
         self.timeStamp += 1
-        self.s.append(n)
-        for to in self.edges[n]:
-            if not self.visited[to]:
-                self.tarjan(to)
-                self.low[n] = min(self.low[n], self.low[to])
-            elif to in self.s:
-                self.low[n] = min(self.low[n], self.dfsN[to])
-
-        scc = []
-        if self.dfsN[n] == self.low[n]:
-            while True:
-                e = self.s.pop()
-                scc.append(e)
-                if n == e:
+        s.append(root)
+        onStack[root] = 1
+        while callNodes:
+            n = callNodes[-1]
+            j, end = callEdges[-1], succStart[n + 1]
+            descended = False
+            while j < end:
+                to = succ[j]
+                j += 1
+                if not inSubGraph[to]:  # 不是子图内部的边
+                    continue
+                if dfsN[to] == -1:  # 没有访问过，相当于递归访问to
+                    callEdges[-1] = j
+                    callNodes.append(to)
+                    callEdges.append(succStart[to])
+                    dfsN[to] = low[to] = self.timeStamp
+                    self.timeStamp += 1
+                    s.append(to)
+                    onStack[to] = 1
+                    descended = True
                     break
-            self.sccList.append(scc)
+                elif onStack[to]:
+                    if dfsN[to] < low[n]:
+                        low[n] = dfsN[to]
+            if descended:
+                continue
+
+            # n的所有出边都处理完了，相当于从递归中返回
+            callNodes.pop()
+            callEdges.pop()
+            if dfsN[n] == low[n]:
+                sccId = len(self.sccList)
+                scc = []
+                while True:
+                    e = s.pop()
+                    onStack[e] = 0
+                    self.sccIds[e] = sccId
+                    scc.append(nodeOffsets[e])
+                    if n == e:
+                        break
+                self.sccList.append(scc)
+            if callNodes:
+                parent = callNodes[-1]
+                if low[n] < low[parent]:
+                    low[parent] = low[n]
+
+    def isVisited(self, n):
+        return self.dfsN[self.graph.indexOf[n]] != -1
 
     def getSccList(self):
         return self.sccList
+
+    def getSccId(self, n):
+        """ 获取节点所在的强连通分量
+        :param n:节点的offset
+        :return:强连通分量在sccList中的下标，没有访问过的节点为-1
+        """
+        return self.sccIds[self.graph.indexOf[n]]
+
+    def getSccIds(self):
+        """ 获取所有节点所在的强连通分量
+        :return:以CSR图的节点编号为下标的数组，值为强连通分量在sccList中的下标，没有访问过的节点为-1
+        """
+        return self.sccIds
+
+    def getCondensation(self):
+        """ 生成缩点之后的图，图的节点为强连通分量在sccList中的下标，边为子图中连接两个不同强连通分量的边(去重)
+        强连通分量总是在它能到达的所有强连通分量之后生成，因此缩点图是一个DAG，下标从大到小即为它的一个拓扑序
+        只包含已经访问过的节点
+        :return:CsrGraph
+        """
+        graph = self.graph
+        succStart, succ, sccIds, inSubGraph = graph.succStart, graph.succ, self.sccIds, self.inSubGraph
+        edges = {}
+        for sccId, scc in enumerate(self.sccList):
+            dests = []
+            destSet = set()
+            for offset in scc:
+                i = graph.indexOf[offset]
+                for j in range(succStart[i], succStart[i + 1]):
+                    dest = sccIds[succ[j]]
+                    if not inSubGraph[succ[j]] or dest == -1 or dest == sccId or dest in destSet:
+                        continue
+                    dests.append(dest)
+                    destSet.add(dest)
+            edges[sccId] = dests
+        return CsrGraph(list(range(len(self.sccList))), edges)
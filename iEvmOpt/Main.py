@@ -1,16 +1,18 @@
 import os
+import re
 import sys
 
 from Cfg import *
 from AssertionOptimizer.AssertionOptimizer import AssertionOptimizer
 from Utils.Helper import Helper
+from Utils.Logger import OptimizeFailure, enableConsoleLog
 
 if __name__ == '__main__':
     """
     argv参数：
-    argv[1]: 输入字节码文件
-    argv[2]: 输出目录
-    argv[3]: 输出文件名
+    argv[1]: 输入字节码文件，或者字节码字符串，为"-"时从标准输入读取字节码
+    argv[2]: 输出目录，为"-"时不写入文件，将优化后的字节码输出到标准输出
+    argv[3]: 输出文件名，输出到标准输出时不使用
     """
 
     h = Helper()
@@ -26,26 +28,64 @@ if __name__ == '__main__':
         print("请输入完整的参数")
         exit(-1)
 
-    if len(sys.argv) > 6:
+    if len(sys.argv) > 8:
         print("参数过多")
         exit(-1)
 
     # 对可选参数进行检查
     printProcessInfo = False
     generateHtml = False
+    useEtherSolve = False
+    useCache = True
     for i in range(4,len(sys.argv)):
         arg = sys.argv[i]
         if arg in ['-pd','--process-detail'] :
             printProcessInfo = True
         elif arg in ['-H','--html']:
             generateHtml = True
+        elif arg in ['-es', '--ethersolve']:
+            useEtherSolve = True
+        elif arg in ['-nc', '--no-cache']:
+            useCache = False
         else:
             print("错误的参数:{}".format(arg))
             exit(-1)
 
-    ao = AssertionOptimizer(inputFile=sys.argv[1],
-                            outputPath=sys.argv[2],
+    # 输入可以是文件、字节码字符串或者标准输入
+    inputFile = sys.argv[1]
+    bytecode = None
+    if inputFile == '-':
+        inputFile = None
+        bytecode = sys.stdin.read()
+    elif not os.path.isfile(inputFile) and re.fullmatch(r"(0x)?([0-9a-fA-F]{2})+", inputFile.strip()):
+        inputFile = None
+        bytecode = sys.argv[1]
+
+    # 输出到标准输出时，将所有的日志（包括子进程的输出）重定向到标准错误，标准输出只保留优化后的字节码
+    outputPath = sys.argv[2]
+    resStream = None
+    if outputPath == '-':
+        outputPath = None
+        sys.stdout.flush()
+        resStream = os.fdopen(os.dup(1), "w")
+        os.dup2(2, 1)
+    enableConsoleLog()
+
+    ao = AssertionOptimizer(inputFile=inputFile,
+                            outputPath=outputPath,
                             outputName=sys.argv[3],
                             outputProcessInfo=printProcessInfo,
-                            outputHtml=generateHtml)
-    ao.optimize()
+                            outputHtml=generateHtml,
+                            useEtherSolve=useEtherSolve,
+                            useCache=useCache,
+                            bytecode=bytecode)
+    try:
+        res = ao.optimize()
+    except OptimizeFailure as e:  # 无法优化，日志中已经给出了原因
+        if resStream is not None:
+            resStream.close()
+        exit(e.exitCode)
+    if resStream is not None:
+        if res is not None:  # 没有进行优化时不输出
+            resStream.write(res + "\n")
+        resStream.close()
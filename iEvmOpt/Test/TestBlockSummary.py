@@ -0,0 +1,119 @@
+import glob
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AssertionOptimizer.AssertionOptimizer import AssertionOptimizer
+from AssertionOptimizer.TagStacks.SimplifiedExecutor import SimplifiedExecutor
+from AssertionOptimizer.TagStacks.TagStack import TagStack
+from Cfg.Cfg import Cfg
+
+
+def genEntryStack(cfg: Cfg, rand: random.Random, depth: int):
+    """ 生成随机的入口栈，栈中混合了跳转地址、普通数值以及未知值
+    :return:(tagstack的入口栈，简化版符号执行器的入口栈)
+    """
+    jumpDests = sorted(cfg.jumpDests)
+    tagItems, values = [], []
+    for i in range(depth):
+        kind = rand.randrange(3)
+        if kind == 0 and jumpDests:
+            value = rand.choice(jumpDests)
+            tagItems.append([value, 2, i, 0, True])
+        elif kind == 1:
+            value = rand.randrange(1, 256)
+            tagItems.append([value, 1, i, 0, value in cfg.jumpDests])
+        else:
+            value = None
+            tagItems.append([None, None, i, 0, False])
+        values.append(value)
+    return tagItems, values
+
+
+def execByInstr(cfg: Cfg, node: int, tagStack: TagStack, executor: SimplifiedExecutor):
+    """ 逐条执行基本块，直到执行完或者遇到INVALID
+    :return:(codecopy时栈中第2、3个元素，跳转之前两个栈的栈顶)
+    """
+    tagStack.setBeginBlock(node)
+    executor.setBeginBlock(node)
+    codecopyItems, jumpTops = [], None
+    while not executor.allInstrsExecuted():
+        opcode = executor.getOpcode()
+        if opcode == 0xfe:
+            break
+        if opcode == 0x39:
+            codecopyItems.append(tagStack.getTagStackItem(1) + tagStack.getTagStackItem(2))
+        if executor.isLastInstr() and opcode in (0x56, 0x57):
+            jumpTops = (tagStack.getTagStackTop(), executor.getTagStackTop())
+        executor.execNextOpCode()
+        tagStack.execNextOpCode()
+    return codecopyItems, jumpTops
+
+
+def checkBlocks(srcFile: str, rand: random.Random):
+    """ 对字节码的每一个基本块，分别逐条执行和套用转移摘要，比较执行之后的两个栈以及codecopy、跳转地址信息
+    :return:结果不一致的基本块
+    """
+    optimizer = AssertionOptimizer(srcFile, useCache=False)
+    optimizer._AssertionOptimizer__etherSolve()
+    cfg = optimizer.cfg
+    failNodes = []
+    tagStack, executor = TagStack(cfg), SimplifiedExecutor(cfg, isPersistent=True)
+    refTagStack, refExecutor = TagStack(cfg), SimplifiedExecutor(cfg)
+    for node in cfg.blocks.keys():
+        if cfg.blocks[node].length == 0:
+            continue
+        tagItems, values = genEntryStack(cfg, rand, 40)
+        try:
+            refTagStack.setTagStack(tagItems)
+            refExecutor.setExecutorState(values)
+            expected = execByInstr(cfg, node, refTagStack, refExecutor)
+        except AssertionError:  # 随机的入口栈中出现了不合法的地址运算
+            continue
+        tagStack.setTagStack(tagItems)
+        executor.setExecutorState(values)
+        tagValues, executorValues = tagStack.execBlockSummary(node), executor.execBlockSummary(node)
+        summary = cfg.getBlockSummary(node)
+        codecopyItems = [list(tagValues[a][:4]) + list(tagValues[b][:4]) for a, b in summary.codecopySlots]
+        jumpTops = None
+        if summary.jumpSlot is not None:
+            jumpTops = (list(tagValues[summary.jumpSlot][:4]), executorValues[summary.jumpSlot])
+        if (codecopyItems, jumpTops) != expected or tagStack.getTagStack() != refTagStack.getTagStack() or \
+                executor.getExecutorState() != refExecutor.getExecutorState():
+            failNodes.append(node)
+    return failNodes
+
+
+# 检查基本块的转移摘要：
+# 1.对每个字节码的每个基本块，使用随机的入口栈，套用摘要的结果与逐条执行指令完全一致
+# 2.套用摘要的执行器使用PersistentStack，逐条执行的执行器使用Stack，两种栈的结果一致
+# 3.入口栈中的元素不足时，不能套用摘要
+# 用法: python TestBlockSummary.py [字节码文件...]，默认使用Bytecode目录下的所有字节码文件
+if __name__ == '__main__':
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin") + glob.glob(bytecodeDir + "*.txt"))
+    rand = random.Random(0)
+    failList = []
+    for srcFile in srcFiles:
+        beginTime = time.perf_counter()
+        failNodes = checkBlocks(srcFile, rand)
+        print("{}: 耗时:{:.3f}s，不一致的基本块:{}".format(os.path.basename(srcFile), time.perf_counter() - beginTime,
+                                                   failNodes))
+        if len(failNodes) != 0:
+            failList.append(srcFile)
+
+    optimizer = AssertionOptimizer(srcFiles[0], useCache=False)
+    optimizer._AssertionOptimizer__etherSolve()
+    tagStack = TagStack(optimizer.cfg)
+    for node in optimizer.cfg.blocks.keys():
+        if optimizer.cfg.getBlockSummary(node).readDepth > 0:
+            tagStack.setTagStack([])
+            assert tagStack.execBlockSummary(node) is None and tagStack.getTagStack() == []
+            break
+    print("不一致的字节码:{}".format(failList))
+    exit(1 if len(failList) != 0 else 0)
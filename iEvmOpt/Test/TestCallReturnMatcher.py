@@ -0,0 +1,105 @@
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AssertionOptimizer.CallReturnMatcher import CallReturnMatcher
+from AssertionOptimizer.JumpEdge import JumpEdge
+from Cfg.EtherSolver import EtherSolver
+
+
+def genUncondJumpEdges(cfg):
+    """ 与AssertionOptimizer中一致，找出所有unconditional jump的边
+    :param cfg:运行时cfg
+    """
+    edges = []
+    for n in cfg.blocks.values():
+        if n.jumpType == "unconditional":
+            for _to in cfg.edges[n.offset]:
+                edges.append(JumpEdge(n, cfg.blocks[_to]))
+    return edges
+
+
+def pairwiseMatch(uncondJumpEdges: list):
+    """ 原来的两两匹配，作为对照
+    :param uncondJumpEdges:所有无条件跳转的边
+    """
+    funcRange2Calls = {}
+    uncondJumpNum = len(uncondJumpEdges)
+    for i in range(0, uncondJumpNum):
+        for j in range(0, uncondJumpNum):
+            if i == j:
+                continue
+            e1, e2 = uncondJumpEdges[i], uncondJumpEdges[j]
+            if e1.tetrad[0] == e2.tetrad[2] and e1.tetrad[1] == e2.tetrad[3] and e1.tetrad[0] is not None:
+                if e1.targetNode > e2.beginNode:
+                    continue
+                e1.isCallerEdge = True
+                e2.isReturnEdge = True
+                funcRange2Calls.setdefault((e1.targetNode, e2.beginNode), []).append((e1.beginNode, e2.targetNode))
+    return funcRange2Calls
+
+
+# 对比调用边与返回边的哈希匹配与原来的两两匹配，结果(包括顺序)应当完全一致，并输出两者的耗时
+# 最后将边数最多的字节码的边复制多份，观察两者的耗时随边数的增长
+# 用法: python TestCallReturnMatcher.py [字节码文件...]，默认使用Bytecode目录下的所有.bin文件
+if __name__ == '__main__':
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin"), key=os.path.getsize)
+
+    failList = []
+    largestEdges = []
+    for srcFile in srcFiles:
+        outputPath = tempfile.mkdtemp()
+        es = EtherSolver(srcFile, outputPath)
+        es.execSolver()
+        shutil.rmtree(outputPath)
+        cfg = es.getCfg()
+        if not cfg.invalidExist:  # 没有修复边，也没有做预分析
+            continue
+
+        edges1, edges2 = genUncondJumpEdges(cfg), genUncondJumpEdges(cfg)
+        beginTime = time.perf_counter()
+        expected = pairwiseMatch(edges1)
+        pairwiseCost = time.perf_counter() - beginTime
+        beginTime = time.perf_counter()
+        matcher = CallReturnMatcher(edges2)
+        matcher.match()
+        matchCost = time.perf_counter() - beginTime
+
+        isSame = list(expected.items()) == list(matcher.getFuncRange2Calls().items()) and all(
+            [e1.isCallerEdge == e2.isCallerEdge and e1.isReturnEdge == e2.isReturnEdge for e1, e2 in zip(edges1, edges2)])
+        print("{}: 无条件跳转边数:{}，函数数量:{}，两两匹配耗时:{:.4f}s，哈希匹配耗时:{:.4f}s，结果一致:{}".format(
+            os.path.basename(srcFile), len(edges1), len(expected), pairwiseCost, matchCost, isSame))
+        if not isSame:
+            failList.append(srcFile)
+        if len(edges1) > len(largestEdges):
+            largestEdges = edges1
+
+    # 复制多份边，每一份的地址错开，匹配关系与原来的边相同
+    for times in [1, 2, 4, 8]:
+        edges = []
+        for k in range(times):
+            for e in largestEdges:
+                newEdge = JumpEdge.__new__(JumpEdge)
+                newEdge.__dict__.update(e.__dict__)
+                shift = k << 20
+                newEdge.tetrad = [None if t is None else t + shift for t in e.tetrad]
+                newEdge.beginNode, newEdge.targetNode = e.beginNode + shift, e.targetNode + shift
+                edges.append(newEdge)
+        beginTime = time.perf_counter()
+        pairwiseMatch(edges)
+        pairwiseCost = time.perf_counter() - beginTime
+        beginTime = time.perf_counter()
+        CallReturnMatcher(edges).match()
+        matchCost = time.perf_counter() - beginTime
+        print("边数:{}，两两匹配耗时:{:.4f}s，哈希匹配耗时:{:.4f}s".format(len(edges), pairwiseCost, matchCost))
+
+    print("不一致的字节码:{}".format(failList))
+    exit(1 if len(failList) != 0 else 0)
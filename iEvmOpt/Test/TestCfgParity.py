@@ -0,0 +1,77 @@
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Cfg.EtherSolvePool import EtherSolveDaemon, daemonEnvName
+from Cfg.EtherSolver import EtherSolver
+
+
+def cfgDiff(name: str, cfg1, cfg2):
+    """ 比较两个cfg的基本块与边，返回不一致的信息
+    :param name:cfg的名称
+    :param cfg1:内置CfgBuilder构建的cfg
+    :param cfg2:EtherSolve构建的cfg
+    :return:不一致的信息列表
+    """
+    diffs = []
+    if set(cfg1.blocks.keys()) != set(cfg2.blocks.keys()):
+        diffs.append("{} 基本块不一致: {}".format(name, sorted(set(cfg1.blocks.keys()) ^ set(cfg2.blocks.keys()))))
+        return diffs
+    for offset, b1 in cfg1.blocks.items():
+        b2 = cfg2.blocks[offset]
+        if b1.length != b2.length or b1.bytecodeStr != b2.bytecodeStr or b1.jumpType != b2.jumpType:
+            diffs.append("{} 基本块{}内容不一致".format(name, offset))
+        if b1.blockType != b2.blockType:
+            diffs.append("{} 基本块{}类型不一致: {} {}".format(name, offset, b1.blockType, b2.blockType))
+        if set(cfg1.edges[offset]) != set(cfg2.edges[offset]):
+            diffs.append("{} 基本块{}出边不一致: {} {}".format(name, offset, sorted(set(cfg1.edges[offset])),
+                                                          sorted(set(cfg2.edges[offset]))))
+    return diffs
+
+
+# 对比内置CfgBuilder与EtherSolve构建的cfg是否一致，需要java环境
+# EtherSolve通过守护进程调用，同时检查守护进程、常驻进程与它们之间的通信
+# 用法: python TestCfgParity.py [字节码文件...]，默认对比Bytecode目录下的所有字节码文件
+if __name__ == '__main__':
+    if shutil.which("java") is None:
+        print("没有找到java，跳过对比")
+        exit(0)
+
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin") + glob.glob(bytecodeDir + "*.txt"))
+
+    daemon = EtherSolveDaemon().start()
+    os.environ[daemonEnvName] = daemon.getAddress()
+    failList = []
+    for srcFile in srcFiles:
+        outputPath = tempfile.mkdtemp()
+        native = EtherSolver(srcFile, outputPath)
+        native.execSolver()
+        es = EtherSolver(srcFile, outputPath, useEtherSolve=True)
+        es.execSolver()
+
+        diffs = cfgDiff("constructor", native.getConstructorCfg(), es.getConstructorCfg())
+        diffs += cfgDiff("runtime", native.getCfg(), es.getCfg())
+        if native.getConstructorDataSegStr() != es.getConstructorDataSegStr():
+            diffs.append("构造函数数据段不一致")
+        if native.getDataSeg() != es.getDataSeg():
+            diffs.append("运行时数据段不一致")
+        shutil.rmtree(outputPath)
+
+        if len(diffs) == 0:
+            print("{}: 一致".format(srcFile))
+        else:
+            failList.append(srcFile)
+            print("{}: 不一致".format(srcFile))
+            for d in diffs:
+                print("    " + d)
+
+    daemon.close()
+    print("共对比{}个文件，{}个不一致: {}".format(len(srcFiles), len(failList), failList))
+    exit(1 if len(failList) != 0 else 0)
@@ -0,0 +1,149 @@
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Cfg.BasicBlock import BasicBlock
+from Cfg.Cfg import Cfg
+from Cfg.CfgBuilder import CfgBuilder
+from Cfg.CfgRepairKit import CfgRepairKit
+
+
+def buildCfg(cfgInfo: dict, removedEdges: list):
+    """ 根据cfg信息构建cfg，并删除一些边，删除后没有出边的节点连向exit block，与EtherSolve无法求解跳转时一致
+    :param cfgInfo:cfg信息，格式与EtherSolve输出的json文件一致
+    :param removedEdges:需要删除的边，格式为[[from,to]...]
+    """
+    cfg = Cfg()
+    for b in cfgInfo["nodes"]:
+        cfg.addBasicBlock(BasicBlock(b))
+    for e in cfgInfo["successors"]:
+        cfg.addEdge(e)
+    cfg.initBlockId = min(cfg.blocks.keys())
+    cfg.exitBlockId = max(cfg.blocks.keys())
+    for _from, _to in removedEdges:
+        cfg.edges[_from].remove(_to)
+        cfg.inEdges[_to].remove(_from)
+        if len(cfg.edges[_from]) == 0:
+            cfg.edges[_from].append(cfg.exitBlockId)
+            cfg.inEdges[cfg.exitBlockId].append(_from)
+    return cfg
+
+
+def genDiamondChain(n: int):
+    """ 生成由n个菱形结构串联而成的cfg，最后一个跳转的边缺失
+    每个菱形为 CALLDATASIZE PUSH2 L JUMPI; PUSH2 L JUMP; L: JUMPDEST，从起点到缺失的边一共有2^n条路径
+    """
+    code = bytearray()
+    nodes, edges = [], {}
+    for i in range(n):
+        a = len(code)
+        label = a + 9
+        code += bytes([0x36, 0x61]) + label.to_bytes(2, "big") + bytes([0x57])
+        code += bytes([0x61]) + label.to_bytes(2, "big") + bytes([0x56])
+        code += bytes([0x5b])
+        nodes += [(a, 5), (a + 5, 4), (a + 9, 1)]
+        edges[a], edges[a + 5], edges[a + 9] = [label, a + 5], [label], [a + 10]
+    a = len(code)
+    target = a + 4
+    code += bytes([0x61]) + target.to_bytes(2, "big") + bytes([0x56])
+    code += bytes([0x5b, 0x00])
+    nodes += [(a, 4), (target, 2), (len(code), 0)]
+    edges[a], edges[target] = [target], [len(code)]
+    cfgInfo = {
+        "nodes": [{"offset": o, "length": l, "type": "dispatcher", "stackBalance": 0, "bytecode": code[o:o + l]}
+                  for o, l in nodes],
+        "successors": [{"from": _from, "to": tos} for _from, tos in edges.items()]
+    }
+    return buildCfg(cfgInfo, [[a, target]]), [a, target]
+
+
+def checkRecursiveReturns(srcFile: str, expectedEdges: list, removedEdges: list):
+    """ 对含有递归调用的字节码，先检查构建时能否求解出递归函数的返回边，再删除这些边，检查修复之后能否恢复，
+    且原本跳到exit block的边被删除。分别使用定向修复与对整个cfg的修复，两者得到的边应当完全一致
+    :param expectedEdges:递归函数的返回边，格式为[[from,to]...]
+    :param removedEdges:删除返回边之后，修复时应当被删除的边，格式为[[from,to]...]
+    :return:(构建时没有求解出的边，未修复的边，没有被删除的边，定向修复与完整修复的结果是否一致)
+    """
+    with open(srcFile, "r") as f:
+        cfgInfo = CfgBuilder(f.read()).buildRuntime()
+    built = buildCfg(cfgInfo, [])
+    unsolved = [e for e in expectedEdges if e[1] not in built.edges[e[0]]]
+    if len(unsolved) != 0:
+        return unsolved, [], [], True
+    fixedEdges = []
+    for targeted in [True, False]:
+        cfg = buildCfg(cfgInfo, expectedEdges)
+        CfgRepairKit(cfg, targeted).fix()
+        fixedEdges.append({_from: sorted(tos) for _from, tos in cfg.edges.items()})
+    missing = [e for e in expectedEdges if any([e[1] not in edges[e[0]] for edges in fixedEdges])]
+    remaining = [e for e in removedEdges if any([e[1] in edges[e[0]] for edges in fixedEdges])]
+    return [], missing, remaining, fixedEdges[0] == fixedEdges[1]
+
+
+# 检查CfgRepairKit能否修复缺失的边
+# 第一部分：对每个字节码，删除若干条只有一个入边的节点的无条件跳转边，检查修复之后能否恢复，且不会加入修复原cfg时不存在的边
+# 定向修复与对整个cfg的修复的结果应当一致
+# 第二部分：菱形结构串联的cfg，路径数量随长度指数增长，修复的耗时应当随长度线性增长
+# 第三部分：test7中的递归函数被两个调用点调用，构建时应当能求解出它的返回边；删除这些返回边之后，
+# 递归压入的返回地址使状态数超出上限，另一个调用点的返回边仍然能被修复，且定向修复与完整修复得到的边完全一致
+# 用法: python TestCfgRepairKit.py [字节码文件...]，默认使用Bytecode目录下的所有字节码文件
+if __name__ == '__main__':
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin") + glob.glob(bytecodeDir + "*.txt"))
+
+    failList = []
+    for srcFile in srcFiles:
+        with open(srcFile, "r") as f:
+            cfgInfo = CfgBuilder(f.read()).buildRuntime()
+        original = buildCfg(cfgInfo, [])
+        reference = buildCfg(cfgInfo, [])
+        CfgRepairKit(reference, False).fix()  # 构建时可能本来就缺失一些边(如递归函数的返回边)，以修复之后的cfg作为参照
+        removedEdges = []
+        for _from, tos in original.edges.items():
+            for _to in tos:
+                if original.blocks[_from].jumpType == "unconditional" and len(original.inEdges[_to]) == 1 \
+                        and _to != original.exitBlockId:
+                    removedEdges.append([_from, _to])
+        removedEdges = removedEdges[:3]
+        if len(removedEdges) == 0:
+            continue
+        damaged = buildCfg(cfgInfo, removedEdges)
+        fixedEdges, costs = [], []
+        for targeted in [True, False]:  # 分别使用定向修复与整个cfg的修复
+            cfg = buildCfg(cfgInfo, removedEdges)
+            beginTime = time.perf_counter()
+            CfgRepairKit(cfg, targeted).fix()
+            costs.append(time.perf_counter() - beginTime)
+            fixedEdges.append({_from: sorted(tos) for _from, tos in cfg.edges.items()})
+        missing = [e for e in removedEdges if e[1] not in cfg.edges[e[0]]]
+        spurious = [[_from, _to] for _from, tos in cfg.edges.items() for _to in tos
+                    if _to not in damaged.edges[_from] and _to not in reference.edges[_from]]
+        name = os.path.basename(srcFile)
+        print("{}: 删除{}条边，未修复{}，错误修复{}，定向修复耗时:{:.4f}s，完整修复耗时:{:.4f}s".format(
+            name, len(removedEdges), missing, spurious, costs[0], costs[1]))
+        if len(missing) != 0 or len(spurious) != 0 or fixedEdges[0] != fixedEdges[1]:
+            failList.append(name)
+
+    for n in [4, 8, 16, 32, 64]:
+        cfg, edge = genDiamondChain(n)
+        beginTime = time.perf_counter()
+        CfgRepairKit(cfg).fix()
+        print("菱形数量:{}，修复耗时:{:.4f}s，修复结果:{}".format(n, time.perf_counter() - beginTime,
+                                                      edge[1] in cfg.edges[edge[0]]))
+        if edge[1] not in cfg.edges[edge[0]]:
+            failList.append("diamond{}".format(n))
+
+    bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+    unsolved, missing, remaining, isSame = checkRecursiveReturns(bytecodeDir + "test7.txt",
+                                                                 [[212, 118], [212, 227], [227, 158]], [[227, 232]])
+    print("test7: 构建时没有求解出的返回边:{}，未修复的返回边:{}，没有被删除的边:{}，定向修复与完整修复一致:{}".format(
+        unsolved, missing, remaining, isSame))
+    if len(unsolved) != 0 or len(missing) != 0 or len(remaining) != 0 or not isSame:
+        failList.append("test7.txt")
+
+    print("不一致的字节码:{}".format(failList))
@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 并发压力测试：同时启动多个Main.py对同名的字节码文件进行优化，检查各次运行的结果是否与串行运行的结果一致
+# 同时检查CFG缓存的命中统计在并发更新时没有丢失计数
+# 用法: python TestConcurrentOptimize.py [并发数] [Main.py的可选参数...]，例如 python TestConcurrentOptimize.py 8 -es
+if __name__ == '__main__':
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    extraArgs = sys.argv[2:]
+    iEvmOptDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    bytecodeDir = os.path.join(iEvmOptDir, "..", "Bytecode")
+    srcFiles = ["test1.txt", "test9.txt", "test10.txt", "test13.txt", "test16.txt", "assertExample.txt"]
+    timeoutTime = 1200
+    statsPath = os.path.join(os.path.expanduser("~"), ".cache", "iEvmOpt", "cfg", "stats.json")
+
+
+    def runOptimize(srcPath: str, outputPath: str):
+        cmd = [sys.executable, os.path.join(iEvmOptDir, "Main.py"), srcPath, outputPath, "optimized"] + extraArgs
+        p = subprocess.run(cmd, cwd=iEvmOptDir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                           timeout=timeoutTime)
+        resPath = os.path.join(outputPath, "optimized")
+        if not os.path.exists(resPath):
+            return p.returncode, None, p.stdout
+        with open(resPath, "r") as f:
+            return p.returncode, f.read(), p.stdout
+
+
+    def readStatsCount():
+        try:
+            with open(statsPath, "r") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        return stats.get("hits", 0) + stats.get("misses", 0)
+
+
+    workDir = tempfile.mkdtemp(prefix="iEvmOpt_stress_")
+    # 先串行运行一次，得到期望的结果
+    expected = {}
+    statsCount = readStatsCount()
+    for srcFile in srcFiles:
+        outputPath = os.path.join(workDir, "serial_" + srcFile)
+        os.mkdir(outputPath)
+        returnCode, res, output = runOptimize(os.path.join(bytecodeDir, srcFile), outputPath)
+        expected[srcFile] = res
+    serialLookupNum = readStatsCount() - statsCount
+
+    # 每个任务使用不同目录下的同名文件，以检查同名文件之间是否会互相覆盖
+    tasks = []
+    for i in range(concurrency):
+        for srcFile in srcFiles:
+            taskDir = os.path.join(workDir, "task{}_{}".format(i, srcFile))
+            os.makedirs(os.path.join(taskDir, "out"))
+            srcPath = os.path.join(taskDir, "contract.bin")
+            shutil.copy(os.path.join(bytecodeDir, srcFile), srcPath)
+            tasks.append((srcFile, srcPath, os.path.join(taskDir, "out")))
+
+    statsCount = readStatsCount()
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda t: runOptimize(t[1], t[2]), tasks))
+    totalTime = time.perf_counter() - begin
+    concurrentLookupNum = readStatsCount() - statsCount
+
+    failList = []
+    for (srcFile, srcPath, outputPath), (returnCode, res, output) in zip(tasks, results):
+        if returnCode != 0 or res != expected[srcFile]:
+            failList.append(srcPath)
+            print("结果不一致: {} (返回值{})".format(srcPath, returnCode))
+            print(output[-2000:])
+    if concurrentLookupNum != serialLookupNum * concurrency:  # 每一轮的缓存查询次数相同
+        failList.append(statsPath)
+        print("缓存统计丢失了计数: 串行{}次查询，并发{}次查询".format(serialLookupNum, concurrentLookupNum))
+    print("并发数{}，共运行{}个任务，耗时{:.2f}s，{}个结果不一致".format(concurrency, len(tasks), totalTime, len(failList)))
+    shutil.rmtree(workDir, ignore_errors=True)
+    exit(1 if len(failList) != 0 else 0)
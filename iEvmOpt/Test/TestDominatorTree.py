@@ -0,0 +1,128 @@
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Cfg.EtherSolver import EtherSolver
+from GraphTools import DominatorTreeBuilder
+from GraphTools.CsrGraph import CsrGraph
+from GraphTools.GraphMapper import GraphMapper
+
+algorithms = ["lengauerTarjan", "cooperHarveyKennedy"]
+
+
+def naiveIdom(nodes: list, edges: dict, root: int):
+    """ 按定义迭代求每个节点的支配节点集合，再得到直接支配节点，作为对照
+    :param nodes:图的节点
+    :param edges:图的出边表
+    :param root:起始节点
+    :return:格式为 {n:n的直接支配节点}，不包含起始节点与不可达的节点
+    """
+    reach = {root}
+    stack = [root]
+    while stack:
+        x = stack.pop()
+        for y in edges[x]:
+            if y not in reach:
+                reach.add(y)
+                stack.append(y)
+    preds = {n: [] for n in nodes}
+    for x in nodes:
+        for y in edges[x]:
+            preds[y].append(x)
+    dom = {n: set(reach) for n in reach}
+    dom[root] = {root}
+    changed = True
+    while changed:
+        changed = False
+        for n in reach:
+            if n == root:
+                continue
+            newDom = set.intersection(*[dom[p] for p in preds[n] if p in reach]) | {n}
+            if newDom != dom[n]:
+                dom[n] = newDom
+                changed = True
+    idom = {}
+    for n in reach:
+        if n == root:
+            continue
+        strictDom = dom[n] - {n}
+        for c in strictDom:
+            if all([c == d or d in dom[c] for d in strictDom]):
+                idom[n] = c
+    return idom
+
+
+def buildIdom(graph: CsrGraph, algorithm: str, root: int, isPost: bool = False):
+    """ 使用DominatorTreeBuilder生成(后)支配树，返回以offset表示的直接(后)支配节点
+    """
+    mapper = GraphMapper(graph)
+    domTree = DominatorTreeBuilder(algorithm)
+    domTree.initGraphFromCsr(graph)
+    if isPost:
+        domTree.buildPostTreeFrom(mapper.offsetToNew(root))
+    else:
+        domTree.buildTreeFrom(mapper.offsetToNew(root))
+    return {mapper.newToOffset(k): mapper.newToOffset(v) for k, v in domTree.getIdom().items() if v != 0}
+
+
+# 检查支配树与后支配树的生成：
+# 1.随机图上，两种算法的结果都与按定义求出的结果一致
+# 2.很长的链上不会超出递归深度
+# 3.对比两种算法在Bytecode目录下的字节码上的耗时
+# 用法: python TestDominatorTree.py [字节码文件...]，默认使用Bytecode目录下的所有.bin文件
+if __name__ == '__main__':
+    random.seed(0)
+    for t in range(2000):
+        nodeNum = random.randint(1, 30)
+        nodes = random.sample(range(0, 200), nodeNum)
+        edges = {x: [random.choice(nodes) for _ in range(random.randint(0, 3))] for x in nodes}
+        reverseEdges = {x: [] for x in nodes}
+        for x in nodes:
+            for y in edges[x]:
+                reverseEdges[y].append(x)
+        graph = CsrGraph(nodes, edges)
+        root, end = nodes[0], nodes[-1]
+        expected, expectedPost = naiveIdom(nodes, edges, root), naiveIdom(nodes, reverseEdges, end)
+        for algorithm in algorithms:
+            assert buildIdom(graph, algorithm, root) == expected, (algorithm, nodes, edges)
+            assert buildIdom(graph, algorithm, end, True) == expectedPost, (algorithm, nodes, edges)
+    print("随机图检查通过")
+
+    nodeNum = 200000
+    chain = CsrGraph(list(range(nodeNum)), {i: [i + 1] for i in range(nodeNum - 1)})
+    for algorithm in algorithms:
+        beginTime = time.perf_counter()
+        assert buildIdom(chain, algorithm, 0)[nodeNum - 1] == nodeNum - 2
+        print("长度为{}的链，{}耗时:{:.3f}s".format(nodeNum, algorithm, time.perf_counter() - beginTime))
+
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin"), key=os.path.getsize)
+    failList = []
+    for srcFile in srcFiles:
+        outputPath = tempfile.mkdtemp()
+        es = EtherSolver(srcFile, outputPath, useCache=False)
+        es.execSolver()
+        shutil.rmtree(outputPath)
+        cfg = es.getCfg()
+        graph = cfg.getCsrGraph()
+        results, costs = [], []
+        for algorithm in algorithms:
+            for isPost in [False, True]:
+                beginTime = time.perf_counter()
+                results.append(buildIdom(graph, algorithm, cfg.exitBlockId if isPost else cfg.initBlockId, isPost))
+                costs.append(time.perf_counter() - beginTime)
+        isSame = results[0] == results[2] and results[1] == results[3]
+        print("{}: 节点数:{}，支配树耗时 LT:{:.5f}s CHK:{:.5f}s，后支配树耗时 LT:{:.5f}s CHK:{:.5f}s，结果一致:{}".format(
+            os.path.basename(srcFile), graph.getNodeNum(), costs[0], costs[2], costs[1], costs[3], isSame))
+        if not isSame:
+            failList.append(srcFile)
+    print("不一致的字节码:{}".format(failList))
+    exit(1 if len(failList) != 0 else 0)
@@ -0,0 +1,110 @@
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AssertionOptimizer.AssertionOptimizer import AssertionOptimizer
+from AssertionOptimizer.JumpEdge import JumpEdge
+from AssertionOptimizer.PathCounter import PathCounter
+from AssertionOptimizer.PathGenerator import PathGenerator
+from Cfg.BasicBlock import BasicBlock
+from Cfg.Cfg import Cfg
+from Utils.Logger import OptimizeFailure
+
+
+def genDiamondChain(n: int):
+    """ 生成由n个菱形结构串联而成的cfg，最后以INVALID结束
+    每个菱形为 CALLDATASIZE PUSH2 L JUMPI; PUSH2 L JUMP; L: JUMPDEST，从起点到INVALID一共有2^n条路径
+    :return:(cfg,无条件跳转边,invalid节点)
+    """
+    code = bytearray()
+    nodes, edges = [], {}
+    for i in range(n):
+        a = len(code)
+        label = a + 9
+        code += bytes([0x36, 0x61]) + label.to_bytes(2, "big") + bytes([0x57])
+        code += bytes([0x61]) + label.to_bytes(2, "big") + bytes([0x56])
+        code += bytes([0x5b])
+        nodes += [(a, 5), (a + 5, 4), (a + 9, 1)]
+        edges[a], edges[a + 5], edges[a + 9] = [label, a + 5], [label], [a + 10]
+    invNode = len(code)
+    code += bytes([0xfe])
+    nodes.append((invNode, 1))
+    cfg = Cfg()
+    for o, l in nodes:
+        cfg.addBasicBlock(BasicBlock({"offset": o, "length": l, "type": "dispatcher", "stackBalance": 0,
+                                      "bytecode": code[o:o + l]}))
+    for _from, tos in edges.items():
+        cfg.addEdge({"from": _from, "to": tos})
+    cfg.initBlockId = 0
+    uncondJumpEdges = [JumpEdge(cfg.blocks[_from], cfg.blocks[_to]) for _from, tos in edges.items() for _to in tos
+                       if cfg.blocks[_from].jumpType == "unconditional"]
+    return cfg, uncondJumpEdges, invNode
+
+
+def countPaths(srcFile: str):
+    """ 对字节码做函数识别之后，分别预估路径数量，以及使用路径搜索找出所有路径
+    :return:None，或者(invalid节点,预估的路径数量,实际的路径数量,预估是否经过循环体,实际是否经过循环体)的列表
+    """
+    optimizer = AssertionOptimizer(srcFile, useCache=False)
+    optimizer._AssertionOptimizer__etherSolve()
+    if not optimizer.cfg.invalidExist:
+        return None
+    try:
+        optimizer._AssertionOptimizer__identifyAndCheckFunctions()
+    except OptimizeFailure:  # 无法优化的字节码
+        return None
+    beginTime = time.perf_counter()
+    counter = PathCounter(optimizer.cfg, optimizer.uncondJumpEdge, optimizer.isLoopRelated)
+    counter.count()
+    countCost = time.perf_counter() - beginTime
+    generator = PathGenerator(optimizer.cfg, optimizer.uncondJumpEdge, optimizer.isLoopRelated,
+                              optimizer.node2FuncId, optimizer.funcDict)
+    beginTime = time.perf_counter()
+    try:
+        generator.genPath()
+    except OptimizeFailure:
+        return None
+    genCost = time.perf_counter() - beginTime
+    pathNum, viaLoop = {}, {}
+    for path in generator.getPath():
+        invNode = path.getLastNode()
+        pathNum[invNode] = pathNum.get(invNode, 0) + 1
+        isViaLoop = any([optimizer.isLoopRelated[node] for node in path.getPathNodes()])
+        viaLoop[invNode] = viaLoop.get(invNode, False) or isViaLoop
+    print("{}: 预估耗时:{:.4f}s，路径搜索耗时:{:.3f}s".format(os.path.basename(srcFile), countCost, genCost))
+    return [(b.offset, counter.getPathNum(b.offset), pathNum.get(b.offset, 0), counter.isViaLoop(b.offset),
+             viaLoop.get(b.offset, False)) for b in optimizer.cfg.blocks.values() if b.isInvalid]
+
+
+# 检查路径数量的预估：
+# 1.菱形结构串联的cfg，路径数量为2^n，预估的结果应当准确，且耗时与n成线性关系
+# 2.对每个字节码，路径中不包含循环体的invalid节点，预估的路径数量与路径搜索实际找到的一致；是否经过循环体的预估也一致
+# 用法: python TestPathCounter.py [字节码文件...]，默认使用Bytecode目录下的所有字节码文件
+if __name__ == '__main__':
+    for n in [10, 100, 1000]:
+        cfg, uncondJumpEdges, invNode = genDiamondChain(n)
+        beginTime = time.perf_counter()
+        counter = PathCounter(cfg, uncondJumpEdges, dict.fromkeys(cfg.blocks.keys(), False))
+        counter.count()
+        assert counter.getPathNum(invNode) == 2 ** n and counter.getTotalPathNum() == 2 ** n
+        print("{}个菱形结构，路径数量:2^{}，耗时:{:.4f}s".format(n, n, time.perf_counter() - beginTime))
+
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin") + glob.glob(bytecodeDir + "*.txt"))
+    failList = []
+    for srcFile in srcFiles:
+        res = countPaths(srcFile)
+        if res is None:
+            continue
+        for invNode, predictNum, actualNum, predictViaLoop, actualViaLoop in res:
+            if predictViaLoop != actualViaLoop or (not actualViaLoop and predictNum != actualNum):
+                print("invalid节点:{}，预估路径数量:{}，实际路径数量:{}，预估经过循环体:{}，实际经过循环体:{}".format(
+                    invNode, predictNum, actualNum, predictViaLoop, actualViaLoop))
+                failList.append(srcFile)
+    print("预估不一致的字节码:{}".format(failList))
+    exit(1 if len(failList) != 0 else 0)
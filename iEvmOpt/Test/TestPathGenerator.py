@@ -0,0 +1,129 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AssertionOptimizer.AssertionOptimizer import AssertionOptimizer
+from AssertionOptimizer.JumpEdge import JumpEdge
+from AssertionOptimizer.PathGenerator import PathGenerator
+from Cfg.BasicBlock import BasicBlock
+from Cfg.Cfg import Cfg
+from Utils.Logger import OptimizeFailure
+
+
+def getResult(generator: PathGenerator):
+    """ 将路径搜索的结果转换为与保存的基准结果相同的格式，路径只保存数量和摘要
+    :return:{"pathNum":路径数量,"pathDigest":所有路径的sha256,"jumpEdgeInfo":跳转边信息,"codecopyInfo":codecopy信息}
+    """
+    paths = [path.pathNodes for path in generator.getPath()]
+    return {"pathNum": len(paths),
+            "pathDigest": hashlib.sha256(json.dumps(paths, separators=(",", ":")).encode()).hexdigest(),
+            "jumpEdgeInfo": generator.getJumpEdgeInfo(), "codecopyInfo": generator.getCodecopyInfo()}
+
+
+def isSameResult(result: dict, expected: dict):
+    """ 检查路径(包括顺序)、跳转边信息、codecopy信息与基准结果是否完全一致
+    """
+    return all([result[key] == expected[key] for key in ["pathNum", "pathDigest", "jumpEdgeInfo", "codecopyInfo"]])
+
+
+def genJumpChain(n: int):
+    """ 生成由n个 JUMPDEST PUSH3 next JUMP 组成的链，最后以INVALID结束，只有一条长度为n+1的路径
+    :return:(cfg,无条件跳转边)
+    """
+    code = bytearray()
+    for i in range(n):
+        code += bytes([0x5b, 0x62]) + (6 * i + 6).to_bytes(3, "big") + bytes([0x56])
+    code += bytes([0x5b, 0xfe])
+    cfg = Cfg()
+    for i in range(n + 1):
+        length = 6 if i < n else 2
+        cfg.addBasicBlock(BasicBlock({"offset": 6 * i, "length": length, "type": "dispatcher", "stackBalance": 0,
+                                      "bytecode": code[6 * i:6 * i + length]}))
+    for i in range(n):
+        cfg.addEdge({"from": 6 * i, "to": [6 * i + 6]})
+        cfg.blocks[6 * i].jumpDest = [6 * i + 6]
+    cfg.initBlockId = 0
+    return cfg, [JumpEdge(cfg.blocks[6 * i], cfg.blocks[6 * i + 6]) for i in range(n)]
+
+
+def genGrowingLoop():
+    """ 生成一个每次迭代都会往栈中多压入一个跳转地址的循环，循环结束之后执行INVALID
+    0: JUMPDEST CALLDATASIZE PUSH1 11 JUMPI; 5: JUMPDEST PUSH1 11 PUSH1 0 JUMP; 11: JUMPDEST INVALID
+    不做环相关节点的访问控制时，进入循环头的执行状态随迭代次数无限增长
+    :return:(cfg,无条件跳转边,节点是否为环相关)
+    """
+    code = bytes([0x5b, 0x36, 0x60, 0x0b, 0x57, 0x5b, 0x60, 0x0b, 0x60, 0x00, 0x56, 0x5b, 0xfe])
+    cfg = Cfg()
+    for offset, length in [(0, 5), (5, 6), (11, 2)]:
+        cfg.addBasicBlock(BasicBlock({"offset": offset, "length": length, "type": "dispatcher", "stackBalance": 0,
+                                      "bytecode": code[offset:offset + length]}))
+    cfg.addEdge({"from": 0, "to": [11, 5]})
+    cfg.addEdge({"from": 5, "to": [0]})
+    cfg.blocks[0].jumpDest = [11]
+    cfg.blocks[5].jumpDest = [0]
+    cfg.initBlockId = 0
+    return cfg, [JumpEdge(cfg.blocks[5], cfg.blocks[0])], {0: True, 5: True, 11: False}
+
+
+# 检查路径搜索：
+# 1.对每个字节码，找到的路径(包括顺序)、跳转边信息、codecopy信息与基准结果完全一致
+#   基准结果保存在TestPathGenerator.json中，由改为迭代实现之前的递归PathGenerator在Bytecode目录下的字节码上得到，
+#   visitNum为递归实现访问节点的次数，路径只保存了数量和摘要
+# 2.很长的链上不会超出递归深度
+# 3.栈随迭代不断增长的循环中，结果与基准一致，并且执行状态数不超过递归实现访问节点的次数
+# 用法: python TestPathGenerator.py [字节码文件...]，默认使用Bytecode目录下的所有字节码文件，没有基准结果的字节码会被跳过
+if __name__ == '__main__':
+    with open(os.path.dirname(os.path.abspath(__file__)) + "/TestPathGenerator.json") as f:
+        baseline = json.load(f)
+
+    nodeNum = 100000
+    cfg, uncondJumpEdges = genJumpChain(nodeNum)
+    generator = PathGenerator(cfg, uncondJumpEdges, dict.fromkeys(cfg.blocks.keys(), False),
+                              dict.fromkeys(cfg.blocks.keys(), None), {})
+    beginTime = time.perf_counter()
+    generator.genPath()
+    assert len(generator.getPath()) == 1 and len(generator.getPath()[0].pathNodes) == nodeNum + 1
+    print("长度为{}的链，耗时:{:.3f}s".format(nodeNum, time.perf_counter() - beginTime))
+
+    cfg, uncondJumpEdges, isLoopRelated = genGrowingLoop()
+    generator = PathGenerator(cfg, uncondJumpEdges, isLoopRelated, dict.fromkeys(cfg.blocks.keys(), None), {})
+    generator.genPath()
+    expected = baseline["growingLoop"]
+    isSame = isSameResult(getResult(generator), expected) and len(generator.stateNodes) <= expected["visitNum"]
+    print("栈不断增长的循环：执行状态数:{}，递归实现访问节点数:{}，结果一致:{}".format(
+        len(generator.stateNodes), expected["visitNum"], isSame))
+    failList = [] if isSame else ["growingLoop"]
+
+    srcFiles = sys.argv[1:]
+    if len(srcFiles) == 0:
+        bytecodeDir = os.path.dirname(os.path.abspath(__file__)) + "/../../Bytecode/"
+        srcFiles = sorted(glob.glob(bytecodeDir + "*.bin") + glob.glob(bytecodeDir + "*.txt"))
+    for srcFile in srcFiles:
+        expected = baseline.get(os.path.basename(srcFile))
+        if expected is None:  # 没有基准结果，递归实现也无法优化
+            continue
+        optimizer = AssertionOptimizer(srcFile, useCache=False)
+        optimizer._AssertionOptimizer__etherSolve()
+        try:
+            optimizer._AssertionOptimizer__identifyAndCheckFunctions()
+            generator = PathGenerator(optimizer.cfg, optimizer.uncondJumpEdge, optimizer.isLoopRelated,
+                                      optimizer.node2FuncId, optimizer.funcDict)
+            beginTime = time.perf_counter()
+            generator.genPath()
+            cost = time.perf_counter() - beginTime
+        except OptimizeFailure:  # 递归实现能够得到结果，这里也必须能够得到
+            failList.append(srcFile)
+            continue
+        isSame = isSameResult(getResult(generator), expected)
+        print("{}: 递归实现访问节点数:{}；执行状态数:{}，剪枝后访问节点数:{}，耗时:{:.3f}s，结果一致:{}".format(
+            os.path.basename(srcFile), expected["visitNum"], len(generator.stateNodes), generator.visitNum, cost,
+            isSame))
+        if not isSame:
+            failList.append(srcFile)
+    print("不一致的字节码:{}".format(failList))
+    exit(1 if len(failList) != 0 else 0)
@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Utils import Stack, PersistentStack
+
+
+def randomOps(opNum: int, seed: int):
+    """ 对Stack和PersistentStack执行相同的随机操作，并随机保存、恢复快照
+    :return:两者的结果是否一直一致
+    """
+    rand = random.Random(seed)
+    stack, persistentStack = Stack(enableUnderFlow=True), PersistentStack(enableUnderFlow=True)
+    snapshots = []  # 格式为 (Stack中的元素列表，PersistentStack的快照)
+    for i in range(opNum):
+        op = rand.randrange(7)
+        size = stack.size()
+        match op:
+            case 0 | 1:
+                stack.push(i)
+                persistentStack.push(i)
+            case 2:
+                if stack.pop() != persistentStack.pop():
+                    return False
+            case 3:
+                if size > 1:
+                    pos = rand.randrange(max(0, size - 17), size - 1)
+                    stack.swap(size - 1, pos)
+                    persistentStack.swap(size - 1, pos)
+            case 4:
+                if size > 0:
+                    pos = rand.randrange(size)
+                    if stack.getItem(pos) != persistentStack.getItem(pos) or stack.getTop() != persistentStack.getTop():
+                        return False
+            case 5:
+                snapshots.append((stack.getStack(), persistentStack.getSnapshot()))
+            case 6:
+                if snapshots:
+                    items, snapshot = snapshots[rand.randrange(len(snapshots))]
+                    stack.setStack(items)
+                    persistentStack.restoreSnapshot(snapshot)
+        if stack.getStack() != persistentStack.getStack() or stack.size() != persistentStack.size():
+            return False
+    return True
+
+
+# 检查不可变链表实现的栈：
+# 1.随机执行push、pop、swap、getItem以及快照的保存和恢复，结果与Stack一致，保存的快照不会被之后的修改影响
+# 2.对比在每一步都保存、恢复一次状态时，两者的耗时
+# 用法: python TestPersistentStack.py
+if __name__ == '__main__':
+    failList = []
+    for seed in range(20):
+        if not randomOps(2000, seed):
+            failList.append(seed)
+
+    depth, stepNum = 1000, 20000
+    stack = Stack()
+    stack.setStack(list(range(depth)))
+    beginTime = time.perf_counter()
+    for i in range(stepNum):
+        items = stack.getStack()
+        stack.push(i)
+        stack.setStack(items)
+    cost = time.perf_counter() - beginTime
+    persistentStack = PersistentStack()
+    persistentStack.setStack(list(range(depth)))
+    beginTime = time.perf_counter()
+    for i in range(stepNum):
+        snapshot = persistentStack.getSnapshot()
+        persistentStack.push(i)
+        persistentStack.restoreSnapshot(snapshot)
+    persistentCost = time.perf_counter() - beginTime
+    print("栈深度为{}，保存并恢复{}次状态，Stack耗时:{:.4f}s，PersistentStack耗时:{:.4f}s".format(
+        depth, stepNum, cost, persistentCost))
+    print("不一致的随机种子:{}".format(failList))
+    exit(1 if len(failList) != 0 else 0)
@@ -0,0 +1,89 @@
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GraphTools.CsrGraph import CsrGraph
+from GraphTools.TarjanAlgorithm import TarjanAlgorithm
+
+
+def naiveScc(nodes: list, edges: dict):
+    """ 用可达性求强连通分量，作为对照：两个节点互相可达时属于同一个强连通分量
+    :param nodes:子图的节点
+    :param edges:子图的出边表
+    """
+    reach = {}
+    for n in nodes:
+        reach[n] = {n}
+        stack = [n]
+        while stack:
+            x = stack.pop()
+            for y in edges[x]:
+                if y not in reach[n]:
+                    reach[n].add(y)
+                    stack.append(y)
+    return set([frozenset([m for m in nodes if m in reach[n] and n in reach[m]]) for n in nodes])
+
+
+# 检查非递归的tarjan：
+# 1.随机图上，强连通分量与可达性求出的结果一致，缩点图是一个DAG，且强连通分量的下标从大到小为拓扑序
+# 2.复用同一个实例处理多个子图时，结果与单独创建实例一致
+# 3.很长的链和环上不会超出递归深度，耗时与图的大小成线性关系
+if __name__ == '__main__':
+    random.seed(0)
+    for t in range(2000):
+        nodeNum = random.randint(1, 30)
+        nodes = random.sample(range(0, 200), nodeNum)
+        edges = {x: [random.choice(nodes) for _ in range(random.randint(0, 3))] for x in nodes}
+        graph = CsrGraph(nodes, edges)
+        sub = random.sample(nodes, random.randint(1, nodeNum))
+        subEdges = {x: [y for y in edges[x] if y in sub] for x in sub}
+        tarjan = TarjanAlgorithm(graph, sub)
+        for x in sub:
+            if not tarjan.isVisited(x):
+                tarjan.tarjan(x)
+        sccList = tarjan.getSccList()
+        assert set([frozenset(scc) for scc in sccList]) == naiveScc(sub, subEdges), (nodes, edges, sub)
+        for sccId, scc in enumerate(sccList):
+            for x in scc:
+                assert tarjan.getSccId(x) == sccId
+        dag = tarjan.getCondensation()
+        for sccId in range(dag.getNodeNum()):
+            for dest in dag.getSuccIndexes(sccId):
+                assert dest < sccId  # 边总是从下标大的分量指向下标小的分量
+        for x in sub:
+            for y in subEdges[x]:
+                if tarjan.getSccId(x) != tarjan.getSccId(y):
+                    assert dag.hasEdge(tarjan.getSccId(x), tarjan.getSccId(y))
+    print("随机图检查通过")
+
+    # 同一个实例通过reset依次处理多个子图，结果与每个子图单独创建实例一致
+    for t in range(500):
+        nodeNum = random.randint(1, 30)
+        nodes = random.sample(range(0, 200), nodeNum)
+        edges = {x: [random.choice(nodes) for _ in range(random.randint(0, 3))] for x in nodes}
+        graph = CsrGraph(nodes, edges)
+        reused = TarjanAlgorithm(graph, [])
+        for k in range(5):
+            sub = random.sample(nodes, random.randint(1, nodeNum))
+            reused.reset(sub)
+            fresh = TarjanAlgorithm(graph, sub)
+            for tarjan in [reused, fresh]:
+                tarjan.tarjan(sub[0])
+            assert reused.getSccList() == fresh.getSccList(), (nodes, edges, sub)
+            assert reused.getSccIds() == fresh.getSccIds()
+            assert reused.getCondensation().succ == fresh.getCondensation().succ
+    print("复用实例检查通过")
+
+    for nodeNum in [10000, 100000, 1000000]:
+        nodes = list(range(nodeNum))
+        edges = {i: [i + 1] for i in range(nodeNum - 1)}  # 一条长链，尾部连回头部，所有节点在同一个环中
+        edges[nodeNum - 1] = [0]
+        graph = CsrGraph(nodes, edges)
+        beginTime = time.perf_counter()
+        tarjan = TarjanAlgorithm(graph, nodes)
+        tarjan.tarjan(0)
+        assert len(tarjan.getSccList()) == 1
+        print("节点数:{}，耗时:{:.3f}s".format(nodeNum, time.perf_counter() - beginTime))
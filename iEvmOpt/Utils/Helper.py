@@ -28,8 +28,8 @@ class Helper:
         self.version = "1.0"
 
         self.HelpInfos = []
-        self.HelpInfos.append(HelpInfo("", "<source>", "Bytecode string or file containing it", False))
-        self.HelpInfos.append(HelpInfo("", "<outputPath>", "Output path of results.", False))
+        self.HelpInfos.append(HelpInfo("", "<source>", "Bytecode string or file containing it. Use - to read bytecode from stdin.", False))
+        self.HelpInfos.append(HelpInfo("", "<outputPath>", "Output path of results. Use - to print optimized bytecode to stdout instead of writing files.", False))
         self.HelpInfos.append(HelpInfo("", "<outputName>", "Output name of optimized bytecode.", False))
 
         self.HelpInfos.append(HelpInfo("-h", "--help", "Show this help message and exit."))
@@ -37,6 +37,10 @@ class Helper:
             HelpInfo("-pd", "--process-detail", "Print detailed information during optimization process."))
         self.HelpInfos.append(HelpInfo("-H", "--html",
                                        "Export constructor'CFG and runtime'CFG as graphic HTML reports. Graphviz is required!"))
+        self.HelpInfos.append(HelpInfo("-es", "--ethersolve",
+                                       "Build CFGs with EtherSolve instead of the built-in CFG builder. Java is required!"))
+        self.HelpInfos.append(HelpInfo("-nc", "--no-cache",
+                                       "Do not read or write the CFG cache in ~/.cache/iEvmOpt/cfg."))
         self.HelpInfos.append(HelpInfo("-v", "--version", "Print version information and exit."))
 
     def getHelpInfo(self):
@@ -1,19 +1,49 @@
+import logging
+import sys
 import time
 
+# 所有日志都通过名为iEvmOpt的logger输出，作为库使用时默认不输出任何内容，由调用方决定日志的去向
+logger = logging.getLogger("iEvmOpt")
+logger.addHandler(logging.NullHandler())
+
+
+class OptimizeFailure(Exception):
+    def __init__(self, strInfo: str, exitCode: int = 0):
+        """ 无法继续优化时抛出的异常，命令行入口捕获它并以exitCode退出
+        :param strInfo:失败的原因
+        :param exitCode:命令行入口的退出码
+        """
+        super().__init__(strInfo)
+        self.exitCode = exitCode
+
+
+def enableConsoleLog(stream=None):
+    """ 将日志输出到控制台，供命令行入口使用
+    :param stream:输出流，默认为标准输出
+    """
+    handler = logging.StreamHandler(sys.stdout if stream is None else stream)
+    handler.setFormatter(logging.Formatter("%(message)s"))  # 时间和级别已经在Logger中写入
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
 
 class Logger:
     def __init__(self):
         pass
 
     def info(self, strInfo: str):
-        print(time.strftime('%Y-%m-%d %H:%M:%S - INFO : ', time.localtime())+strInfo)
+        logger.info(time.strftime('%Y-%m-%d %H:%M:%S - INFO : ', time.localtime())+strInfo)
 
     def warning(self, strInfo: str):
-        print("\033[31m{}\033[0m".format(time.strftime('%Y-%m-%d %H:%M:%S - WARNING : ', time.localtime()) + strInfo))
+        logger.warning("\033[31m{}\033[0m".format(time.strftime('%Y-%m-%d %H:%M:%S - WARNING : ', time.localtime()) + strInfo))
 
-    def fail(self, strInfo:str):
-        print("\033[31m{}\033[0m".format(time.strftime('%Y-%m-%d %H:%M:%S - FAILURE : ', time.localtime()) + strInfo))
-        exit(0)
+    def fail(self, strInfo: str, exitCode: int = 0):
+        """ 输出失败信息，并抛出OptimizeFailure结束优化
+        :param strInfo:失败的原因
+        :param exitCode:命令行入口的退出码
+        """
+        logger.error("\033[31m{}\033[0m".format(time.strftime('%Y-%m-%d %H:%M:%S - FAILURE : ', time.localtime()) + strInfo))
+        raise OptimizeFailure(strInfo, exitCode)
 
     def processing(self,strInfo:str):
-        print(time.strftime('%Y-%m-%d %H:%M:%S - PROCESS DETAIL : ', time.localtime())+strInfo)
\ No newline at end of file
+        logger.info(time.strftime('%Y-%m-%d %H:%M:%S - PROCESS DETAIL : ', time.localtime())+strInfo)
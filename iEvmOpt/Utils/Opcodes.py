@@ -0,0 +1,178 @@
+# EVM操作码的元信息，格式为 opcode:(助记符,出栈元素数量,入栈元素数量)
+# 注意，0x1f为本工具自己使用的空指令，不会出现在原字节码中
+opcodeInfo = {
+    0x00: ("STOP", 0, 0),
+    0x01: ("ADD", 2, 1),
+    0x02: ("MUL", 2, 1),
+    0x03: ("SUB", 2, 1),
+    0x04: ("DIV", 2, 1),
+    0x05: ("SDIV", 2, 1),
+    0x06: ("MOD", 2, 1),
+    0x07: ("SMOD", 2, 1),
+    0x08: ("ADDMOD", 3, 1),
+    0x09: ("MULMOD", 3, 1),
+    0x0a: ("EXP", 2, 1),
+    0x0b: ("SIGNEXTEND", 2, 1),
+    0x10: ("LT", 2, 1),
+    0x11: ("GT", 2, 1),
+    0x12: ("SLT", 2, 1),
+    0x13: ("SGT", 2, 1),
+    0x14: ("EQ", 2, 1),
+    0x15: ("ISZERO", 1, 1),
+    0x16: ("AND", 2, 1),
+    0x17: ("OR", 2, 1),
+    0x18: ("XOR", 2, 1),
+    0x19: ("NOT", 1, 1),
+    0x1a: ("BYTE", 2, 1),
+    0x1b: ("SHL", 2, 1),
+    0x1c: ("SHR", 2, 1),
+    0x1d: ("SAR", 2, 1),
+    0x1f: ("NONOP", 0, 0),
+    0x20: ("SHA3", 2, 1),
+    0x30: ("ADDRESS", 0, 1),
+    0x31: ("BALANCE", 1, 1),
+    0x32: ("ORIGIN", 0, 1),
+    0x33: ("CALLER", 0, 1),
+    0x34: ("CALLVALUE", 0, 1),
+    0x35: ("CALLDATALOAD", 1, 1),
+    0x36: ("CALLDATASIZE", 0, 1),
+    0x37: ("CALLDATACOPY", 3, 0),
+    0x38: ("CODESIZE", 0, 1),
+    0x39: ("CODECOPY", 3, 0),
+    0x3a: ("GASPRICE", 0, 1),
+    0x3b: ("EXTCODESIZE", 1, 1),
+    0x3c: ("EXTCODECOPY", 4, 0),
+    0x3d: ("RETURNDATASIZE", 0, 1),
+    0x3e: ("RETURNDATACOPY", 3, 0),
+    0x3f: ("EXTCODEHASH", 1, 1),
+    0x40: ("BLOCKHASH", 1, 1),
+    0x41: ("COINBASE", 0, 1),
+    0x42: ("TIMESTAMP", 0, 1),
+    0x43: ("NUMBER", 0, 1),
+    0x44: ("PREVRANDAO", 0, 1),
+    0x45: ("GASLIMIT", 0, 1),
+    0x46: ("CHAINID", 0, 1),
+    0x47: ("SELFBALANCE", 0, 1),
+    0x48: ("BASEFEE", 0, 1),
+    0x50: ("POP", 1, 0),
+    0x51: ("MLOAD", 1, 1),
+    0x52: ("MSTORE", 2, 0),
+    0x53: ("MSTORE8", 2, 0),
+    0x54: ("SLOAD", 1, 1),
+    0x55: ("SSTORE", 2, 0),
+    0x56: ("JUMP", 1, 0),
+    0x57: ("JUMPI", 2, 0),
+    0x58: ("PC", 0, 1),
+    0x59: ("MSIZE", 0, 1),
+    0x5a: ("GAS", 0, 1),
+    0x5b: ("JUMPDEST", 0, 0),
+    0xf0: ("CREATE", 3, 1),
+    0xf1: ("CALL", 7, 1),
+    0xf2: ("CALLCODE", 7, 1),
+    0xf3: ("RETURN", 2, 0),
+    0xf4: ("DELEGATECALL", 6, 1),
+    0xf5: ("CREATE2", 4, 1),
+    0xfa: ("STATICCALL", 6, 1),
+    0xfd: ("REVERT", 2, 0),
+    0xfe: ("INVALID", 0, 0),
+    0xff: ("SELFDESTRUCT", 1, 0),
+}
+for i in range(1, 33):
+    opcodeInfo[0x5f + i] = ("PUSH" + str(i), 0, 1)
+for i in range(1, 17):
+    opcodeInfo[0x7f + i] = ("DUP" + str(i), i, i + 1)
+    opcodeInfo[0x8f + i] = ("SWAP" + str(i), i + 1, i + 1)
+for i in range(0, 5):
+    opcodeInfo[0xa0 + i] = ("LOG" + str(i), i + 2, 0)
+
+# 结束一个基本块的操作码，其中terminal类型的操作码之后不会再有控制流
+terminalOpcodes = {0x00, 0xf3, 0xfd, 0xfe, 0xff}
+blockEndOpcodes = terminalOpcodes | {0x56, 0x57}
+
+# 按操作码下标的出栈、入栈元素数量，未定义的操作码均为0，用于执行器中的快速查表
+stackPops = bytes([opcodeInfo[i][1] if i in opcodeInfo else 0 for i in range(256)])
+stackPushes = bytes([opcodeInfo[i][2] if i in opcodeInfo else 0 for i in range(256)])
+
+# 一组操作码的范围，可作为genDispatchTable中的键
+pushOpcodes = range(0x60, 0x80)
+dupOpcodes = range(0x80, 0x90)
+swapOpcodes = range(0x90, 0xa0)
+logOpcodes = range(0xa0, 0xa5)
+
+
+def isPush(opcode: int):
+    return 0x60 <= opcode <= 0x7f
+
+
+def getPushByteNum(opcode: int):
+    """ 获取push指令的数据字节数，非push指令返回0
+    :param opcode:操作码
+    """
+    if 0x60 <= opcode <= 0x7f:
+        return opcode - 0x5f
+    return 0
+
+
+def isKnownOpcode(opcode: int):
+    return opcode in opcodeInfo
+
+
+def getOpcodeName(opcode: int):
+    """ 获取操作码的助记符，未定义的操作码在执行时会直接异常终止，因此视为INVALID
+    :param opcode:操作码
+    """
+    if opcode in opcodeInfo:
+        return opcodeInfo[opcode][0]
+    return "INVALID"
+
+
+def getStackEffect(opcode: int):
+    """ 获取操作码的栈效应
+    :param opcode:操作码
+    :return:[出栈元素数量,入栈元素数量]
+    """
+    if opcode in opcodeInfo:
+        return opcodeInfo[opcode][1], opcodeInfo[opcode][2]
+    return 0, 0
+
+
+def formatInstr(addr: int, opcode: int, pushData: bytes = None):
+    """ 生成一条指令的汇编码，格式与EtherSolve一致，如 "0: PUSH1 0x80"
+    :param addr:指令的地址
+    :param opcode:操作码
+    :param pushData:push的数据
+    """
+    if pushData is not None:
+        return "{}: {} 0x{}".format(addr, getOpcodeName(opcode), pushData.hex())
+    return "{}: {}".format(addr, getOpcodeName(opcode))
+
+
+def disassemble(code: bytes, beginAddr: int = 0):
+    """ 将一段字节码转换为汇编码
+    :param code:字节码
+    :param beginAddr:第一条指令的地址
+    :return:汇编码列表
+    """
+    instrs = []
+    pc = 0
+    while pc < len(code):
+        opcode = code[pc]
+        byteNum = getPushByteNum(opcode)
+        instrs.append(formatInstr(beginAddr + pc, opcode, code[pc + 1:pc + 1 + byteNum] if byteNum > 0 else None))
+        pc += 1 + byteNum
+    return instrs
+
+
+def genDispatchTable(defaultHandler, handlers: dict):
+    """ 生成执行器使用的分派表，下标为操作码
+    :param defaultHandler:已定义但没有单独处理的操作码所使用的处理函数，为None时每个操作码都必须在handlers中给出
+    :param handlers:单独处理的操作码，格式为 操作码、操作码范围或操作码元组:处理函数
+    :return:长度为256的列表，未定义的操作码对应None
+    """
+    table = [defaultHandler if i in opcodeInfo else None for i in range(256)]
+    for key, handler in handlers.items():
+        for opcode in (key if isinstance(key, (range, tuple)) else [key]):
+            assert opcode in opcodeInfo
+            table[opcode] = handler
+    assert defaultHandler is not None or all(table[i] is not None for i in opcodeInfo)
+    return table
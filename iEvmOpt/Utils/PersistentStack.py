@@ -0,0 +1,155 @@
+from z3 import *
+
+
+class PersistentStack:
+    '''
+    不可变链表实现的栈，接口与Stack一致，可以直接替换Stack使用
+    栈由不可变的节点串联而成，节点的格式为 (元素,下一个节点,栈的大小)，栈底是一个大小为0的哨兵节点
+    push和pop只移动栈顶指针，不会修改已有的节点，因此栈顶节点本身就是栈的一个快照：
+    getSnapshot和restoreSnapshot都是O(1)的，从同一个快照分叉出的多个栈共享快照以下的所有节点
+    getItem和swap需要从栈顶往下走，复杂度与访问的深度成正比，EVM中最多为17
+    '''
+    __bottom = (None, None, 0)  # 栈底的哨兵节点，所有栈共享
+
+    def __init__(self, enableUnderFlow=False):
+        self.__top = self.__bottom  # 栈顶节点
+        self.enableUnderFlow = enableUnderFlow
+
+    def push(self, a):
+        top = self.__top
+        self.__top = (a, top, top[2] + 1)
+
+    def pop(self):
+        top = self.__top
+        if top[2] > 0:
+            self.__top = top[1]
+            return top[0]
+        else:
+            # 不能再pop了
+            if self.enableUnderFlow:
+                return None
+            else:
+                raise Exception("栈为空")
+
+    def size(self):
+        return self.__top[2]
+
+    def __checkPos(self, pos: int):
+        """ 检查下标是否越界，栈底的下标为0，支持负数下标
+        :return:非负的下标
+        """
+        size = self.__top[2]
+        if pos < 0:
+            pos += size
+        if not 0 <= pos < size:
+            raise IndexError("stack index out of range")
+        return pos
+
+    def __getNode(self, pos: int):
+        """ 获取下标为pos的元素所在的节点
+        """
+        top = self.__top
+        for i in range(top[2] - 1 - self.__checkPos(pos)):
+            top = top[1]
+        return top
+
+    def swap(self, pos1: int, pos2: int):
+        pos1, pos2 = self.__checkPos(pos1), self.__checkPos(pos2)
+        if pos1 == pos2:
+            return
+        low = min(pos1, pos2)
+        # 弹出下标low以上的所有元素，交换之后重新压入，下标low以下的节点保持共享
+        items = []
+        node = self.__top
+        while node[2] > low:
+            items.append(node[0])
+            node = node[1]
+        items.reverse()
+        items[pos1 - low], items[pos2 - low] = items[pos2 - low], items[pos1 - low]
+        for item in items:
+            node = (item, node, node[2] + 1)
+        self.__top = node
+
+    def getItem(self, pos: int):
+        return self.__getNode(pos)[0]
+
+    def clear(self):
+        self.__top = self.__bottom
+
+    def empty(self):
+        return self.__top[2] == 0
+
+    def getTop(self):
+        top = self.__top
+        if top[2] != 0:
+            return top[0]
+        else:
+            if self.enableUnderFlow:
+                return None
+            else:
+                raise Exception("栈为空")
+
+    def hasItem(self, item):
+        node = self.__top
+        while node[2] > 0:
+            if node[0] == item:
+                return True
+            node = node[1]
+        return False
+
+    def getTopItems(self, num: int):
+        """ 获取栈顶的num个元素，O(num)，调用者需要保证栈中至少有num个元素
+        :return:元素列表，格式为 [栈顶元素,第二个元素...]
+        """
+        items = []
+        node = self.__top
+        for i in range(num):
+            items.append(node[0])
+            node = node[1]
+        return items
+
+    def replaceTop(self, popNum: int, items: list):
+        """ 弹出栈顶的popNum个元素，再按顺序压入items，最后一个元素位于栈顶，O(popNum+len(items))
+        调用者需要保证栈中至少有popNum个元素
+        """
+        node = self.__top
+        for i in range(popNum):
+            node = node[1]
+        for item in items:
+            node = (item, node, node[2] + 1)
+        self.__top = node
+
+    def getSnapshot(self):
+        """ 获取栈当前状态的快照，O(1)，快照不会因为之后对栈的修改而改变
+        """
+        return self.__top
+
+    def restoreSnapshot(self, snapshot: tuple):
+        """ 将栈恢复为快照时的状态，O(1)
+        :param snapshot:由getSnapshot得到的快照
+        """
+        self.__top = snapshot
+
+    def setStack(self, stackItems: list):
+        node = self.__bottom
+        for item in stackItems:
+            node = (item, node, node[2] + 1)
+        self.__top = node
+
+    def getStack(self, isHex: bool = False):
+        items = []
+        node = self.__top
+        while node[2] > 0:
+            items.append(node[0])
+            node = node[1]
+        items.reverse()
+        if not isHex:
+            return items
+        else:
+            hexStack = []
+            for item in items:
+                if is_bv_value(item):
+                    hexStack.append(hex(int(item.__str__())))
+                else:
+                    hexStack.append(item.__str__())
+            return hexStack
@@ -54,6 +54,33 @@ class Stack:
     def hasItem(self, item):
         return self.__stack.__contains__(item)
 
+    def getTopItems(self, num: int):
+        """ 获取栈顶的num个元素，调用者需要保证栈中至少有num个元素
+        :return:元素列表，格式为 [栈顶元素,第二个元素...]
+        """
+        stack = self.__stack
+        return [stack[-1 - i] for i in range(num)]
+
+    def replaceTop(self, popNum: int, items: list):
+        """ 弹出栈顶的popNum个元素，再按顺序压入items，最后一个元素位于栈顶
+        调用者需要保证栈中至少有popNum个元素
+        """
+        stack = self.__stack
+        for i in range(popNum):
+            stack.pop()
+        stack.extend(items)
+
+    def getSnapshot(self):
+        """ 获取栈当前状态的快照，需要复制整个栈，O(n)，频繁保存快照时应当使用PersistentStack
+        """
+        return tuple(self.__stack)
+
+    def restoreSnapshot(self, snapshot: tuple):
+        """ 将栈恢复为快照时的状态，O(n)
+        :param snapshot:由getSnapshot得到的快照
+        """
+        self.__stack = deque(snapshot)
+
     def setStack(self, stackItems: list):
         self.__stack = deque(stackItems)
 
@@ -1,2 +1,2 @@
 from Utils.Stack import Stack
-
+from Utils.PersistentStack import PersistentStack